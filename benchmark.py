@@ -0,0 +1,416 @@
+"""性能基准: 生成HOI4规模的合成mod，在无界面的Qt(offscreen)中对主要操作计时，结果保存为JSON
+
+用法:
+    python benchmark.py [--files N] [--replaced 比例] [--samples N] [--seed N] [--workers N]
+                        [--workdir 文件夹] [--output 结果.json] [--label 名称] [--compare 旧结果.json]
+
+相同的 --files/--replaced/--seed 总是生成完全相同的mod，已生成的mod会直接复用。
+每次运行使用工作目录中独立的缓存目录(运行前清空)，不影响本机的缩略图和扫描索引；
+扫描、预览和导出分别记录冷缓存和热缓存的用时。
+--compare 读取之前的结果，逐项打印用时的变化，便于在发布新版本前发现性能退化。
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import contextlib
+
+BENCHMARK_VERSION = 1
+
+# 合成mod中的图片类别: (gfx下的文件夹, 文件名前缀, 尺寸, 扩展名, 占全部文件的比例, 每个子文件夹的文件数)
+# 尺寸和格式参照原版游戏: 国策和事件图为DDS，国旗为TGA，部分界面图标为PNG
+CATEGORIES = [
+    ("interface/goals", "goal", (95, 82), ".dds", 0.25, 400),
+    ("interface/ideas", "idea", (64, 64), ".dds", 0.15, 400),
+    ("interface/technologies", "tech", (183, 90), ".png", 0.10, 300),
+    ("leaders", "portrait", (156, 210), ".dds", 0.20, 60),
+    ("flags", "flag", (82, 52), ".tga", 0.10, 1000),
+    ("flags/medium", "flag", (41, 26), ".tga", 0.08, 1000),
+    ("flags/small", "flag", (10, 7), ".tga", 0.08, 1000),
+    ("event_pictures", "report_event", (210, 176), ".dds", 0.035, 200),
+    ("loadingscreens", "load", (1920, 1080), ".dds", 0.005, 50),
+]
+
+# 记录生成参数，参数相同时复用已生成的mod
+PARAMS_NAME = ".benchmark_params.json"
+
+
+def log(message):
+    print(message, flush=True)
+
+
+def synthetic_image(rng, size):
+    """生成一张带透明边缘和色块的图片，每张内容不同，压缩率接近真实图标"""
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    img = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for _ in range(4):
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.choice((160, 255)))
+        left, top = rng.randrange(max(1, width // 2)), rng.randrange(max(1, height // 2))
+        right, bottom = left + rng.randrange(1, width), top + rng.randrange(1, height)
+        draw.ellipse((left, top, right, bottom), fill=color)
+    return img
+
+
+def encode_original(img, ext):
+    """把模板图片编码为原文件格式的字节"""
+    buffer = io.BytesIO()
+    if ext == ".dds":
+        try:
+            import dds_encoder
+            return dds_encoder.encode(img, 'DXT5', mipmaps=True)
+        except ImportError:
+            img.save(buffer, format='DDS')
+    elif ext == ".tga":
+        img.save(buffer, format='TGA')
+    else:
+        img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def plan_files(total):
+    """按类别比例分配文件，返回 [(gfx下的相对路径, 类别)]"""
+    files = []
+    for category in CATEGORIES:
+        folder, prefix, size, ext, share, per_folder = category
+        count = max(1, round(total * share))
+        for i in range(count):
+            subfolder = f"{folder}/{prefix}s_{i // per_folder:03d}" if count > per_folder else folder
+            files.append((f"{subfolder}/{prefix}_{i:05d}{ext}", category))
+    return files
+
+
+def write_gfx_script(mod_root, rel_paths):
+    """为国策图标生成interface/*.gfx，使sprite解析也参与计时"""
+    lines = ["spriteTypes = {"]
+    for rel_path in rel_paths:
+        name = os.path.splitext(os.path.basename(rel_path))[0]
+        lines.append(f'\tspriteType = {{\n\t\tname = "GFX_{name}"\n\t\ttexturefile = "gfx/{rel_path}"\n\t}}')
+    lines.append("}")
+    os.makedirs(os.path.join(mod_root, "interface"), exist_ok=True)
+    with open(os.path.join(mod_root, "interface", "benchmark_goals.gfx"), 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def generate_mod(workdir, total, replaced, seed):
+    """生成合成mod和替换文件夹，返回 (descriptor路径, 替换配置路径, 是否重新生成)"""
+    import replacement_config
+
+    mod_root = os.path.join(workdir, "mod")
+    repl_root = os.path.join(workdir, "replacements")
+    descriptor_path = os.path.join(mod_root, "descriptor.mod")
+    config_path = os.path.join(workdir, "replacements.jsonl")
+    params = {"files": total, "replaced": replaced, "seed": seed, "version": BENCHMARK_VERSION}
+    params_path = os.path.join(workdir, PARAMS_NAME)
+    try:
+        with open(params_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == params and os.path.exists(config_path):
+                return descriptor_path, config_path, False
+    except (OSError, ValueError):
+        pass
+
+    for folder in (mod_root, repl_root):
+        shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(mod_root)
+    with open(descriptor_path, 'w', encoding='utf-8') as f:
+        f.write('version="1.0"\nname="Benchmark Mod"\nsupported_version="1.14.*"\n')
+
+    rng = random.Random(seed)
+    # 原文件的内容不影响计时，每个类别共用一份模板；替换文件各不相同，导出时不会被当作重复内容
+    templates = {}
+    replacements = {}
+    files = plan_files(total)
+    for rel_path, category in files:
+        folder, prefix, size, ext, share, per_folder = category
+        if category not in templates:
+            templates[category] = encode_original(synthetic_image(rng, size), ext)
+        orig_path = os.path.join(mod_root, "gfx", *rel_path.split("/"))
+        os.makedirs(os.path.dirname(orig_path), exist_ok=True)
+        with open(orig_path, 'wb') as f:
+            f.write(templates[category])
+
+        if rng.random() < replaced:
+            repl_path = os.path.join(repl_root, *os.path.splitext(rel_path)[0].split("/")) + ".png"
+            os.makedirs(os.path.dirname(repl_path), exist_ok=True)
+            synthetic_image(rng, size).save(repl_path, format='PNG')
+            replacements[orig_path] = repl_path
+
+    write_gfx_script(mod_root, [rel_path for rel_path, category in files if category[1] == "goal"])
+    replacement_config.write_config(config_path, descriptor_path, replacements)
+    with open(params_path, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    return descriptor_path, config_path, True
+
+
+def peak_rss_mb():
+    """本进程的峰值内存(MB)，不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS以字节为单位，Linux以KB为单位
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(durations):
+    """把多次计时汇总为 总计/中位数/p95/最大值"""
+    ordered = sorted(durations)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "seconds": round(sum(ordered), 4),
+        "median": round(ordered[len(ordered) // 2], 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+@contextlib.contextmanager
+def patched_dialogs(messages, open_file=None, directory=None, answer=None):
+    """用固定结果代替会阻塞的对话框，弹出的提示文字记录到messages"""
+    from PyQt5.QtWidgets import QFileDialog, QMessageBox
+
+    saved = {name: getattr(QFileDialog, name) for name in ("getOpenFileName", "getExistingDirectory")}
+    saved_boxes = {name: getattr(QMessageBox, name) for name in ("information", "warning", "critical", "question")}
+    QFileDialog.getOpenFileName = staticmethod(lambda *args, **kwargs: (open_file or "", ""))
+    QFileDialog.getExistingDirectory = staticmethod(lambda *args, **kwargs: directory or "")
+    for name in ("information", "warning", "critical"):
+        setattr(QMessageBox, name, staticmethod(lambda *args, _kind=name, **kwargs: messages.append((_kind, args[2]))))
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: answer or QMessageBox.No)
+    try:
+        yield
+    finally:
+        for name, func in saved.items():
+            setattr(QFileDialog, name, func)
+        for name, func in saved_boxes.items():
+            setattr(QMessageBox, name, func)
+
+
+def wait_until(app, predicate, timeout=600):
+    """处理事件直到条件成立，超时时抛出异常"""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("等待超时")
+        app.processEvents()
+        time.sleep(0.002)
+    app.processEvents()
+
+
+def folder_bytes(folder):
+    """导出文件夹中的文件数和总大小，不计导出清单"""
+    import export_engine
+
+    total = 0
+    count = 0
+    for current, dirs, files in os.walk(folder):
+        for name in files:
+            if name == export_engine.MANIFEST_NAME:
+                continue
+            total += os.path.getsize(os.path.join(current, name))
+            count += 1
+    return count, total
+
+
+def run_benchmark(descriptor_path, config_path, workdir, samples, seed, workers=None):
+    """在offscreen Qt中依次计时各项操作，返回 {项目: 结果}"""
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+
+    import main
+
+    app = QApplication.instance() or QApplication([])
+    results = {}
+
+    began = time.perf_counter()
+    window = main.FileViewerApp()
+    window.resize(1400, 900)
+    window.show()
+    app.processEvents()
+    results["window_startup"] = {"seconds": round(time.perf_counter() - began, 4)}
+    if workers:
+        window.export_workers_spin.setValue(workers)
+
+    # 扫描: 第一次没有扫描索引，第二次各文件夹都命中索引
+    for name in ("scan_cold", "scan_warm"):
+        began = time.perf_counter()
+        window.current_file_path = descriptor_path
+        window.process_descriptor_file(descriptor_path)
+        wait_until(app, lambda: window.scan_thread is None)
+        results[name] = {"seconds": round(time.perf_counter() - began, 4), "files": window.tree_model.file_count}
+        wait_until(app, lambda: window.sprite_index is not None)
+        if name == "scan_cold":
+            results["sprite_scan"] = {"seconds": round(time.perf_counter() - began, 4),
+                                      "sprites": len(window.sprite_index)}
+        log(f"{name}: {results[name]['seconds']:.3f} 秒，{results[name]['files']} 个文件")
+    window.stop_meta_probe()
+
+    # 导入替换配置(不重新加载mod)，包括检查替换文件是否存在
+    messages = []
+    with patched_dialogs(messages, open_file=config_path, answer=QMessageBox.No):
+        began = time.perf_counter()
+        window.import_replacements()
+        results["import_config"] = {"seconds": round(time.perf_counter() - began, 4),
+                                    "replacements": len(window.replacement_files)}
+    log(f"import_config: {results['import_config']['seconds']:.3f} 秒，"
+        f"{results['import_config']['replacements']} 个替换")
+
+    durations = []
+    for _ in range(5):
+        began = time.perf_counter()
+        window.update_file_tree_colors()
+        durations.append(time.perf_counter() - began)
+    results["update_file_tree_colors"] = summarize(durations)
+    log(f"update_file_tree_colors: 中位数 {results['update_file_tree_colors']['median']:.4f} 秒")
+
+    # 选择文件并等待预览解码完成: 第一次需要生成缩略图，第二次命中内存缓存
+    all_files = sorted(window.tree_model.path(node) for rel_path, node in window.tree_model.iter_files())
+    rng = random.Random(seed)
+    replaced = sorted(window.replacement_files)
+    selected = rng.sample(all_files, min(samples, len(all_files)))
+    selected += rng.sample(replaced, min(samples // 4, len(replaced)))
+    for name in ("display_file_info_cold", "display_file_info_warm"):
+        durations = []
+        for file_path in selected:
+            began = time.perf_counter()
+            window.current_selected_file = file_path
+            window.display_file_info(file_path)
+            wait_until(app, lambda: not window.pending_previews)
+            durations.append(time.perf_counter() - began)
+        results[name] = summarize(durations)
+        log(f"{name}: 中位数 {results[name]['median']:.4f} 秒，p95 {results[name]['p95']:.4f} 秒")
+
+    # 导出: 第一次需要转换全部替换文件，第二次命中转换缓存；都关闭增量导出
+    window.incremental_export_check.setChecked(False)
+    window.export_target_combo.setCurrentIndex(window.export_target_combo.findData("gfx"))
+    for name in ("export_cold", "export_warm"):
+        export_dir = os.path.join(workdir, "export")
+        shutil.rmtree(export_dir, ignore_errors=True)
+        os.makedirs(export_dir)
+        messages = []
+        with patched_dialogs(messages, directory=export_dir), contextlib.redirect_stdout(io.StringIO()):
+            began = time.perf_counter()
+            window.export_mod_files()
+            # 导出在后台线程中进行，结果对话框在完成时弹出
+            wait_until(app, lambda: window.export_thread is None)
+            seconds = time.perf_counter() - began
+        count, size = folder_bytes(os.path.join(export_dir, "gfx"))
+        results[name] = {
+            "seconds": round(seconds, 4),
+            "files": count,
+            "output_mb": round(size / 1024 / 1024, 2),
+            "files_per_second": round(count / seconds, 1) if seconds else None,
+            "mb_per_second": round(size / 1024 / 1024 / seconds, 2) if seconds else None,
+        }
+        log(f"{name}: {seconds:.3f} 秒，{count} 个文件，{results[name]['files_per_second']} 个/秒")
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    window.close()
+    app.processEvents()
+    return results
+
+
+def environment():
+    import PIL
+    from PyQt5.QtCore import QT_VERSION_STR
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "numpy": numpy_version,
+        "qt": QT_VERSION_STR,
+        "qt_platform": os.environ.get("QT_QPA_PLATFORM"),
+    }
+
+
+def compare(old_report, new_report):
+    """逐项打印两次结果的用时变化"""
+    log(f"\n与 {old_report.get('label') or old_report.get('created')} 比较:")
+    old_results = old_report.get("results", {})
+    for name, result in new_report["results"].items():
+        old = old_results.get(name)
+        if not isinstance(result, dict) or not isinstance(old, dict):
+            continue
+        key = "median" if "median" in result else "seconds"
+        if not old.get(key) or result.get(key) is None:
+            continue
+        ratio = result[key] / old[key]
+        # 几毫秒的操作波动很大，差值很小时不标记
+        significant = abs(result[key] - old[key]) >= 0.005
+        mark = ""
+        if significant and ratio > 1.1:
+            mark = "  变慢"
+        elif significant and ratio < 0.9:
+            mark = "  变快"
+        log(f"  {name:<26} {old[key]:>9.4f} -> {result[key]:>9.4f} 秒 ({ratio:.2f}x){mark}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HOI4 0代码萌化和和谐工具 - 性能基准")
+    parser.add_argument("--files", type=int, default=5000, help="合成mod中的图片数量，默认5000")
+    parser.add_argument("--replaced", type=float, default=0.2, help="设置了替换的图片比例，默认0.2")
+    parser.add_argument("--samples", type=int, default=200, help="计时预览的文件数，默认200")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子，相同种子生成相同的mod")
+    parser.add_argument("--workers", type=int, default=None, help="导出进程数，默认使用全部CPU核心")
+    parser.add_argument("--workdir", default=os.path.join(os.getcwd(), "benchmark_work"),
+                        help="生成的mod、缓存和导出结果所在的文件夹")
+    parser.add_argument("--output", default="benchmark_result.json", help="JSON结果文件")
+    parser.add_argument("--label", default="", help="写入结果的名称，例如版本号")
+    parser.add_argument("--compare", help="之前的JSON结果，打印用时变化")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir)
+    os.makedirs(workdir, exist_ok=True)
+    # 缓存目录放在工作目录中，并在导入界面模块前设置好
+    cache_dir = os.path.join(workdir, "cache")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir)
+    os.environ["XDG_CACHE_HOME"] = cache_dir
+    os.environ["LOCALAPPDATA"] = cache_dir
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    began = time.perf_counter()
+    descriptor_path, config_path, generated = generate_mod(workdir, args.files, args.replaced, args.seed)
+    if generated:
+        log(f"已生成合成mod: {time.perf_counter() - began:.1f} 秒")
+    else:
+        log("复用已生成的合成mod")
+
+    report = {
+        "benchmark_version": BENCHMARK_VERSION,
+        "label": args.label,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "params": {"files": args.files, "replaced": args.replaced, "samples": args.samples,
+                   "seed": args.seed, "workers": args.workers},
+        "environment": None,
+        "results": run_benchmark(descriptor_path, config_path, workdir, args.samples, args.seed, args.workers),
+    }
+    report["environment"] = environment()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    log(f"结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import os
+import re
+from collections import namedtuple
+
+import mod_files
+
+# 批量对应替换文件夹: 按规则为替换文件夹中的每张图片算出一个键，
+# 与gfx文件按同样方式算出的键用字典连接，一次得到全部 原文件->替换文件 的对应关系
+
+# kind: "path" 相同相对路径 / "stem" 相同路径不同扩展名 / "name" 相同文件名(忽略文件夹)
+#       "regex" 替换文件相对路径完整匹配pattern后用template改写为gfx相对路径
+#       "glob" 与regex相同，pattern为通配符(*、**、?)，template中的*依次替换为匹配到的部分
+Rule = namedtuple("Rule", ["kind", "pattern", "template"], defaults=("", ""))
+
+RULE_NAMES = {
+    "path": "相同相对路径",
+    "stem": "相同路径、不同扩展名",
+    "name": "相同文件名(忽略文件夹)",
+    "regex": "正则改写",
+    "glob": "通配符改写",
+}
+
+# 一个替换文件对应到一个gfx文件: 规则序号为匹配它的规则在列表中的位置
+Mapping = namedtuple("Mapping", ["gfx_path", "replacement_path", "rule"])
+
+
+def list_replacement_files(folder):
+    """列出替换文件夹中全部图片的相对路径(以/分隔)"""
+    prefix_length = len(folder.rstrip(os.sep)) + 1
+    rel_paths = []
+    for current, subdirs, files in mod_files.iter_gfx_dirs(folder):
+        rel_folder = current[prefix_length:].replace(os.sep, "/")
+        rel_paths.extend(f"{rel_folder}/{name}" if rel_folder else name for name in files)
+    return rel_paths
+
+
+def stem_key(rel_path):
+    stem, dot, ext = rel_path.rpartition(".")
+    return stem if dot and "/" not in ext else rel_path
+
+
+def name_key(rel_path):
+    return rel_path.rsplit("/", 1)[-1]
+
+
+def glob_to_regex(pattern, template):
+    """把通配符规则转换为 (正则, 改写模板)"""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**", i):
+            parts.append("(.*)")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("([^/]*)")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("([^/])")
+            i += 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    pieces = template.split("*")
+    rewritten = pieces[0]
+    for group, piece in enumerate(pieces[1:], 1):
+        rewritten += f"\\g<{group}>" + piece.replace("\\", "\\\\")
+    return "".join(parts), rewritten
+
+
+def compile_rule(rule):
+    """返回 (gfx路径的键函数, 替换文件路径的键函数)；键函数返回None表示不参与匹配"""
+    if rule.kind == "path":
+        return None, None
+    if rule.kind == "stem":
+        return stem_key, stem_key
+    if rule.kind == "name":
+        return name_key, name_key
+    if rule.kind in ("regex", "glob"):
+        pattern, template = rule.pattern, rule.template
+        if rule.kind == "glob":
+            pattern, template = glob_to_regex(pattern, template)
+        try:
+            regex = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"无效的正则表达式 {rule.pattern}: {str(e)}")
+
+        def rewrite(rel_path):
+            if regex.fullmatch(rel_path) is None:
+                return None
+            try:
+                # sub会缓存编译后的模板，Match.expand每次都重新解析
+                return regex.sub(template, rel_path, count=1).replace("\\", "/").strip("/")
+            except (re.error, IndexError) as e:
+                raise ValueError(f"无效的改写模板 {rule.template}: {str(e)}")
+        return None, rewrite
+    raise ValueError(f"未知的规则类型: {rule.kind}")
+
+
+def match(gfx_paths, replacement_paths, rules, exclude=()):
+    """按规则顺序为gfx文件找替换文件，返回 (对应关系列表, 未匹配的替换文件列表)
+
+    路径都是以/分隔的相对路径，比较时不区分大小写。每个gfx文件只采用最先匹配到它的规则；
+    同一规则下多个替换文件对应同一个gfx文件时，优先扩展名相同的，其次按路径排序。
+    exclude中的gfx文件(例如已经设置了替换的)不参与匹配。
+    """
+    excluded = {path.lower() for path in exclude}
+    replacement_paths = sorted(replacement_paths)
+    mapped = {}  # {gfx相对路径: Mapping}
+    used = set()
+    indexes = {}  # 相同键函数的规则共用同一个gfx索引
+    for rule_index, rule in enumerate(rules):
+        gfx_key, replacement_key = compile_rule(rule)
+        if gfx_key not in indexes:
+            index = {}
+            for path in gfx_paths:
+                lowered = path.lower()
+                if lowered in excluded:
+                    continue
+                index.setdefault(gfx_key(lowered) if gfx_key else lowered, []).append(path)
+            indexes[gfx_key] = index
+        index = indexes[gfx_key]
+
+        proposed = {}
+        for path in replacement_paths:
+            if path in used:
+                continue
+            key = path.lower()
+            if replacement_key is not None:
+                key = replacement_key(key if rule.kind in ("stem", "name") else path)
+                if key is None:
+                    continue
+                key = key.lower()
+            for target in index.get(key, ()):
+                if target in mapped:
+                    continue
+                current = proposed.get(target)
+                if current is None or (same_ext(path, target) and not same_ext(current, target)):
+                    proposed[target] = path
+        for target, path in proposed.items():
+            mapped[target] = Mapping(target, path, rule_index)
+            used.add(path)
+
+    mappings = sorted(mapped.values(), key=lambda mapping: mapping.gfx_path)
+    unmatched = [path for path in replacement_paths if path not in used]
+    return mappings, unmatched
+
+
+def same_ext(path, other):
+    return os.path.splitext(path)[1].lower() == os.path.splitext(other)[1].lower()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import hashlib
+
+import mod_files
+
+# 格式转换结果的磁盘缓存: 按 源文件内容哈希+目标扩展名+转换参数 保存转换后的文件，
+# 同一张替换图片再次导出(包括其他会话和其他导出目录)时直接复制；总大小超过上限时删除最久未使用的文件
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# 超出上限后清理到上限的这个比例
+EVICT_TARGET_RATIO = 0.9
+
+
+class ConversionCache:
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or mod_files.user_cache_dir("conversions")
+        self.max_bytes = max_bytes
+
+    def entry_path(self, source_hash, target_ext, params):
+        key = f"{source_hash}|{target_ext}|{params}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + target_ext)
+
+    def read(self, source_hash, target_ext, params):
+        """返回缓存的转换结果(bytes)，没有缓存时返回None"""
+        entry = self.entry_path(source_hash, target_ext, params)
+        try:
+            # 更新修改时间作为最近使用时间，清理时按它排序
+            os.utime(entry)
+            with open(entry, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, source_hash, target_ext, params, data):
+        """把转换结果存入缓存，先写临时文件再替换；失败时只打印错误"""
+        entry = self.entry_path(source_hash, target_ext, params)
+        temp_path = f"{entry}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, entry)
+        except OSError as e:
+            print(f"写入转换缓存失败: {str(e)}")
+
+    def entries(self):
+        """列出缓存中的全部文件 (路径, 大小, 最近使用时间)"""
+        for folder, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """总大小超过上限时按最近使用时间从旧到新删除，返回删除的文件数"""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+def link_or_copy(src_path, dst_path):
+    """优先创建硬链接，文件系统不支持时复制
+
+    目标已存在时先删除，不会写入可能与其他文件共享的旧内容。
+    """
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copy2(src_path, dst_path)
@@ -0,0 +1,221 @@
+import struct
+
+import numpy as np
+
+# 基于NumPy向量化的DDS编码器: 支持DXT1(BC1)、DXT5(BC3)压缩和无压缩ARGB8，可生成完整mipmap链
+
+FORMATS = ('DXT1', 'DXT5', 'ARGB8')
+
+# DDS文件头标志位
+DDSD_CAPS = 0x1
+DDSD_HEIGHT = 0x2
+DDSD_WIDTH = 0x4
+DDSD_PITCH = 0x8
+DDSD_PIXELFORMAT = 0x1000
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDPF_ALPHAPIXELS = 0x1
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDSCAPS_COMPLEX = 0x8
+DDSCAPS_TEXTURE = 0x1000
+DDSCAPS_MIPMAP = 0x400000
+
+# 每次处理的块数，限制中间数组的内存占用
+CHUNK_BLOCKS = 16384
+
+# 主成分方向的幂迭代次数
+POWER_ITERATIONS = 8
+
+# 按插值位置(从color0到color1)排列的块索引
+FOUR_COLOR_ORDER = np.array([0, 2, 3, 1], dtype=np.uint32)
+THREE_COLOR_ORDER = np.array([0, 2, 1], dtype=np.uint32)
+# 按透明度从a1到a0排列的块索引
+ALPHA_ORDER = np.array([1, 7, 6, 5, 4, 3, 2, 0], dtype=np.uint64)
+
+DXT1_BLOCK = np.dtype([('c0', '<u2'), ('c1', '<u2'), ('indices', '<u4')])
+DXT5_BLOCK = np.dtype([('alpha', '<u8'), ('c0', '<u2'), ('c1', '<u2'), ('indices', '<u4')])
+
+
+def encode(image, fmt='DXT5', mipmaps=True):
+    """把Pillow图像编码为DDS文件内容(bytes)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的DDS格式: {fmt}")
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    rgba = np.asarray(image, dtype=np.uint8)
+
+    levels = [rgba]
+    if mipmaps:
+        while levels[-1].shape[0] > 1 or levels[-1].shape[1] > 1:
+            levels.append(downsample(levels[-1]))
+
+    height, width = rgba.shape[:2]
+    data = [encode_level(level, fmt) for level in levels]
+    return build_header(width, height, fmt, len(levels), len(data[0])) + b''.join(data)
+
+
+def build_header(width, height, fmt, mip_count, top_level_size):
+    flags = DDSD_CAPS | DDSD_HEIGHT | DDSD_WIDTH | DDSD_PIXELFORMAT
+    caps = DDSCAPS_TEXTURE
+    if mip_count > 1:
+        flags |= DDSD_MIPMAPCOUNT
+        caps |= DDSCAPS_COMPLEX | DDSCAPS_MIPMAP
+
+    if fmt == 'ARGB8':
+        flags |= DDSD_PITCH
+        pixel_format = struct.pack('<2I4s5I', 32, DDPF_RGB | DDPF_ALPHAPIXELS, b'\0\0\0\0', 32,
+                                   0x00ff0000, 0x0000ff00, 0x000000ff, 0xff000000)
+        pitch = width * 4
+    else:
+        flags |= DDSD_LINEARSIZE
+        pixel_format = struct.pack('<2I4s5I', 32, DDPF_FOURCC, fmt.encode('ascii'), 0, 0, 0, 0, 0)
+        pitch = top_level_size
+
+    header = struct.pack('<4s7I44x', b'DDS ', 124, flags, height, width, pitch, 0, mip_count)
+    return header + pixel_format + struct.pack('<5I', caps, 0, 0, 0, 0)
+
+
+def downsample(level):
+    """2x2盒式滤波生成下一级mipmap，尺寸按DDS规范向下取整且不小于1"""
+    img = level.astype(np.float32)
+    if img.shape[0] > 1:
+        rows = img.shape[0] // 2 * 2
+        img = (img[0:rows:2] + img[1:rows:2]) * 0.5
+    if img.shape[1] > 1:
+        cols = img.shape[1] // 2 * 2
+        img = (img[:, 0:cols:2] + img[:, 1:cols:2]) * 0.5
+    return np.clip(img + 0.5, 0, 255).astype(np.uint8)
+
+
+def encode_level(rgba, fmt):
+    if fmt == 'ARGB8':
+        # 内存中的字节顺序为 B G R A
+        return np.ascontiguousarray(rgba[..., [2, 1, 0, 3]]).tobytes()
+
+    blocks = to_blocks(rgba)
+    out = np.empty(len(blocks), dtype=DXT1_BLOCK if fmt == 'DXT1' else DXT5_BLOCK)
+    for start in range(0, len(blocks), CHUNK_BLOCKS):
+        chunk = blocks[start:start + CHUNK_BLOCKS]
+        if fmt == 'DXT1':
+            # DXT1只有1位透明度: 含有半透明以下像素的块使用3色+透明模式
+            transparent = chunk[:, :, 3] < 128
+            c0, c1, indices = encode_color(chunk[:, :, :3].astype(np.float32), transparent)
+        else:
+            c0, c1, indices = encode_color(chunk[:, :, :3].astype(np.float32), None)
+            out['alpha'][start:start + len(chunk)] = encode_alpha(chunk[:, :, 3])
+        out['c0'][start:start + len(chunk)] = c0
+        out['c1'][start:start + len(chunk)] = c1
+        out['indices'][start:start + len(chunk)] = indices
+    return out.tobytes()
+
+
+def to_blocks(rgba):
+    """把图像切成4x4块，返回形状为 (块数, 16, 4) 的数组，块按行优先排列"""
+    height, width = rgba.shape[:2]
+    pad_h = (-height) % 4
+    pad_w = (-width) % 4
+    if pad_h or pad_w:
+        rgba = np.pad(rgba, ((0, pad_h), (0, pad_w), (0, 0)), mode='edge')
+    height, width = rgba.shape[:2]
+    blocks = rgba.reshape(height // 4, 4, width // 4, 4, 4).transpose(0, 2, 1, 3, 4)
+    return blocks.reshape(-1, 16, 4)
+
+
+def encode_color(colors, transparent):
+    """编码颜色部分，返回 (color0, color1, 索引)
+
+    端点取块内颜色主成分方向上的投影极值；transparent不为None时为DXT1透明掩码。
+    """
+    if transparent is None:
+        weights = np.ones(colors.shape[:2], dtype=np.float32)
+    else:
+        weights = (~transparent).astype(np.float32)
+    count = np.maximum(weights.sum(axis=1), 1.0)
+
+    mean = (colors * weights[:, :, None]).sum(axis=1) / count[:, None]
+    centered = (colors - mean[:, None, :]) * weights[:, :, None]
+    cov = np.einsum('npi,npj->nij', centered, centered)
+
+    # 幂迭代求协方差矩阵的主特征向量
+    axis = np.full((len(colors), 3), 0.57735026, dtype=np.float32)
+    for _ in range(POWER_ITERATIONS):
+        next_axis = np.einsum('nij,nj->ni', cov, axis)
+        norm = np.linalg.norm(next_axis, axis=1, keepdims=True)
+        axis = np.where(norm > 1e-6, next_axis / np.maximum(norm, 1e-6), axis)
+
+    proj = np.einsum('npi,ni->np', colors - mean[:, None, :], axis)
+    opaque = weights > 0
+    proj_min = np.where(opaque, proj, np.inf).min(axis=1)
+    proj_max = np.where(opaque, proj, -np.inf).max(axis=1)
+    # 全透明块没有有效颜色
+    proj_min = np.where(np.isfinite(proj_min), proj_min, 0.0)
+    proj_max = np.where(np.isfinite(proj_max), proj_max, 0.0)
+
+    hi = quantize565(mean + proj_max[:, None] * axis)
+    lo = quantize565(mean + proj_min[:, None] * axis)
+
+    if transparent is None:
+        three_color = np.zeros(len(colors), dtype=bool)
+    else:
+        three_color = transparent.any(axis=1)
+    # 4色模式要求 color0 > color1，3色模式要求 color0 <= color1
+    c0 = np.where(three_color, np.minimum(hi, lo), np.maximum(hi, lo))
+    c1 = np.where(three_color, np.maximum(hi, lo), np.minimum(hi, lo))
+
+    # 把像素投影到两个端点之间的直线上，按投影位置取最近的插值色
+    e0 = expand565(c0)
+    e1 = expand565(c1)
+    direction = e1 - e0
+    length2 = np.maximum((direction * direction).sum(axis=1), 1e-6)
+    t = np.einsum('npi,ni->np', colors - e0[:, None, :], direction) / length2[:, None]
+    t = np.clip(t, 0.0, 1.0)
+
+    # 4色模式的插值顺序为 e0, 2/3e0+1/3e1, 1/3e0+2/3e1, e1，对应索引 0, 2, 3, 1
+    four_indices = FOUR_COLOR_ORDER[np.rint(t * 3).astype(np.intp)]
+    # 3色模式为 e0, 1/2e0+1/2e1, e1，对应索引 0, 2, 1；索引3表示透明
+    three_indices = THREE_COLOR_ORDER[np.rint(t * 2).astype(np.intp)]
+    indices = np.where(three_color[:, None], three_indices, four_indices)
+    if transparent is not None:
+        indices = np.where(transparent, 3, indices)
+
+    return c0, c1, pack_indices(indices, 2)
+
+
+def encode_alpha(alpha):
+    """编码DXT5透明度块，返回包含两个端点和48位索引的uint64"""
+    alpha = alpha.astype(np.float32)
+    a0 = alpha.max(axis=1)
+    a1 = alpha.min(axis=1)
+
+    # a0 > a1 时为8级插值: a0, a1, (6a0+a1)/7 ... (a0+6a1)/7；a0 == a1 时所有索引为0
+    span = np.maximum(a0 - a1, 1.0)
+    level = np.rint((alpha - a1[:, None]) / span[:, None] * 7).astype(np.intp)
+    indices = ALPHA_ORDER[np.clip(level, 0, 7)]
+    indices = np.where((a0 > a1)[:, None], indices, 0)
+
+    packed = pack_indices(indices, 3).astype(np.uint64)
+    return a0.astype(np.uint64) | (a1.astype(np.uint64) << np.uint64(8)) | (packed << np.uint64(16))
+
+
+def pack_indices(indices, bits):
+    """把每块16个索引按位打包，第i个像素位于第 bits*i 位"""
+    dtype = np.uint64 if bits * 16 > 32 else np.uint32
+    shifts = np.arange(16, dtype=dtype) * dtype(bits)
+    return np.bitwise_or.reduce(indices.astype(dtype) << shifts, axis=1)
+
+
+def quantize565(color):
+    color = np.clip(color, 0, 255)
+    r = np.rint(color[:, 0] * 31 / 255).astype(np.uint16)
+    g = np.rint(color[:, 1] * 63 / 255).astype(np.uint16)
+    b = np.rint(color[:, 2] * 31 / 255).astype(np.uint16)
+    return (r << 11) | (g << 5) | b
+
+
+def expand565(value):
+    value = value.astype(np.uint32)
+    r = (value >> 11) & 31
+    g = (value >> 5) & 63
+    b = value & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=1).astype(np.float32)
@@ -0,0 +1,459 @@
+import os
+import io
+import json
+import time
+import hashlib
+import importlib.util
+from collections import namedtuple
+from concurrent.futures import as_completed
+
+import conversion_cache
+import image_meta
+
+# 本模块不依赖PyQt5，子进程只需导入Pillow即可完成转换
+
+# 增量导出清单，保存在导出的gfx文件夹中
+MANIFEST_NAME = ".gfx_swaper_manifest.json"
+MANIFEST_VERSION = 1
+
+# 单个导出任务: 序号决定结果顺序，与替换配置中的顺序一致
+# options为DDS编码设置 {"dds_format": "auto"/"DXT1"/"DXT5"/"ARGB8", "mipmaps": "auto"/True/False}
+# source_hash为替换文件内容的sha1，cache_dir为转换缓存目录，均由run_export填入
+ExportTask = namedtuple("ExportTask", ["index", "orig_path", "repl_path", "rel_path", "target_path", "options",
+                                       "source_hash", "cache_dir"],
+                        defaults=(None, None, None))
+
+# 单个导出结果: ok为False时error记录失败原因，skipped表示文件未变化无需重新导出，
+# record为写入清单的记录(含输出文件大小)，seconds为导出耗时，
+# reused表示输出直接取自转换缓存或本次导出中内容相同的另一个文件
+ExportResult = namedtuple("ExportResult",
+                          ["index", "orig_path", "target_path", "ok", "error", "skipped", "record", "seconds",
+                           "reused"],
+                          defaults=(False, None, 0.0, False))
+
+DEFAULT_OPTIONS = {"dds_format": "auto", "mipmaps": "auto"}
+
+
+def default_worker_count():
+    """默认导出进程数: 全部CPU核心"""
+    return os.cpu_count() or 1
+
+
+def plan_export(replacement_files, gfx_folder_path, gfx_dir, options=None):
+    """根据替换配置生成导出任务，返回 (任务列表, 无法导出的结果列表)"""
+    tasks = []
+    rejected = []
+    for index, (orig_path, repl_path) in enumerate(replacement_files.items()):
+        # 获取相对于gfx文件夹的相对路径
+        if not gfx_folder_path or not orig_path.startswith(gfx_folder_path):
+            rejected.append(ExportResult(index, orig_path, None, False, "跳过非gfx文件夹下的文件"))
+            continue
+        rel_path = os.path.relpath(orig_path, gfx_folder_path)
+        target_path = os.path.join(gfx_dir, rel_path)
+        tasks.append(ExportTask(index, orig_path, repl_path, rel_path, target_path, options))
+    return tasks, rejected
+
+
+def dds_encoder_available():
+    """内置DDS编码器需要NumPy，只查找模块不导入，避免在界面启动时加载NumPy"""
+    return importlib.util.find_spec("numpy") is not None
+
+
+def resolve_dds_options(orig_path, options=None):
+    """确定DDS输出格式和是否生成mipmap，返回 (格式, 是否生成mipmap)
+
+    设置为auto时读取原文件的DDS文件头，使用与原文件一致的压缩格式和mipmap。
+    """
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    if not dds_encoder_available():
+        return 'ARGB8', False
+
+    fmt = options["dds_format"]
+    mipmaps = options["mipmaps"]
+    if fmt == "auto" or mipmaps == "auto":
+        try:
+            meta = image_meta.probe(orig_path)
+        except Exception:
+            meta = None
+        if fmt == "auto":
+            fmt = dds_format_for(meta)
+        if mipmaps == "auto":
+            mipmaps = meta.mip_count > 1 if meta else True
+    return fmt, bool(mipmaps)
+
+
+def dds_format_for(meta):
+    """选择与原文件最接近的可编码格式"""
+    if meta is None:
+        return 'DXT5'
+    if meta.format in ('DXT1', 'BC1', 'BC1_SRGB'):
+        return 'DXT1'
+    if meta.format.startswith(('ARGB', 'RGB', 'BGR', 'R8', 'L', 'A')):
+        # 原文件未压缩
+        return 'ARGB8'
+    return 'DXT5' if meta.has_alpha else 'DXT1'
+
+
+def conversion_params(orig_path, repl_path, options=None):
+    """返回描述转换方式的字符串，转换参数变化时已导出的文件需要重新生成"""
+    orig_ext = os.path.splitext(orig_path)[1].lower()
+    if orig_ext == os.path.splitext(repl_path)[1].lower():
+        return "copy"
+    if orig_ext == '.dds':
+        fmt, mipmaps = resolve_dds_options(orig_path, options)
+        return f"dds:{fmt}:{'mip' if mipmaps else 'nomip'}"
+    return orig_ext.lstrip('.')
+
+
+def file_digest(file_path):
+    """计算文件内容的sha1"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(gfx_dir):
+    """读取导出清单 {rel_path: 记录}，不存在或格式不符时返回空字典"""
+    manifest_path = os.path.join(gfx_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(gfx_dir, entries):
+    """写入导出清单，先写临时文件再替换，避免中断时损坏"""
+    manifest_path = os.path.join(gfx_dir, MANIFEST_NAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": entries}, f, indent=1, ensure_ascii=False, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+
+def _manifest_key(rel_path):
+    # 清单中统一使用/分隔，不同系统间导出目录可以共用
+    return rel_path.replace(os.sep, '/')
+
+
+def _source_record(task):
+    stat = os.stat(task.repl_path)
+    return {
+        "source": os.path.normpath(task.repl_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "target_ext": os.path.splitext(task.orig_path)[1].lower(),
+        "params": conversion_params(task.orig_path, task.repl_path, task.options),
+    }
+
+
+def filter_up_to_date(tasks, manifest):
+    """从任务中剔除已是最新的文件，返回 (需要导出的任务, 跳过的结果)
+
+    源文件大小和修改时间与清单一致时直接跳过；不一致时再比较内容哈希，
+    只是被touch过的文件不会重新转换。
+    """
+    pending = []
+    skipped = []
+    for task in tasks:
+        entry = manifest.get(_manifest_key(task.rel_path))
+        try:
+            if not entry or not os.path.isfile(task.target_path):
+                raise LookupError
+            if os.path.getsize(task.target_path) != entry.get("output_size"):
+                raise LookupError
+            record = _source_record(task)
+            if any(record[k] != entry.get(k) for k in ("source", "target_ext", "params")):
+                raise LookupError
+            if record["size"] != entry.get("size"):
+                raise LookupError
+            if record["mtime"] != entry.get("mtime"):
+                record["hash"] = file_digest(task.repl_path)
+                if record["hash"] != entry.get("hash"):
+                    raise LookupError
+            else:
+                record["hash"] = entry.get("hash")
+            record["output_size"] = entry["output_size"]
+            skipped.append(ExportResult(task.index, task.orig_path, task.target_path, True, None, True, record))
+        except (LookupError, OSError):
+            pending.append(task)
+    return pending, skipped
+
+
+def remove_stale_outputs(gfx_dir, manifest, tasks):
+    """删除清单中有记录、但已不在替换配置中的导出文件，返回被删除的相对路径"""
+    current = {_manifest_key(task.rel_path) for task in tasks}
+    removed = []
+    for key in manifest:
+        if key in current:
+            continue
+        target_path = os.path.join(gfx_dir, *key.split('/'))
+        try:
+            if os.path.isfile(target_path):
+                os.remove(target_path)
+            removed.append(key)
+            # 清理因此变空的文件夹
+            folder = os.path.dirname(target_path)
+            while os.path.normpath(folder) != os.path.normpath(gfx_dir) and not os.listdir(folder):
+                os.rmdir(folder)
+                folder = os.path.dirname(folder)
+        except OSError as e:
+            print(f"删除过期导出文件失败: {target_path}, 错误: {str(e)}")
+    return removed
+
+
+def build_manifest(results, tasks):
+    """根据本次导出结果生成新的清单，失败的文件不记录，下次会重新导出"""
+    rel_paths = {task.index: task.rel_path for task in tasks}
+    entries = {}
+    for result in results:
+        if result.ok and result.record and result.index in rel_paths:
+            entries[_manifest_key(rel_paths[result.index])] = result.record
+    return entries
+
+
+def encode_image(src_path, target_ext, dds_format='ARGB8', mipmaps=False):
+    """在内存中把图片转换为目标格式，返回文件内容(bytes)"""
+    from PIL import Image
+
+    target_ext = target_ext.lower()
+    img = Image.open(src_path)
+    buffer = io.BytesIO()
+
+    if target_ext == '.dds':
+        # 确保图像是RGBA模式
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        try:
+            if dds_encoder_available():
+                import dds_encoder
+                return dds_encoder.encode(img, dds_format, mipmaps)
+            # 没有NumPy时使用Pillow保存为ARGB8，无mipmap
+            img.save(buffer, format='DDS', dds_format='ARGB8', mipmap=False)
+        except Exception as e:
+            raise Exception(f"DDS转换失败: {str(e)}")
+    elif target_ext == '.tga':
+        img.save(buffer, format='TGA')
+    elif target_ext == '.png':
+        img.save(buffer, format='PNG')
+    else:
+        raise Exception(f"不支持的转换格式: {target_ext}")
+    return buffer.getvalue()
+
+
+def convert_image_format(src_path, dst_path, target_ext, dds_format='ARGB8', mipmaps=False):
+    """转换图片格式到目标扩展名"""
+    data = encode_image(src_path, target_ext, dds_format, mipmaps)
+    with open(dst_path, 'wb') as f:
+        f.write(data)
+
+
+def produce_output(task, record):
+    """生成任务的输出内容，返回 (bytes, 是否取自转换缓存)
+
+    扩展名相同时直接读取替换文件；否则先查找转换缓存，未命中时转换后存入缓存。
+    """
+    orig_ext = os.path.splitext(task.orig_path)[1].lower()
+    if orig_ext == os.path.splitext(task.repl_path)[1].lower():
+        with open(task.repl_path, 'rb') as f:
+            return f.read(), False
+
+    cache = conversion_cache.ConversionCache(task.cache_dir) if task.cache_dir else None
+    if cache is not None:
+        data = cache.read(record["hash"], orig_ext, record["params"])
+        if data is not None:
+            return data, True
+
+    if orig_ext == '.dds':
+        dds_format, mipmaps = resolve_dds_options(task.orig_path, task.options)
+        data = encode_image(task.repl_path, orig_ext, dds_format, mipmaps)
+    else:
+        data = encode_image(task.repl_path, orig_ext)
+    if cache is not None:
+        cache.store(record["hash"], orig_ext, record["params"], data)
+    return data, False
+
+
+def export_one(task, keep_data=False):
+    """执行单个导出任务，输出写入target_path
+
+    keep_data为True时不写文件，返回 (结果, 输出内容)，由调用方写入压缩包。
+    """
+    start = time.perf_counter()
+    data = None
+    try:
+        record = _source_record(task)
+        record["hash"] = task.source_hash or file_digest(task.repl_path)
+        data, reused = produce_output(task, record)
+        record["output_size"] = len(data)
+        if not keep_data:
+            # 创建目标文件夹结构；旧文件可能是与其他输出共享内容的硬链接，先删除再写入
+            os.makedirs(os.path.dirname(task.target_path), exist_ok=True)
+            if os.path.lexists(task.target_path):
+                os.remove(task.target_path)
+            with open(task.target_path, 'wb') as f:
+                f.write(data)
+            data = None
+        result = ExportResult(task.index, task.orig_path, task.target_path, True, None, False, record,
+                              time.perf_counter() - start, reused)
+    except Exception as e:
+        result = ExportResult(task.index, task.orig_path, task.target_path, False, str(e),
+                              seconds=time.perf_counter() - start)
+    return (result, data) if keep_data else result
+
+
+def export_one_in_memory(task):
+    return export_one(task, keep_data=True)
+
+
+def group_duplicates(tasks):
+    """把源文件内容、目标格式和转换参数都相同的任务分为一组
+
+    返回 (每组第一个任务列表, {第一个任务的序号: 同组其余任务列表})，
+    每组只需转换一次，其余输出直接复制。填入每个任务的source_hash。
+    """
+    digests = {}
+    leaders = []
+    followers = {}
+    groups = {}
+    for task in tasks:
+        source = os.path.normcase(os.path.abspath(task.repl_path))
+        try:
+            if source not in digests:
+                digests[source] = file_digest(task.repl_path)
+            task = task._replace(source_hash=digests[source])
+            key = (task.source_hash, os.path.splitext(task.orig_path)[1].lower(),
+                   conversion_params(task.orig_path, task.repl_path, task.options))
+        except OSError:
+            # 读取失败的任务单独执行，由export_one报告错误
+            leaders.append(task)
+            continue
+        leader = groups.get(key)
+        if leader is None:
+            groups[key] = task
+            leaders.append(task)
+        else:
+            followers.setdefault(leader.index, []).append(task)
+    return leaders, followers
+
+
+def copy_duplicate(leader_result, task, archive=None, data=None):
+    """用同组已导出的输出生成另一个任务的输出
+
+    导出到文件夹时创建硬链接或复制，导出到压缩包时再写入一份相同的内容。
+    """
+    start = time.perf_counter()
+    if not leader_result.ok:
+        return ExportResult(task.index, task.orig_path, task.target_path, False, leader_result.error)
+    try:
+        if archive is not None:
+            write_archive_entry(archive, task.target_path, data)
+        else:
+            conversion_cache.link_or_copy(leader_result.target_path, task.target_path)
+        record = _source_record(task)
+        record["hash"] = task.source_hash
+        record["output_size"] = leader_result.record["output_size"]
+        return ExportResult(task.index, task.orig_path, task.target_path, True, None, False, record,
+                            time.perf_counter() - start, True)
+    except Exception as e:
+        return ExportResult(task.index, task.orig_path, task.target_path, False, str(e),
+                            seconds=time.perf_counter() - start)
+
+
+def archive_tasks(tasks, prefix="gfx"):
+    """把任务的目标路径改为压缩包中以/分隔的路径"""
+    return [task._replace(target_path=f"{prefix}/{_manifest_key(task.rel_path)}") for task in tasks]
+
+
+def write_archive_entry(archive, arcname, data):
+    import zipfile
+    # PNG本身已压缩，其余格式(DDS/TGA)用最快的压缩级别
+    if arcname.lower().endswith('.png'):
+        archive.writestr(arcname, data, compress_type=zipfile.ZIP_STORED)
+    else:
+        archive.writestr(arcname, data, compress_type=zipfile.ZIP_DEFLATED, compresslevel=1)
+
+
+def run_export(tasks, workers=None, progress=None, use_cache=True, archive=None):
+    """并行执行导出任务，结果按任务序号排序返回
+
+    内容相同的替换只转换一次；use_cache为True时使用跨会话的转换缓存。
+    archive为打开的zipfile.ZipFile时，输出在内存中生成后直接写入压缩包，
+    此时任务的target_path为压缩包中的路径(见archive_tasks)。
+    progress(done, total) 在每个任务完成后回调，可用于刷新界面；
+    返回True时取消尚未开始的任务。
+    """
+    workers = workers or default_worker_count()
+    total = len(tasks)
+    results = []
+
+    cache = conversion_cache.ConversionCache() if use_cache else None
+    leaders, followers = group_duplicates(tasks)
+    if cache is not None:
+        leaders = [task._replace(cache_dir=cache.cache_dir) for task in leaders]
+    worker = export_one if archive is None else export_one_in_memory
+
+    def finish(output):
+        """记录一组的结果并生成同组其余文件，返回是否取消"""
+        data = None
+        if archive is None:
+            result = output
+        else:
+            result, data = output
+            if result.ok:
+                write_archive_entry(archive, result.target_path, data)
+        results.append(result)
+        for task in followers.get(result.index, []):
+            results.append(copy_duplicate(result, task, archive, data))
+        return progress and progress(len(results), total)
+
+    # 任务很少或只有一个进程时，直接在当前进程执行，省去进程池启动开销
+    if workers <= 1 or len(leaders) <= 1:
+        for task in leaders:
+            if finish(worker(task)):
+                break
+    else:
+        # 进程池模块会导入整个multiprocessing，只在真正需要时导入，不拖慢界面启动
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(leaders))) as pool:
+            futures = [pool.submit(worker, task) for task in leaders]
+            for future in as_completed(futures):
+                if finish(future.result()):
+                    for f in futures:
+                        f.cancel()
+                    break
+
+    if cache is not None:
+        cache.evict()
+    results.sort(key=lambda r: r.index)
+    return results
+
+
+def export_archive(tasks, zip_path, descriptor_text=None, workers=None, progress=None, use_cache=True):
+    """把导出任务直接写入zip压缩包，可同时写入生成的descriptor.mod，返回结果列表
+
+    先写入同目录的临时文件，完成后再替换，中断时不会留下不完整的压缩包。
+    progress取消导出时删除临时文件、保留原有的压缩包，返回的结果少于任务数。
+    """
+    import zipfile
+    temp_path = zip_path + ".tmp"
+    try:
+        with zipfile.ZipFile(temp_path, 'w') as archive:
+            if descriptor_text is not None:
+                archive.writestr("descriptor.mod", descriptor_text.encode('utf-8'),
+                                 compress_type=zipfile.ZIP_DEFLATED)
+            results = run_export(archive_tasks(tasks), workers, progress, use_cache, archive)
+        if len(results) < len(tasks):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, zip_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return results
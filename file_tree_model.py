@@ -0,0 +1,355 @@
+import os
+from array import array
+
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QColor
+
+import image_meta
+
+# gfx文件树的数据模型: 每个文件/文件夹只占节点表中的一行(名称、上级序号、所在行号和几个标志位)，
+# 不再为每个文件创建QTreeWidgetItem；完整路径按需由上级链拼出，视图只为可见的行请求数据
+
+ROOT = 0
+NO_PARENT = -1
+
+MODIFIED_COLOR = QColor(255, 0, 0)
+
+# 文件头尚未读取完成时第二列显示的文字
+PROBING_TEXT = "读取中..."
+
+
+class ProbeSignals(QObject):
+    # (读取任务, {文件节点: ImageMeta或None})
+    probed = pyqtSignal(object, dict)
+
+
+class ProbeTask(QRunnable):
+    """在线程池中读取一个文件夹中图片的文件头"""
+    def __init__(self, generation, folder, files):
+        super().__init__()
+        # 完成信号在run()返回后才被处理，由模型保留引用，不能让线程池删除C++对象
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.folder = folder
+        self.files = files  # [(文件节点, 路径), ...]
+        self.signals = ProbeSignals()
+
+    def run(self):
+        metas = image_meta.probe_many(path for node, path in self.files)
+        self.signals.probed.emit(self, {node: metas.get(path) for node, path in self.files})
+
+
+class GfxTreeModel(QAbstractItemModel):
+    HEADERS = ("文件结构", "尺寸/格式")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 读取文件头的线程池，界面线程的data()中不做任何磁盘读取
+        self.probe_pool = QThreadPool.globalInstance()
+        self.generation = 0
+        self.probe_tasks = []  # 尚未完成的读取任务，保留引用直到它发出完成信号
+        self.clear_nodes("")
+
+    def clear_nodes(self, root_path):
+        # 换文件夹后旧节点的读取结果不再有效
+        self.generation += 1
+        self.root_path = root_path
+        self.names = []
+        self.parents = array('i')
+        self.rows = array('i')  # 在上级文件夹中的行号
+        self.is_dir = bytearray()
+        self.loaded = bytearray()  # 文件夹的内容是否已扫描到
+        self.probed = bytearray()  # 文件夹中图片的文件头是否已开始读取
+        self.modified = bytearray()  # 文件被替换，或文件夹中有被替换的文件
+        self.children = {}  # {文件夹节点: 子节点序号数组}，子文件夹在前，各自按名称排序
+        self.subdir_counts = {}  # {文件夹节点: 子文件夹个数}
+        self.meta = {}  # {文件节点: ImageMeta或None}
+        self.file_count = 0
+
+    def reset(self, root_path):
+        """换为新的gfx文件夹，只有一个尚未扫描的根节点"""
+        self.beginResetModel()
+        self.clear_nodes(root_path)
+        self.new_node(os.path.basename(root_path), NO_PARENT, 0, True)
+        self.endResetModel()
+
+    def new_node(self, name, parent, row, is_dir):
+        node = len(self.names)
+        self.names.append(name)
+        self.parents.append(parent)
+        self.rows.append(row)
+        self.is_dir.append(is_dir)
+        self.loaded.append(False)
+        self.probed.append(False)
+        self.modified.append(False)
+        if is_dir:
+            self.children[node] = array('i')
+            self.subdir_counts[node] = 0
+        else:
+            self.file_count += 1
+        return node
+
+    # ---- 节点和路径 ----
+
+    def path(self, node):
+        parts = []
+        while node != ROOT:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return os.path.join(self.root_path, *reversed(parts))
+
+    def rel_path(self, node):
+        parts = []
+        while node != ROOT:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return "/".join(reversed(parts))
+
+    def find_child(self, folder, name, is_dir):
+        """在文件夹节点中按名称二分查找子节点，找不到时返回None"""
+        children = self.children[folder]
+        subdir_count = self.subdir_counts[folder]
+        low, high = (0, subdir_count) if is_dir else (subdir_count, len(children))
+        while low < high:
+            middle = (low + high) // 2
+            if self.names[children[middle]] < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < (subdir_count if is_dir else len(children)) and self.names[children[low]] == name:
+            return children[low]
+        return None
+
+    def node_of(self, path, is_dir=False):
+        """由完整路径查找节点，不在树中时返回None"""
+        if path == self.root_path:
+            return ROOT if self.names else None
+        if not self.names or not path.startswith(self.root_path + os.sep):
+            return None
+        parts = path[len(self.root_path) + 1:].split(os.sep)
+        node = ROOT
+        for depth, name in enumerate(parts):
+            node = self.find_child(node, name, is_dir or depth < len(parts) - 1)
+            if node is None:
+                return None
+        return node
+
+    def iter_files(self):
+        """按树的顺序返回全部文件 (相对路径, 节点)"""
+        if not self.names:
+            return
+        stack = [(ROOT, "")]
+        while stack:
+            folder, prefix = stack.pop()
+            children = self.children[folder]
+            subdir_count = self.subdir_counts[folder]
+            for node in children[subdir_count:]:
+                yield prefix + self.names[node], node
+            for node in reversed(children[:subdir_count]):
+                stack.append((node, prefix + self.names[node] + "/"))
+
+    def index_of(self, node, column=0):
+        if node == ROOT:
+            return self.createIndex(0, column, ROOT)
+        return self.createIndex(self.rows[node], column, node)
+
+    def node_at(self, index):
+        return index.internalId() if index.isValid() else None
+
+    def list_dir(self, folder):
+        """返回文件夹节点当前的 (子文件夹名列表, 图片文件名列表)"""
+        children = self.children[folder]
+        subdir_count = self.subdir_counts[folder]
+        return ([self.names[node] for node in children[:subdir_count]],
+                [self.names[node] for node in children[subdir_count:]])
+
+    # ---- 修改 ----
+
+    def set_dir_contents(self, folder, subdirs, files):
+        """填入扫描到的文件夹内容(文件夹节点此前为空)"""
+        count = len(subdirs) + len(files)
+        if count:
+            self.beginInsertRows(self.index_of(folder), 0, count - 1)
+        children = self.children[folder]
+        for row, name in enumerate(subdirs):
+            children.append(self.new_node(name, folder, row, True))
+        for row, name in enumerate(files, len(subdirs)):
+            children.append(self.new_node(name, folder, row, False))
+        self.subdir_counts[folder] = len(subdirs)
+        self.loaded[folder] = True
+        if count:
+            self.endInsertRows()
+        else:
+            # 没有内容时只需要更新展开箭头
+            self.dataChanged.emit(self.index_of(folder), self.index_of(folder))
+
+    def insert_child(self, folder, name, is_dir):
+        """按排序位置插入一个新的子节点，返回节点序号"""
+        children = self.children[folder]
+        subdir_count = self.subdir_counts[folder]
+        low, high = (0, subdir_count) if is_dir else (subdir_count, len(children))
+        while low < high and self.names[children[low]] < name:
+            low += 1
+        row = low
+        self.beginInsertRows(self.index_of(folder), row, row)
+        node = self.new_node(name, folder, row, is_dir)
+        children.insert(row, node)
+        if is_dir:
+            self.subdir_counts[folder] = subdir_count + 1
+        self.renumber(folder, row + 1)
+        self.endInsertRows()
+        return node
+
+    def remove_child(self, node):
+        """移除一个节点及其全部下级节点，返回被移除的 (文件夹路径列表, 文件路径列表)"""
+        folder = self.parents[node]
+        row = self.rows[node]
+        self.beginRemoveRows(self.index_of(folder), row, row)
+        del self.children[folder][row]
+        if self.is_dir[node]:
+            self.subdir_counts[folder] -= 1
+        self.renumber(folder, row)
+
+        # 被移除的节点留在表中，名称置为None，不再被任何文件夹引用
+        removed_dirs = []
+        removed_files = []
+        stack = [(node, self.path(node))]
+        while stack:
+            current, current_path = stack.pop()
+            if self.is_dir[current]:
+                removed_dirs.append(current_path)
+                stack.extend((child, os.path.join(current_path, self.names[child]))
+                             for child in self.children.pop(current))
+                del self.subdir_counts[current]
+            else:
+                removed_files.append(current_path)
+                self.meta.pop(current, None)
+                self.file_count -= 1
+            self.names[current] = None
+        self.endRemoveRows()
+        return removed_dirs, removed_files
+
+    def renumber(self, folder, start):
+        children = self.children[folder]
+        for row in range(start, len(children)):
+            self.rows[children[row]] = row
+
+    def set_modified(self, node, modified):
+        if self.modified[node] != modified:
+            self.modified[node] = modified
+            index = self.index_of(node)
+            self.dataChanged.emit(index, index, [Qt.ForegroundRole])
+
+    def set_all_modified(self, nodes):
+        """重新设置全部修改标志，整个视图重绘一次"""
+        self.modified = bytearray(len(self.names))
+        for node in nodes:
+            self.modified[node] = True
+        if self.names:
+            self.dataChanged.emit(self.index_of(ROOT, 0), self.index_of(ROOT, 1), [Qt.ForegroundRole])
+
+    def probe_dir(self, folder):
+        """在线程池中读取文件夹中全部图片的文件头，完成后刷新第二列"""
+        self.probed[folder] = True
+        children = self.children[folder]
+        nodes = [node for node in children[self.subdir_counts[folder]:] if node not in self.meta]
+        if not nodes:
+            return
+        task = ProbeTask(self.generation, folder, [(node, self.path(node)) for node in nodes])
+        task.signals.probed.connect(self.on_dir_probed)
+        self.probe_tasks.append(task)
+        self.probe_pool.start(task)
+
+    def is_probing(self, folder):
+        return any(task.folder == folder and task.generation == self.generation for task in self.probe_tasks)
+
+    def on_dir_probed(self, task, metas):
+        self.probe_tasks.remove(task)
+        task.signals.deleteLater()
+        if task.generation != self.generation:
+            return
+        folder = task.folder
+        # 期间被删除的文件不再加入
+        self.meta.update((node, meta) for node, meta in metas.items() if self.names[node] is not None)
+        if self.names[folder] is None:
+            return
+        files = self.children[folder][self.subdir_counts[folder]:]
+        if files:
+            self.dataChanged.emit(self.index_of(files[0], 1), self.index_of(files[-1], 1), [Qt.DisplayRole])
+
+    def refresh_meta(self, folder):
+        """文件夹中的文件被修改后重新读取文件头"""
+        children = self.children[folder]
+        files = children[self.subdir_counts[folder]:]
+        if not files:
+            return
+        for node in files:
+            self.meta.pop(node, None)
+        self.probe_dir(folder)
+
+    # ---- QAbstractItemModel ----
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not parent.isValid():
+            if row == 0 and self.names:
+                return self.createIndex(0, column, ROOT)
+            return QModelIndex()
+        children = self.children.get(parent.internalId())
+        if children is None or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalId()
+        if node == ROOT:
+            return QModelIndex()
+        return self.index_of(self.parents[node])
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return 1 if self.names else 0
+        if parent.column() > 0:
+            return 0
+        children = self.children.get(parent.internalId())
+        return len(children) if children is not None else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 2
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self.names)
+        node = parent.internalId()
+        if parent.column() > 0 or not self.is_dir[node]:
+            return False
+        # 尚未扫描到的文件夹先显示展开箭头
+        return not self.loaded[node] or len(self.children[node]) > 0
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalId()
+        if role == Qt.DisplayRole:
+            if index.column() == 0:
+                return self.names[node]
+            if self.is_dir[node]:
+                return None
+            meta = self.meta.get(node)
+            if meta is not None:
+                return image_meta.describe(meta)
+            folder = self.parents[node]
+            if not self.probed[folder]:
+                self.probe_dir(folder)
+            return PROBING_TEXT if self.is_probing(folder) else None
+        if role == Qt.ForegroundRole and index.column() == 0 and self.modified[node]:
+            return MODIFIED_COLOR
+        if role == Qt.UserRole:
+            return self.path(node)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
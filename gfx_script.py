@@ -0,0 +1,259 @@
+import os
+import re
+import posixpath
+import json
+import sqlite3
+from collections import namedtuple
+
+import mod_files
+
+# Clausewitz脚本(interface/*.gfx)的解析和sprite索引: 用一个正则一次切出全部记号，
+# 解析为 (键, 运算符, 值) 列表，值为字符串或下一层列表；
+# 从中提取spriteType等定义的name和texturefile，建立sprite名称和纹理文件的双向索引。
+# 每个文件的解析结果按修改时间和大小缓存，未缓存的文件较多时用多进程并行解析。
+
+CACHE_VERSION = 1
+
+# 注释: 字符串中的#不算注释，替换时保留字符串本身
+COMMENT_RE = re.compile(r'("(?:[^"\\]|\\.)*")|#[^\n]*')
+
+# 字符串(含引号)、括号、运算符、普通单词，每个匹配恰有一组非空
+TOKEN_RE = re.compile(r'("(?:[^"\\]|\\.)*")|([{}])|([<>!]?=|[<>])|([^\s{}=<>!"#]+)')
+
+# 未缓存的文件总大小超过此值时才启动进程池，少量文件直接在当前进程解析更快
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+Sprite = namedtuple("Sprite", ["name", "sprite_type", "textures", "source"])
+
+
+def tokenize(text):
+    """返回记号列表，每个记号为 (字符串, 括号, 运算符, 单词) 中恰有一项非空"""
+    if '#' in text:
+        text = COMMENT_RE.sub(r'\1', text)
+    return TOKEN_RE.findall(text)
+
+
+def parse(text):
+    """解析脚本，返回 [(键, 运算符, 值)]；没有键的单独值键和运算符为None
+
+    括号不匹配时尽量解析，不抛出异常。
+    """
+    tokens = tokenize(text)
+    root = []
+    current = root
+    stack = []
+    count = len(tokens)
+    i = 0
+    while i < count:
+        string, brace, operator, word = tokens[i]
+        i += 1
+        if brace == '}':
+            if stack:
+                current = stack.pop()
+            continue
+        if brace == '{':
+            block = []
+            current.append((None, None, block))
+            stack.append(current)
+            current = block
+            continue
+        if operator:
+            continue
+        value = string[1:-1] if string else word
+        if i < count and tokens[i][2]:
+            operator = tokens[i][2]
+            i += 1
+            if i >= count:
+                break
+            string, brace, _, word = tokens[i]
+            i += 1
+            if brace == '{':
+                block = []
+                current.append((value, operator, block))
+                stack.append(current)
+                current = block
+            elif brace == '}':
+                # "key = }" 视为空值并关闭当前块
+                current.append((value, operator, ""))
+                if stack:
+                    current = stack.pop()
+            else:
+                current.append((value, operator, string[1:-1] if string else word))
+        else:
+            current.append((None, None, value))
+    return root
+
+
+def extract_sprites(entries, source=""):
+    """从解析结果中找出所有带name和texturefile的定义块"""
+    sprites = []
+    stack = [entries]
+    while stack:
+        for key, operator, value in stack.pop():
+            if not isinstance(value, list):
+                continue
+            name = None
+            textures = []
+            for child_key, _, child_value in value:
+                if child_key is None or isinstance(child_value, list):
+                    continue
+                lowered = child_key.lower()
+                if lowered == "name":
+                    name = child_value
+                elif lowered.startswith("texturefile"):
+                    # progressbartype等有textureFile1/textureFile2
+                    textures.append(child_value)
+            if name and textures:
+                sprites.append(Sprite(name, key or "", textures, source))
+            stack.append(value)
+    return sprites
+
+
+def parse_file(path):
+    """解析一个.gfx文件，返回其中的sprite列表"""
+    with open(path, 'rb') as f:
+        text = f.read().decode('utf-8-sig', errors='replace')
+    return extract_sprites(parse(text), path)
+
+
+def _parse_for_pool(path):
+    try:
+        return path, [tuple(sprite) for sprite in parse_file(path)], ""
+    except OSError as e:
+        return path, [], str(e)
+
+
+def normalize_texture(path):
+    """纹理路径统一为小写、以/分隔、相对mod根目录的形式"""
+    path = path.replace('\\', '/').lower()
+    if not path:
+        return path
+    # 脚本中常见 gfx//a.dds、./gfx/a.dds 这样的写法，游戏读取时等同于 gfx/a.dds
+    return posixpath.normpath(path).lstrip('/')
+
+
+def find_gfx_scripts(mod_folder):
+    """列出mod的interface文件夹下全部.gfx文件"""
+    scripts = []
+    for folder, dirs, files in os.walk(os.path.join(mod_folder, "interface")):
+        dirs.sort()
+        scripts.extend(os.path.join(folder, name) for name in sorted(files) if name.lower().endswith('.gfx'))
+    return scripts
+
+
+class ScriptCache:
+    """按 (路径, 修改时间, 大小) 缓存每个.gfx文件的sprite列表"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(mod_files.user_cache_dir(), "gfx_scripts.sqlite3")
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != CACHE_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS scripts")
+            self.conn.execute("PRAGMA user_version=%d" % CACHE_VERSION)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scripts (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                sprites TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, path, mtime, size):
+        row = self.conn.execute("SELECT mtime, size, sprites FROM scripts WHERE path = ?", (path,)).fetchone()
+        if row is None or row[0] != mtime or row[1] != size:
+            return None
+        return [Sprite(name, sprite_type, textures, path) for name, sprite_type, textures in json.loads(row[2])]
+
+    def put_many(self, rows):
+        """rows为 [(路径, 修改时间, 大小, sprite列表)]"""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO scripts VALUES (?, ?, ?, ?)", [
+                (path, mtime, size, json.dumps([[s.name, s.sprite_type, s.textures] for s in sprites],
+                                                ensure_ascii=False))
+                for path, mtime, size, sprites in rows
+            ])
+
+
+def parse_scripts(paths, workers=None):
+    """解析多个.gfx文件，返回 ({路径: sprite列表}, [错误信息])，使用并更新解析缓存"""
+    try:
+        cache = ScriptCache()
+    except (sqlite3.Error, OSError) as e:
+        print(f"无法打开脚本解析缓存: {str(e)}")
+        cache = None
+
+    parsed = {}
+    errors = []
+    pending = []
+    try:
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                errors.append(f"{path}: {str(e)}")
+                continue
+            sprites = cache.get(path, stat.st_mtime_ns, stat.st_size) if cache is not None else None
+            if sprites is None:
+                pending.append((path, stat.st_mtime_ns, stat.st_size))
+            else:
+                parsed[path] = sprites
+
+        if (sum(size for _, _, size in pending) >= PARALLEL_MIN_BYTES and len(pending) > 1
+                and (os.cpu_count() or 1) > 1):
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_for_pool, [path for path, _, _ in pending], chunksize=4))
+        else:
+            results = [_parse_for_pool(path) for path, _, _ in pending]
+
+        fresh = []
+        for (path, mtime, size), (_, sprites, error) in zip(pending, results):
+            if error:
+                errors.append(f"{path}: {error}")
+                continue
+            sprites = [Sprite(*sprite) for sprite in sprites]
+            parsed[path] = sprites
+            fresh.append((path, mtime, size, sprites))
+        if cache is not None and fresh:
+            cache.put_many(fresh)
+    except sqlite3.Error as e:
+        print(f"更新脚本解析缓存失败: {str(e)}")
+    finally:
+        if cache is not None:
+            cache.close()
+    return parsed, errors
+
+
+class SpriteIndex:
+    def __init__(self, mod_folder, parsed, errors=()):
+        self.mod_folder = mod_folder
+        self.errors = list(errors)
+        self.sprites = {}  # {sprite名称: [Sprite, ...]}，同名定义按文件顺序保留
+        self.by_texture = {}  # {规范化的纹理路径: [sprite名称, ...]}
+        for path in sorted(parsed):
+            for sprite in parsed[path]:
+                self.sprites.setdefault(sprite.name, []).append(sprite)
+                for texture in sprite.textures:
+                    names = self.by_texture.setdefault(normalize_texture(texture), [])
+                    if sprite.name not in names:
+                        names.append(sprite.name)
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def sprites_of(self, rel_path):
+        """返回引用这个纹理(相对mod根目录的路径)的sprite名称"""
+        return self.by_texture.get(normalize_texture(rel_path), [])
+
+
+def build(mod_folder, workers=None):
+    """解析mod的全部interface/*.gfx，返回SpriteIndex"""
+    parsed, errors = parse_scripts(find_gfx_scripts(mod_folder), workers)
+    return SpriteIndex(mod_folder, parsed, errors)
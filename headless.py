@@ -0,0 +1,172 @@
+"""命令行批处理模式: 不启动界面，直接根据替换配置导出MOD文件
+
+用法:
+    python headless.py 路径/descriptor.mod 替换配置.jsonl 导出目录 [--workers N] [--full] [--no-cache]
+                       [--dds-format 格式] [--mipmaps auto/on/off] [--report 结果.json]
+                       [--target gfx/mod/zip] [--name 补丁名称]
+
+--target mod 在导出目录中同时生成依赖原mod的descriptor.mod；
+--target zip 时导出目录为zip文件路径，纹理直接从内存写入压缩包。
+
+结果以JSON格式输出到标准输出(或--report指定的文件)。
+退出码: 0 全部成功，1 有文件导出失败，2 输入无效。
+"""
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+
+import export_engine
+import mod_files
+import replacement_config
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INVALID = 2
+
+
+def run(descriptor_path, config_path, export_dir, workers=None, incremental=True, options=None, use_cache=True,
+        target="gfx", patch_name=None):
+    """执行扫描、校验和导出，返回 (结果字典, 退出码)"""
+    report = {
+        "descriptor": os.path.normpath(descriptor_path),
+        "config": os.path.normpath(config_path),
+        "export_dir": os.path.normpath(export_dir),
+        "mod": None,
+        "success": 0,
+        "unchanged": 0,
+        "reused": 0,
+        "failed": 0,
+        "removed": [],
+        "errors": [],
+        "files": [],
+    }
+
+    try:
+        if os.path.basename(descriptor_path) != "descriptor.mod":
+            raise ValueError("请选择名为 descriptor.mod 的文件")
+        report["mod"] = mod_files.parse_descriptor(descriptor_path)
+        mod_folder = os.path.dirname(os.path.abspath(descriptor_path))
+        gfx_folder_path = os.path.join(mod_folder, "gfx")
+        if not os.path.isdir(gfx_folder_path):
+            raise ValueError("未找到gfx文件夹")
+
+        config_descriptor, replacements = replacement_config.load_config(config_path)
+        replacements = mod_files.rebase_replacements(
+            replacements, os.path.dirname(config_descriptor), mod_folder)
+    except Exception as e:
+        report["errors"].append(str(e))
+        return report, EXIT_INVALID
+
+    # 校验: 原文件必须在mod的gfx中，替换文件必须存在(按文件夹并行检查)
+    gfx_files = set(mod_files.scan_gfx_files(gfx_folder_path))
+    existing = replacement_config.existing_files(set(replacements.values()))
+    valid_replacements = {}
+    for orig, repl in replacements.items():
+        if orig not in gfx_files:
+            report["files"].append({"original": orig, "ok": False, "error": "原文件不在mod的gfx文件夹中"})
+        elif repl not in existing:
+            report["files"].append({"original": orig, "ok": False, "error": f"替换文件不存在: {repl}"})
+        else:
+            valid_replacements[orig] = repl
+    report["failed"] = len(report["files"])
+
+    mod_name = report["mod"]["name"]
+    descriptor_text = mod_files.build_descriptor(patch_name or mod_files.default_patch_name(mod_name), mod_name)
+    gfx_dir = os.path.join(export_dir, "gfx")
+    if target != "zip":
+        try:
+            os.makedirs(gfx_dir, exist_ok=True)
+            if target == "mod":
+                with open(os.path.join(export_dir, "descriptor.mod"), 'w', encoding='utf-8') as f:
+                    f.write(descriptor_text)
+        except OSError as e:
+            report["errors"].append(f"创建gfx文件夹失败: {str(e)}")
+            return report, EXIT_INVALID
+
+    tasks, results = export_engine.plan_export(valid_replacements, gfx_folder_path, gfx_dir, options)
+    if target == "zip":
+        # 压缩包每次完整生成，不使用增量清单
+        try:
+            results += export_engine.export_archive(tasks, export_dir, descriptor_text,
+                                                    workers=workers, use_cache=use_cache)
+        except OSError as e:
+            report["errors"].append(f"写入压缩包失败: {str(e)}")
+            return report, EXIT_INVALID
+        results.sort(key=lambda r: r.index)
+    else:
+        pending = tasks
+        if incremental:
+            manifest = export_engine.load_manifest(gfx_dir)
+            report["removed"] = export_engine.remove_stale_outputs(gfx_dir, manifest, tasks)
+            pending, up_to_date = export_engine.filter_up_to_date(tasks, manifest)
+            results += up_to_date
+        results += export_engine.run_export(pending, workers=workers, use_cache=use_cache)
+        results.sort(key=lambda r: r.index)
+
+        try:
+            export_engine.save_manifest(gfx_dir, export_engine.build_manifest(results, tasks))
+        except OSError as e:
+            report["errors"].append(f"写入导出清单失败: {str(e)}")
+
+    for result in results:
+        entry = {"original": result.orig_path, "target": result.target_path, "ok": result.ok}
+        if result.ok:
+            report["success"] += 1
+            entry["output_size"] = result.record["output_size"]
+            entry["params"] = result.record["params"]
+            entry["seconds"] = round(result.seconds, 3)
+            if result.skipped:
+                report["unchanged"] += 1
+                entry["unchanged"] = True
+            if result.reused:
+                report["reused"] += 1
+                entry["reused"] = True
+        else:
+            report["failed"] += 1
+            entry["error"] = result.error
+        report["files"].append(entry)
+
+    return report, (EXIT_FAILED if report["failed"] or report["errors"] else EXIT_OK)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HOI4 0代码萌化和和谐工具 - 命令行导出")
+    parser.add_argument("descriptor", help="mod的descriptor.mod文件")
+    parser.add_argument("config", help="导出的替换配置文件(新格式或旧版JSON)")
+    parser.add_argument("export_dir", help="导出目录，将在其中生成gfx文件夹；--target zip 时为zip文件路径")
+    parser.add_argument("--workers", type=int, default=None, help="导出进程数，默认使用全部CPU核心")
+    parser.add_argument("--full", action="store_true", help="重新导出全部文件，不使用增量导出")
+    parser.add_argument("--no-cache", action="store_true", help="不使用跨会话的格式转换缓存")
+    parser.add_argument("--dds-format", choices=("auto", "DXT1", "DXT5", "ARGB8"), default="auto",
+                        help="转换为DDS时的格式，默认与原文件一致")
+    parser.add_argument("--mipmaps", choices=("auto", "on", "off"), default="auto",
+                        help="转换为DDS时是否生成mipmap，默认与原文件一致")
+    parser.add_argument("--report", help="把JSON结果写入此文件而不是标准输出")
+    parser.add_argument("--target", choices=("gfx", "mod", "zip"), default="gfx",
+                        help="gfx: 只生成gfx文件夹；mod: 同时生成descriptor.mod；zip: 直接写入zip压缩包")
+    parser.add_argument("--name", help="生成的descriptor.mod中的补丁名称，默认为原mod名称加\"图像替换\"")
+    args = parser.parse_args(argv)
+
+    options = {
+        "dds_format": args.dds_format,
+        "mipmaps": {"auto": "auto", "on": True, "off": False}[args.mipmaps],
+    }
+    report, exit_code = run(args.descriptor, args.config, args.export_dir,
+                            workers=args.workers, incremental=not args.full, options=options,
+                            use_cache=not args.no_cache, target=args.target, patch_name=args.name)
+    report["exit_code"] = exit_code
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+    else:
+        json.dump(report, sys.stdout, indent=4, ensure_ascii=False)
+        sys.stdout.write("\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,58 @@
+from PyQt5.QtGui import QImage, qRgba
+
+# Pillow图像到QImage的转换: 按Qt要求的4字节行对齐从Pillow导出一次像素数据，
+# QImage直接引用这块缓冲区，之后不再复制；各种模式尽量保留透明度。
+# 导出的这一次复制无法省去: Pillow内部逐行分配内存(大图还会分成多块)，RGB每像素也占4字节，
+# 没有QImage能直接使用的连续缓冲区，所以转换时内存峰值是Pillow图像加一份导出的像素。
+
+# Pillow模式 -> (导出的rawmode, 每像素字节数, QImage格式)
+DIRECT_FORMATS = {
+    'RGBA': ('RGBA', 4, QImage.Format_RGBA8888),
+    'RGBa': ('RGBa', 4, QImage.Format_RGBA8888_Premultiplied),
+    'RGBX': ('RGBX', 4, QImage.Format_RGBX8888),
+    'RGB': ('RGB', 3, QImage.Format_RGB888),
+    'L': ('L', 1, QImage.Format_Grayscale8),
+    'I;16': ('I;16', 2, QImage.Format_Grayscale16),
+}
+
+
+def pil_to_qimage(pil_image):
+    """把Pillow图像转换为QImage，像素数据复制一次
+
+    返回的QImage引用的缓冲区保存在它的 _buffer 属性上，
+    只要这个QImage对象存在，像素数据就有效；Pillow图像随后可以立即释放。
+    """
+    mode = pil_image.mode
+
+    if mode == 'P':
+        if 'transparency' in pil_image.info or pil_image.palette.mode == 'RGBA':
+            # 带透明色的调色板图转为RGBA，保留透明度
+            pil_image = pil_image.convert('RGBA')
+        else:
+            return _indexed_to_qimage(pil_image)
+    elif mode == 'I;16B':
+        pil_image = pil_image.convert('I;16')
+    elif mode not in DIRECT_FORMATS:
+        # LA、PA、CMYK、I、F等Qt没有对应格式的模式统一转为RGBA
+        pil_image = pil_image.convert('RGBA')
+
+    rawmode, pixel_bytes, qt_format = DIRECT_FORMATS[pil_image.mode]
+    return _wrap(pil_image, rawmode, pixel_bytes, qt_format)
+
+
+def _wrap(pil_image, rawmode, pixel_bytes, qt_format):
+    width, height = pil_image.size
+    bytes_per_line = (width * pixel_bytes + 3) & ~3
+    buffer = pil_image.tobytes('raw', rawmode, bytes_per_line)
+    qimage = QImage(buffer, width, height, bytes_per_line, qt_format)
+    qimage._buffer = buffer
+    return qimage
+
+
+def _indexed_to_qimage(pil_image):
+    qimage = _wrap(pil_image, 'P', 1, QImage.Format_Indexed8)
+    palette = pil_image.getpalette('RGB') or []
+    colors = [qRgba(palette[i], palette[i + 1], palette[i + 2], 255) for i in range(0, len(palette), 3)]
+    colors += [qRgba(0, 0, 0, 255)] * (256 - len(colors))
+    qimage.setColorTable(colors)
+    return qimage
@@ -0,0 +1,94 @@
+import os
+import threading
+from collections import OrderedDict
+
+# 进程内共享的已解码图片LRU缓存，按字节数限制总内存。
+# 缓存项以 (文件路径, 用途) 为键，记录文件的修改时间和大小，文件变化后自动失效。
+
+DEFAULT_LIMIT_MB = 256
+
+
+class ImageCache:
+    def __init__(self, limit_mb=DEFAULT_LIMIT_MB):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # {(路径, 用途): (修改时间, 文件大小, 值, 字节数)}
+        self.max_bytes = limit_mb * 1024 * 1024
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def set_limit_mb(self, limit_mb):
+        with self.lock:
+            self.max_bytes = limit_mb * 1024 * 1024
+            self.evict()
+
+    def get(self, file_path, purpose):
+        """返回缓存的值，没有缓存或文件已变化时返回None"""
+        key = (file_path, purpose)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            stat = None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and stat is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self.remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, file_path, purpose, value, nbytes):
+        """写入缓存，超过内存上限时从最久未使用的项开始淘汰"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        key = (file_path, purpose)
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            if nbytes > self.max_bytes:
+                return
+            self.entries[key] = (stat.st_mtime_ns, stat.st_size, value, nbytes)
+            self.total_bytes += nbytes
+            self.evict()
+
+    def invalidate(self, file_path):
+        """删除某个文件的全部缓存项"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == file_path]:
+                self.remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry[3]
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key = next(iter(self.entries))
+            self.remove(key)
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "used_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# 进程内共享的缓存实例
+shared_cache = ImageCache()
@@ -0,0 +1,187 @@
+import os
+import struct
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# 只读取文件头的图片信息探测，不解码像素。支持DDS(含DX10扩展头)、TGA和PNG。
+
+ImageMeta = namedtuple("ImageMeta", ["width", "height", "format", "mip_count", "has_alpha"])
+
+# DDS标志位
+DDSD_MIPMAPCOUNT = 0x20000
+DDPF_ALPHAPIXELS = 0x1
+DDPF_ALPHA = 0x2
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDPF_LUMINANCE = 0x20000
+
+# FourCC -> (格式名, 是否有透明通道)
+DDS_FOURCC_FORMATS = {
+    b'DXT1': ("DXT1", False),
+    b'DXT2': ("DXT2", True),
+    b'DXT3': ("DXT3", True),
+    b'DXT4': ("DXT4", True),
+    b'DXT5': ("DXT5", True),
+    b'ATI1': ("BC4", False),
+    b'BC4U': ("BC4", False),
+    b'BC4S': ("BC4", False),
+    b'ATI2': ("BC5", False),
+    b'BC5U': ("BC5", False),
+    b'BC5S': ("BC5", False),
+}
+
+# DXGI_FORMAT -> (格式名, 是否有透明通道)
+DXGI_FORMATS = {
+    2: ("RGBA32F", True),
+    10: ("RGBA16F", True),
+    11: ("RGBA16", True),
+    24: ("RGB10A2", True),
+    27: ("RGBA8", True),
+    28: ("RGBA8", True),
+    29: ("RGBA8_SRGB", True),
+    61: ("R8", False),
+    70: ("BC1", False),
+    71: ("BC1", False),
+    72: ("BC1_SRGB", False),
+    73: ("BC2", True),
+    74: ("BC2", True),
+    75: ("BC2_SRGB", True),
+    76: ("BC3", True),
+    77: ("BC3", True),
+    78: ("BC3_SRGB", True),
+    79: ("BC4", False),
+    80: ("BC4", False),
+    81: ("BC4_SNORM", False),
+    82: ("BC5", False),
+    83: ("BC5", False),
+    84: ("BC5_SNORM", False),
+    87: ("BGRA8", True),
+    88: ("BGRX8", False),
+    90: ("BGRA8", True),
+    91: ("BGRA8_SRGB", True),
+    94: ("BC6H", False),
+    95: ("BC6H_UF16", False),
+    96: ("BC6H_SF16", False),
+    97: ("BC7", True),
+    98: ("BC7", True),
+    99: ("BC7_SRGB", True),
+}
+
+TGA_TYPES = {1: "P", 2: "RGB", 3: "L", 9: "P", 10: "RGB", 11: "L"}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_COLOR_TYPES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+
+# 文件数少于此值时顺序读取，省去线程池开销
+PARALLEL_THRESHOLD = 32
+
+
+def probe(file_path):
+    """读取图片文件头，返回ImageMeta；格式无法识别时抛出ValueError"""
+    with open(file_path, 'rb') as f:
+        head = f.read(148)
+        if head[:4] == b'DDS ':
+            return _probe_dds(head)
+        if head[:8] == PNG_SIGNATURE:
+            return _probe_png(f, head)
+        if os.path.splitext(file_path)[1].lower() == '.tga':
+            return _probe_tga(head)
+    raise ValueError("无法识别的图片格式")
+
+
+def probe_many(paths, workers=8):
+    """批量探测图片信息，返回 {路径: ImageMeta}，读取失败的文件值为None"""
+    def safe_probe(path):
+        try:
+            return probe(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    paths = list(paths)
+    if len(paths) < PARALLEL_THRESHOLD or workers <= 1:
+        return {path: safe_probe(path) for path in paths}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(safe_probe, paths, chunksize=64)))
+
+
+def describe(meta):
+    """把ImageMeta格式化为简短文字，用于界面显示"""
+    text = f"{meta.width}x{meta.height} {meta.format}"
+    if meta.mip_count > 1:
+        text += f" mip{meta.mip_count}"
+    return text
+
+
+def _probe_dds(head):
+    if len(head) < 128:
+        raise ValueError("DDS文件头不完整")
+    flags, height, width = struct.unpack_from('<3I', head, 8)
+    mip_count = struct.unpack_from('<I', head, 28)[0] if flags & DDSD_MIPMAPCOUNT else 1
+    pf_flags, fourcc, bit_count = struct.unpack_from('<I4sI', head, 80)
+    a_mask = struct.unpack_from('<I', head, 104)[0]
+
+    if pf_flags & DDPF_FOURCC:
+        if fourcc == b'DX10':
+            if len(head) < 148:
+                raise ValueError("DDS DX10扩展头不完整")
+            dxgi_format = struct.unpack_from('<I', head, 128)[0]
+            fmt, has_alpha = DXGI_FORMATS.get(dxgi_format, (f"DXGI_{dxgi_format}", False))
+        else:
+            fmt, has_alpha = DDS_FOURCC_FORMATS.get(fourcc, (fourcc.decode('latin-1').strip('\0 '), False))
+    elif pf_flags & DDPF_RGB:
+        has_alpha = bool(pf_flags & DDPF_ALPHAPIXELS and a_mask)
+        fmt = f"{'ARGB' if has_alpha else 'RGB'}{bit_count}"
+    elif pf_flags & DDPF_LUMINANCE:
+        has_alpha = bool(pf_flags & DDPF_ALPHAPIXELS and a_mask)
+        fmt = f"{'LA' if has_alpha else 'L'}{bit_count}"
+    elif pf_flags & DDPF_ALPHA:
+        has_alpha = True
+        fmt = f"A{bit_count}"
+    else:
+        raise ValueError("无法识别的DDS像素格式")
+    return ImageMeta(width, height, fmt, max(1, mip_count), has_alpha)
+
+
+def _probe_tga(head):
+    if len(head) < 18:
+        raise ValueError("TGA文件头不完整")
+    id_length, cmap_type, image_type = struct.unpack_from('<3B', head, 0)
+    cmap_entry_size = head[7]
+    width, height, depth, descriptor = struct.unpack_from('<2H2B', head, 12)
+    if image_type not in TGA_TYPES or width == 0 or height == 0:
+        raise ValueError("无法识别的TGA格式")
+
+    kind = TGA_TYPES[image_type]
+    if kind == "P":
+        has_alpha = cmap_entry_size == 32
+    else:
+        has_alpha = bool(descriptor & 0x0F) or depth == 32
+    fmt = f"{kind}{'A' if has_alpha and kind != 'P' else ''}{depth}"
+    if image_type >= 9:
+        fmt += "_RLE"
+    return ImageMeta(width, height, fmt, 1, has_alpha)
+
+
+def _probe_png(f, head):
+    if head[12:16] != b'IHDR':
+        raise ValueError("PNG缺少IHDR")
+    width, height, bit_depth, color_type = struct.unpack_from('>2I2B', head, 16)
+    has_alpha = color_type in (4, 6)
+
+    # 没有透明通道的格式还可能用tRNS块表示透明，逐块跳过直到IDAT
+    if not has_alpha:
+        f.seek(8 + 8 + 13 + 4)
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', chunk)
+            if chunk_type == b'tRNS':
+                has_alpha = True
+                break
+            if chunk_type in (b'IDAT', b'IEND'):
+                break
+            f.seek(length + 4, os.SEEK_CUR)
+
+    fmt = f"{PNG_COLOR_TYPES.get(color_type, '?')}{bit_depth}"
+    return ImageMeta(width, height, fmt, 1, has_alpha)
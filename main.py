@@ -1,16 +1,40 @@
 import os
-import re
-import json
-import shutil
+import sys
+import time
+
+# 启动计时从导入本模块开始，窗口可以操作时报告
+STARTUP_BEGIN = time.perf_counter()
+
+import struct
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QSplitter, QWidget, QVBoxLayout, 
-                            QHBoxLayout, QLabel, QPushButton, QFileDialog, QTreeWidget, 
-                            QTreeWidgetItem, QTextEdit, QGraphicsView, QGraphicsScene, 
+                            QHBoxLayout, QLabel, QPushButton, QFileDialog, QTreeView, 
+                            QTextEdit, QGraphicsView, QGraphicsScene, 
                             QGraphicsPixmapItem, QSizePolicy, QMessageBox, QGraphicsLineItem,
-                            QFrame, QDialog)
-from PyQt5.QtCore import Qt, QDir, QSize, QFileInfo, QMimeData
-from PyQt5.QtGui import (QPixmap, QImage, QImageReader, QColor, QFont, 
+                            QFrame, QDialog, QSpinBox, QProgressDialog,
+                            QCheckBox, QHeaderView, QComboBox, QLineEdit, QListWidget,
+                            QListWidgetItem, QTableView)
+from PyQt5.QtCore import (Qt, QDir, QSize, QFileInfo, QMimeData, QThread, pyqtSignal, QObject,
+                          QRunnable, QThreadPool, QFileSystemWatcher, QTimer,
+                          QAbstractTableModel, QModelIndex)
+from PyQt5.QtGui import (QPixmap, QImageReader, QColor, QFont, 
                         QDragEnterEvent, QDropEvent)
 
+import bulk_mapping
+import export_engine
+import file_tree_model
+import gfx_script
+import mod_files
+import image_bridge
+import image_cache
+import image_meta
+import replacement_check
+import replacement_config
+import scan_index
+import search_index
+import session
+import thumbnail_cache
+import workshop_index
+
 class HelpDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -34,9 +58,14 @@ class HelpDialog(QDialog):
         <h3>使用说明：</h3>
         <ul>
             <li>点选特定文件可快速替换对应文件，您不需要手动保持名称或格式一致，工具会自动完成替换和格式修改</li>
-            <li>导出和导入配置功能会记录绝对路径，因此请不要移动图片文件或mod文件，否则将不得不重新选择</li>
+            <li>"批量对应替换文件夹"可以按相同相对路径、相同文件名(不同扩展名)或通配符/正则改写规则，把整个文件夹的图片一次对应到gfx文件，预览确认后应用</li>
+            <li>导出的替换配置(.jsonl)按相对mod文件夹和替换图片文件夹的路径保存，把配置文件和图片一起移动或更换盘符后仍可导入；旧版.json配置仍可读取</li>
             <li>用文件资源管理器导航到steam安装路径\steamapps\workshop\content\394360\modid（您可以在创意工坊链接的末尾找到modid，应当是一串9位或10位数字）</li>
             <li>点选"导出mod文件"会要求您选择一个文件夹。工具会在该文件夹下生成gfx文件夹。您应当将gfx文件夹复制到您在启动器创建的mod的文件夹中。并在您mod的descriptor.mod中加入dependencies={"xxx"}，其中xxx为屏幕上方显示的mod名称。</li>
+            <li>导出方式选择"完整mod文件夹"或"zip压缩包"时，工具会自动生成带有dependencies的descriptor.mod，不需要再手动编辑。</li>
+            <li>预览窗口中可以用滚轮缩放、拖动平移、双击恢复适应窗口；平时只解码与窗口大小相当的缩小图(DDS直接读取合适的mipmap)，放大超过缩小图的分辨率时才加载原图</li>
+            <li>"检查替换文件"会在导出前用多个进程检查全部替换图片: 无法读取、尺寸与原文件不同、宽高不是4的倍数(DXT压缩要求)、缺少透明通道或几乎全透明等，结果可按列排序，双击定位到原文件，也可保存为JSON报告</li>
+            <li>关闭工具时会保存当前mod和全部替换设置，下次启动时自动恢复。</li>
             <li>然后，您可以启动游戏进行测试。</li>
         </ul>
 
@@ -122,139 +151,627 @@ class DropContainer(QFrame):
             if os.path.isfile(file_path):
                 ext = os.path.splitext(file_path)[1].lower()
                 if ext in ('.png', '.dds', '.tga'):
-                    self.parent_app.replacement_files[self.parent_app.current_selected_file] = file_path
+                    self.parent_app.set_replacement(self.parent_app.current_selected_file, file_path)
                     self.parent_app.display_file_info(self.parent_app.current_selected_file)
-                    self.parent_app.update_file_tree_colors()
                     break
                 else:
                     QMessageBox.warning(self, "错误", "只支持.png, .dds和.tga格式的图片文件")
 
-class FileViewerApp(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        # ... (之前的初始化代码保持不变)
+class MappingTableModel(QAbstractTableModel):
+    """批量对应的预览表格，只为可见的行提供数据"""
+    HEADERS = ("gfx文件", "替换文件", "规则")
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.mappings = []
+        self.rule_names = []
+    
+    def set_mappings(self, mappings, rule_names):
+        self.beginResetModel()
+        self.mappings = mappings
+        self.rule_names = rule_names
+        self.endResetModel()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.mappings)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 3
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        mapping = self.mappings[index.row()]
+        if index.column() == 0:
+            return mapping.gfx_path
+        if index.column() == 1:
+            return mapping.replacement_path
+        return self.rule_names[mapping.rule]
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+class BulkMappingDialog(QDialog):
+    """选择替换文件夹和对应规则，预览后一次性应用全部对应关系"""
+    
+    def __init__(self, gfx_paths, replaced_paths, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("批量对应替换文件夹")
+        self.setGeometry(200, 200, 900, 600)
+        self.gfx_paths = gfx_paths  # gfx中全部图片的相对路径(以/分隔)
+        self.replaced_paths = replaced_paths  # 已经设置了替换的相对路径
+        self.replacement_folder = ""
+        self.replacement_paths = []
+        self.mappings = []
         
-        # 在顶部控制栏添加导出MOD按钮
-        self.export_mod_btn = QPushButton("导出MOD文件")
-        self.export_mod_btn.clicked.connect(self.export_mod_files)
-        self.top_layout.addWidget(self.export_mod_btn)
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        folder_layout = QHBoxLayout()
+        self.folder_edit = QLineEdit()
+        self.folder_edit.setReadOnly(True)
+        self.folder_edit.setPlaceholderText("选择包含替换图片的文件夹")
+        folder_btn = QPushButton("选择文件夹")
+        folder_btn.clicked.connect(self.select_folder)
+        folder_layout.addWidget(self.folder_edit)
+        folder_layout.addWidget(folder_btn)
+        layout.addLayout(folder_layout)
+        
+        # 改写规则优先，其次按勾选的内置规则依次匹配
+        rewrite_layout = QHBoxLayout()
+        self.rewrite_kind_combo = QComboBox()
+        self.rewrite_kind_combo.addItem(bulk_mapping.RULE_NAMES["glob"], "glob")
+        self.rewrite_kind_combo.addItem(bulk_mapping.RULE_NAMES["regex"], "regex")
+        self.rewrite_pattern_edit = QLineEdit()
+        self.rewrite_pattern_edit.setPlaceholderText("替换文件路径, 例: goals/*.png")
+        self.rewrite_template_edit = QLineEdit()
+        self.rewrite_template_edit.setPlaceholderText("对应的gfx路径, 例: interface/goals/goal_*.dds")
+        rewrite_layout.addWidget(self.rewrite_kind_combo)
+        rewrite_layout.addWidget(self.rewrite_pattern_edit)
+        rewrite_layout.addWidget(QLabel("→"))
+        rewrite_layout.addWidget(self.rewrite_template_edit)
+        layout.addLayout(rewrite_layout)
+        
+        rules_layout = QHBoxLayout()
+        self.rule_checks = []
+        for kind, checked in (("path", True), ("stem", True), ("name", False)):
+            check = QCheckBox(bulk_mapping.RULE_NAMES[kind])
+            check.setChecked(checked)
+            self.rule_checks.append((kind, check))
+            rules_layout.addWidget(check)
+        self.overwrite_check = QCheckBox("覆盖已设置的替换")
+        rules_layout.addWidget(self.overwrite_check)
+        rules_layout.addStretch()
+        preview_btn = QPushButton("预览")
+        preview_btn.clicked.connect(self.preview)
+        rules_layout.addWidget(preview_btn)
+        layout.addLayout(rules_layout)
+        
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+        
+        self.table_model = MappingTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+        
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+        self.apply_btn = QPushButton("应用")
+        self.apply_btn.setEnabled(False)
+        self.apply_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("取消")
+        cancel_btn.clicked.connect(self.reject)
+        buttons_layout.addWidget(self.apply_btn)
+        buttons_layout.addWidget(cancel_btn)
+        layout.addLayout(buttons_layout)
+    
+    def select_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择替换文件夹", "", QFileDialog.ShowDirsOnly)
+        if folder:
+            self.set_folder(os.path.normpath(folder))
+    
+    def set_folder(self, folder):
+        self.replacement_folder = folder
+        self.folder_edit.setText(folder)
+        self.replacement_paths = bulk_mapping.list_replacement_files(folder)
+        self.preview()
+    
+    def rules(self):
+        rules = []
+        pattern = self.rewrite_pattern_edit.text().strip()
+        if pattern:
+            rules.append(bulk_mapping.Rule(self.rewrite_kind_combo.currentData(), pattern,
+                                           self.rewrite_template_edit.text().strip()))
+        rules += [bulk_mapping.Rule(kind) for kind, check in self.rule_checks if check.isChecked()]
+        return rules
+    
+    def preview(self):
+        if not self.replacement_folder:
+            return
+        rules = self.rules()
+        exclude = () if self.overwrite_check.isChecked() else self.replaced_paths
+        try:
+            self.mappings, unmatched = bulk_mapping.match(self.gfx_paths, self.replacement_paths, rules, exclude)
+        except ValueError as e:
+            QMessageBox.warning(self, "规则错误", str(e))
+            return
+        self.table_model.set_mappings(self.mappings, [bulk_mapping.RULE_NAMES[rule.kind] for rule in rules])
+        self.status_label.setText(f"替换文件夹中共 {len(self.replacement_paths)} 张图片，"
+                                  f"对应到 {len(self.mappings)} 个gfx文件，{len(unmatched)} 张未匹配")
+        self.apply_btn.setEnabled(bool(self.mappings))
+
+class CheckTableModel(QAbstractTableModel):
+    """替换文件检查结果表格，点击表头排序"""
+    HEADERS = ("级别", "问题", "原文件", "替换文件")
+    
+    def __init__(self, issues, parent=None):
+        super().__init__(parent)
+        self.issues = list(issues)
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.issues)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 4
+    
+    def column_text(self, issue, column):
+        if column == 0:
+            return replacement_check.SEVERITY_NAMES.get(issue.severity, issue.severity)
+        if column == 1:
+            return issue.message
+        return issue.orig_path if column == 2 else issue.repl_path
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        issue = self.issues[index.row()]
+        if role == Qt.DisplayRole:
+            return self.column_text(issue, index.column())
+        if role == Qt.ForegroundRole and index.column() == 0 and issue.severity == "error":
+            return QColor(200, 0, 0)
+        return None
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+    
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        if column == 0:
+            # 按级别排序时错误在前，同级别按问题类型
+            key = lambda issue: (issue.severity != "error", issue.code, issue.orig_path)
+        elif column == 1:
+            key = lambda issue: (issue.code, issue.message, issue.orig_path)
+        else:
+            key = lambda issue: self.column_text(issue, column).lower()
+        self.issues.sort(key=key, reverse=order == Qt.DescendingOrder)
+        self.layoutChanged.emit()
+
+class CheckReportDialog(QDialog):
+    """显示替换文件检查结果，双击定位到原文件，可保存为JSON报告"""
+    
+    def __init__(self, issues, checked, seconds, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("替换文件检查结果")
+        self.setGeometry(200, 200, 1000, 600)
+        self.issues = issues
+        self.checked = checked
+        self.seconds = seconds
+        self.selected_path = None
+        
+        layout = QVBoxLayout()
+        self.setLayout(layout)
         
-        # ... (其余初始化代码保持不变)
+        errors = sum(1 for issue in issues if issue.severity == "error")
+        layout.addWidget(QLabel(f"检查了 {checked} 个替换文件，用时 {seconds:.1f} 秒: "
+                                f"{errors} 个错误，{len(issues) - errors} 个警告。双击一行可定位到原文件"))
+        
+        self.table_model = CheckTableModel(issues, self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, Qt.AscendingOrder)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 60)
+        self.table.setColumnWidth(1, 320)
+        self.table.setColumnWidth(2, 300)
+        self.table.doubleClicked.connect(self.on_row_activated)
+        layout.addWidget(self.table)
+        
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+        save_btn = QPushButton("保存JSON报告")
+        save_btn.clicked.connect(self.save_report)
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.reject)
+        buttons_layout.addWidget(save_btn)
+        buttons_layout.addWidget(close_btn)
+        layout.addLayout(buttons_layout)
+    
+    def on_row_activated(self, index):
+        self.selected_path = self.table_model.issues[index.row()].orig_path
+        self.accept()
+    
+    def save_report(self):
+        report_path, _ = QFileDialog.getSaveFileName(self, "保存检查报告", "replacement_check.json",
+                                                     "JSON 文件 (*.json)")
+        if not report_path:
+            return
+        try:
+            replacement_check.write_report(report_path, self.issues, self.checked, self.seconds)
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"保存报告失败: {str(e)}")
+
+# 预览缩略图可选的边长
+THUMBNAIL_EDGES = (256, 512, 1024, 2048)
+
+# 文件变化的防抖时间(毫秒)
+FS_CHANGE_DEBOUNCE_MS = 300
+
+# 替换文件超过这个数量时只监视当前选中的文件及其替换文件，
+# 每个被监视的文件都占用一个系统句柄，批量添加几万个会让界面卡顿数秒
+WATCHED_REPLACEMENTS_LIMIT = 2000
+
+# 搜索结果列表最多显示的条数
+SEARCH_RESULT_LIMIT = 500
+
+# 文件信息中最多列出的sprite名称数
+SPRITE_NAMES_SHOWN = 5
+
+class PreviewView(QGraphicsView):
+    """预览视图: 滚轮缩放、拖动平移、双击恢复适应窗口
+
+    预览图按原图尺寸缩放显示，放大到预览图的一个像素占超过一个屏幕像素时发出zoomed_in，
+    由主窗口加载原图替换，平时只解码与窗口大小相当的缩小图。
+    """
+    zoomed_in = pyqtSignal()
+    
+    ZOOM_STEP = 1.25
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.file_path = None
+        self.pixmap_item = None
+        self.full_resolution = False
+    
+    def set_image(self, file_path, pixmap_item, full_resolution):
+        self.file_path = file_path
+        self.pixmap_item = pixmap_item
+        self.full_resolution = full_resolution
+    
+    def clear_image(self):
+        self.set_image(None, None, False)
+    
+    def wheelEvent(self, event):
+        if self.pixmap_item is None:
+            super().wheelEvent(event)
+            return
+        factor = self.ZOOM_STEP if event.angleDelta().y() > 0 else 1 / self.ZOOM_STEP
+        self.scale(factor, factor)
+        if not self.full_resolution and self.transform().m11() * self.pixmap_item.scale() > 1:
+            self.full_resolution = True
+            self.zoomed_in.emit()
+    
+    def mouseDoubleClickEvent(self, event):
+        if self.scene() is not None:
+            self.fitInView(self.scene().itemsBoundingRect(), Qt.KeepAspectRatio)
+        super().mouseDoubleClickEvent(event)
+
+class PreviewSignals(QObject):
+    # (加载任务, QImage, 错误信息)
+    loaded = pyqtSignal(object, object, str)
+
+class PreviewLoader(QRunnable):
+    """在线程池中解码一张预览图片"""
+    def __init__(self, app, generation, file_path, edge, is_original):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.app = app
+        self.generation = generation
+        self.file_path = file_path
+        self.edge = edge
+        self.is_original = is_original
+        self.signals = PreviewSignals()
+    
+    def run(self):
+        # 选择已经变化时不再解码
+        if self.generation != self.app.preview_generation:
+            self.signals.loaded.emit(self, None, "")
+            return
+        try:
+            image = self.app.load_preview_image(self.file_path, self.edge)
+            self.signals.loaded.emit(self, image, "")
+        except Exception as e:
+            self.signals.loaded.emit(self, None, str(e))
+
+class FuzzySearchSignals(QObject):
+    # (搜索任务, fuzzy_lines的结果，取消时为None)
+    searched = pyqtSignal(object, object)
+
+class FuzzySearchTask(QRunnable):
+    """在后台线程中做模糊匹配，输入变化后在扫描下一块之前停止"""
+    def __init__(self, app, generation, index, query):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.app = app
+        self.generation = generation
+        self.index = index
+        self.query = query
+        self.signals = FuzzySearchSignals()
+    
+    def run(self):
+        fuzzy = self.index.fuzzy_lines(self.query, lambda: self.generation != self.app.search_generation)
+        self.signals.searched.emit(self, fuzzy)
+
+class ExportThread(QThread):
+    """后台执行导出，转换在进程池中进行，界面线程只接收进度；requestInterruption后取消尚未开始的文件"""
+    progress = pyqtSignal(int, int)
+    # (结果列表, 错误信息)，出错时结果为None
+    export_done = pyqtSignal(object, str)
+    
+    def __init__(self, tasks, workers, zip_path=None, descriptor_text=None, parent=None):
+        super().__init__(parent)
+        self.tasks = tasks
+        self.workers = workers
+        self.zip_path = zip_path
+        self.descriptor_text = descriptor_text
+    
+    def on_progress(self, done, total):
+        self.progress.emit(done, total)
+        return self.isInterruptionRequested()
+    
+    def run(self):
+        try:
+            if self.zip_path:
+                results = export_engine.export_archive(self.tasks, self.zip_path, self.descriptor_text,
+                                                       workers=self.workers, progress=self.on_progress)
+            else:
+                results = export_engine.run_export(self.tasks, workers=self.workers, progress=self.on_progress)
+        except Exception as e:
+            self.export_done.emit(None, str(e))
+            return
+        self.export_done.emit(results, "")
+
+class GfxScanThread(QThread):
+    """后台扫描gfx文件夹，按批次把扫描结果发送给界面线程
+
+    未变化的文件夹直接从持久化扫描索引读取。
+    """
+    # 每批为 [(文件夹路径, 子文件夹名列表, 图片文件名列表), ...]
+    batch_found = pyqtSignal(list)
+    scan_finished = pyqtSignal()
+    
+    BATCH_DIRS = 200
+    BATCH_SECONDS = 0.1
+    
+    def __init__(self, folder_path, parent=None):
+        super().__init__(parent)
+        self.folder_path = folder_path
+    
+    def run(self):
+        batch = []
+        last_emit = time.monotonic()
+        for entry in scan_index.iter_gfx_dirs_cached(self.folder_path):
+            if self.isInterruptionRequested():
+                return
+            batch.append(entry)
+            if len(batch) >= self.BATCH_DIRS or time.monotonic() - last_emit >= self.BATCH_SECONDS:
+                self.batch_found.emit(batch)
+                batch = []
+                last_emit = time.monotonic()
+        if batch:
+            self.batch_found.emit(batch)
+        self.scan_finished.emit()
+
+class WorkshopScanThread(QThread):
+    """后台并行扫描创意工坊文件夹中的全部mod"""
+    progress = pyqtSignal(int, int)
+    scan_done = pyqtSignal(object)
+    
+    def __init__(self, root, parent=None):
+        super().__init__(parent)
+        self.root = root
+    
+    def run(self):
+        index = workshop_index.build(self.root, progress=self.progress.emit)
+        self.scan_done.emit(index)
+
+class SpriteScanThread(QThread):
+    """后台解析mod的interface/*.gfx，建立sprite名称和纹理文件的索引"""
+    scan_done = pyqtSignal(object)
+    
+    def __init__(self, mod_folder, parent=None):
+        super().__init__(parent)
+        self.mod_folder = mod_folder
+    
+    def run(self):
+        self.scan_done.emit(gfx_script.build(self.mod_folder))
 
+class MetaProbeThread(QThread):
+    """后台读取全部图片的文件头，供搜索按尺寸过滤"""
+    # 每批为 {文件节点: ImageMeta或None}
+    batch_probed = pyqtSignal(dict)
+    
+    BATCH_FILES = 2000
+    
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.files = files  # [(文件节点, 路径), ...]
+    
+    def run(self):
+        for start in range(0, len(self.files), self.BATCH_FILES):
+            if self.isInterruptionRequested():
+                return
+            batch = self.files[start:start + self.BATCH_FILES]
+            metas = image_meta.probe_many(path for node, path in batch)
+            self.batch_probed.emit({node: metas.get(path) for node, path in batch})
+
+class FileViewerApp(QMainWindow):
     def export_mod_files(self):
+        if self.export_thread is not None:
+            return
         if not self.replacement_files:
             QMessageBox.warning(self, "警告", "没有可导出的替换文件")
             return
         
+        target = self.export_target_combo.currentData()
+        patch_name = mod_files.default_patch_name(self.mod_name)
+        descriptor_text = mod_files.build_descriptor(patch_name, self.mod_name)
+        
         # 让用户选择导出路径
-        export_dir = QFileDialog.getExistingDirectory(
-            self, "选择导出目录", "", QFileDialog.ShowDirsOnly
-        )
+        if target == "zip":
+            export_dir, _ = QFileDialog.getSaveFileName(
+                self, "导出为zip压缩包", f"{patch_name}.zip", "ZIP 压缩包 (*.zip)"
+            )
+        else:
+            export_dir = QFileDialog.getExistingDirectory(
+                self, "选择导出目录", "", QFileDialog.ShowDirsOnly
+            )
         
         if not export_dir:
             return
         
-        # 创建gfx文件夹
+        # 创建gfx文件夹；压缩包中的文件直接从内存写入，不需要临时文件夹
         gfx_dir = os.path.join(export_dir, "gfx")
-        try:
-            os.makedirs(gfx_dir, exist_ok=True)
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"创建gfx文件夹失败: {str(e)}")
+        if target != "zip":
+            try:
+                os.makedirs(gfx_dir, exist_ok=True)
+                if target == "mod":
+                    with open(os.path.join(export_dir, "descriptor.mod"), 'w', encoding='utf-8') as f:
+                        f.write(descriptor_text)
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"创建gfx文件夹失败: {str(e)}")
+                return
+        
+        # 生成导出任务并交给多进程导出引擎
+        options = {
+            "dds_format": self.dds_format_combo.currentData(),
+            "mipmaps": self.dds_mipmap_combo.currentData(),
+        }
+        tasks, results = export_engine.plan_export(self.replacement_files, self.gfx_folder_path, gfx_dir, options)
+        
+        # 增量导出: 跳过清单中未变化的文件，删除已从配置中移除的文件
+        removed = []
+        pending = tasks
+        if self.incremental_export_check.isChecked() and target != "zip":
+            manifest = export_engine.load_manifest(gfx_dir)
+            removed = export_engine.remove_stale_outputs(gfx_dir, manifest, tasks)
+            pending, up_to_date = export_engine.filter_up_to_date(tasks, manifest)
+            results += up_to_date
+        
+        # 导出在后台线程中进行，界面保持响应；取消时不再开始新的文件
+        progress_dialog = QProgressDialog("正在导出MOD文件...", "取消", 0, len(pending), self)
+        progress_dialog.setWindowTitle("导出中")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        self.export_thread = ExportThread(pending, self.export_workers_spin.value(),
+                                          export_dir if target == "zip" else None, descriptor_text, self)
+        self.export_thread.progress.connect(lambda done, total: progress_dialog.setValue(done))
+        progress_dialog.canceled.connect(self.export_thread.requestInterruption)
+        self.export_thread.export_done.connect(self.on_export_done)
+        self.export_state = (target, gfx_dir, tasks, results, removed, len(pending), progress_dialog)
+        self.export_thread.start()
+    
+    def on_export_done(self, exported, error):
+        target, gfx_dir, tasks, results, removed, pending_count, progress_dialog = self.export_state
+        self.export_thread = None
+        self.export_state = None
+        progress_dialog.close()
+        progress_dialog.deleteLater()
+        if error:
+            title = "写入压缩包失败" if target == "zip" else "导出失败"
+            QMessageBox.critical(self, "错误", f"{title}: {error}")
+            return
+        if target == "zip" and len(exported) < pending_count:
+            QMessageBox.information(self, "导出结果", "导出已取消，没有写入压缩包")
             return
+        results = results + exported
+        results.sort(key=lambda r: r.index)
+        
+        if target != "zip":
+            try:
+                export_engine.save_manifest(gfx_dir, export_engine.build_manifest(results, tasks))
+            except OSError as e:
+                print(f"写入导出清单失败: {str(e)}")
         
         success_count = 0
+        converted_count = 0
+        unchanged_count = 0
+        reused_count = 0
         fail_count = 0
-        
-        for orig_path, repl_path in self.replacement_files.items():
-            try:
-                # 获取相对于gfx文件夹的相对路径
-                if not orig_path.startswith(self.gfx_folder_path):
-                    print(f"跳过非gfx文件夹下的文件: {orig_path}")
-                    fail_count += 1
-                    continue
-                
-                rel_path = os.path.relpath(orig_path, self.gfx_folder_path)
-                target_path = os.path.join(gfx_dir, rel_path)
-                
-                # 创建目标文件夹结构
-                os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                
-                # 获取原始文件扩展名和目标文件扩展名
-                orig_ext = os.path.splitext(orig_path)[1].lower()
-                repl_ext = os.path.splitext(repl_path)[1].lower()
-                
-                # 如果扩展名相同，直接复制
-                if orig_ext == repl_ext:
-                    shutil.copy2(repl_path, target_path)
-                else:
-                    # 需要转换格式
-                    self.convert_image_format(repl_path, target_path, orig_ext)
-                
+        output_bytes = 0
+        export_seconds = 0.0
+        for result in results:
+            if result.ok:
                 success_count += 1
-            except Exception as e:
-                print(f"导出文件失败: {orig_path} -> {target_path}, 错误: {str(e)}")
+                output_bytes += result.record["output_size"]
+                if result.reused:
+                    reused_count += 1
+                if result.skipped:
+                    unchanged_count += 1
+                else:
+                    converted_count += 1
+                    export_seconds += result.seconds
+            else:
+                if result.target_path:
+                    print(f"导出文件失败: {result.orig_path} -> {result.target_path}, 错误: {result.error}")
+                else:
+                    print(f"{result.error}: {result.orig_path}")
                 fail_count += 1
         
         # 显示导出结果
         msg = f"导出完成!\n成功: {success_count} 个文件\n失败: {fail_count} 个文件"
+        msg += f"\n输出总大小: {output_bytes/1024/1024:.1f} MB | 转换耗时合计: {export_seconds:.1f} 秒"
+        if converted_count > 0:
+            msg += f"\n其中重新导出: {converted_count} 个文件"
+        if unchanged_count > 0:
+            msg += f"\n其中未变化跳过: {unchanged_count} 个文件"
+        if reused_count > 0:
+            msg += f"\n其中复用相同的转换结果: {reused_count} 个文件"
+        if removed:
+            msg += f"\n已删除过期文件: {len(removed)} 个"
+        canceled_count = len(self.replacement_files) - len(results)
+        if canceled_count > 0:
+            msg += f"\n已取消: {canceled_count} 个文件"
         if fail_count > 0:
             msg += "\n\n失败的文件请查看控制台输出"
         
         QMessageBox.information(self, "导出结果", msg)
     
-    def convert_image_format(self, src_path, dst_path, target_ext):
-        """转换图片格式到目标扩展名"""
-        target_ext = target_ext.lower()
-        
-        if target_ext == '.dds':
-            # 使用Pillow转换为DDS格式，ARGB8，无mipmap
-            from PIL import Image
-            img = Image.open(src_path)
-            
-            # 确保图像是RGBA模式
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
-            
-            # 保存为DDS格式，ARGB8，无mipmap
-            try:
-                # 使用Pillow的DDS插件保存
-                img.save(dst_path, format='DDS', 
-                        dds_format='ARGB8', 
-                        mipmap=False)
-            except Exception as e:
-                # 如果直接保存失败，尝试通过中间转换
-                temp_path = dst_path + '.png'
-                img.save(temp_path, format='PNG')
-                
-                # 使用外部工具转换
-                try:
-                    self.convert_to_dds_with_external_tool(temp_path, dst_path)
-                    os.remove(temp_path)
-                except Exception as e:
-                    raise Exception(f"DDS转换失败: {str(e)}")
-                    
-        elif target_ext == '.tga':
-            # 转换为TGA格式
-            from PIL import Image
-            img = Image.open(src_path)
-            img.save(dst_path, format='TGA')
-        else:
-            # 对于其他格式(PNG)，使用Qt的转换功能
-            reader = QImageReader(src_path)
-            image = reader.read()
-            if image.isNull():
-                raise Exception("无法读取源图片")
-            
-            # 根据目标格式保存
-            if target_ext == '.png':
-                image.save(dst_path, 'PNG')
-            else:
-                raise Exception(f"不支持的转换格式: {target_ext}")
-    
-    def convert_to_dds_with_external_tool(self, src_path, dst_path):
-        from PIL import Image
-        img = Image.open(src_path)
-        img.save(dst_path, format='DDS', dds_format='ARGB8', mipmap=False)
+    def closeEvent(self, event):
+        try:
+            session.save(self.current_file_path, self.replacement_files)
+        except OSError as e:
+            print(f"保存会话失败: {str(e)}")
+        if self.workshop_thread is not None:
+            self.workshop_thread.wait()
+        for thread in self.findChildren(SpriteScanThread):
+            thread.wait()
+        if self.export_thread is not None:
+            # 关闭窗口时取消导出，已经开始转换的文件完成后退出
+            self.export_thread.export_done.disconnect(self.on_export_done)
+            self.export_thread.requestInterruption()
+            self.export_thread.wait()
+            self.export_thread = None
+        self.stop_meta_probe()
+        self.stop_scan()
+        self.cancel_pending_previews()
+        self.preview_pool.waitForDone()
+        self.cancel_pending_searches()
+        self.search_pool.waitForDone()
+        super().closeEvent(event)
 
     def show_help(self):
         """显示使用说明对话框"""
@@ -288,6 +805,15 @@ class FileViewerApp(QMainWindow):
         self.select_file_btn.clicked.connect(self.select_file)
         self.top_layout.addWidget(self.select_file_btn)
         
+        # 一次扫描创意工坊中的全部mod，之后在下拉框中切换
+        self.scan_workshop_btn = QPushButton("扫描创意工坊文件夹")
+        self.scan_workshop_btn.clicked.connect(self.select_workshop_folder)
+        self.top_layout.addWidget(self.scan_workshop_btn)
+        self.mod_switch_combo = QComboBox()
+        self.mod_switch_combo.currentIndexChanged.connect(self.on_mod_switched)
+        self.mod_switch_combo.hide()
+        self.top_layout.addWidget(self.mod_switch_combo)
+        
         # 导入导出按钮
         self.import_export_container = QWidget()
         self.import_export_layout = QHBoxLayout()
@@ -298,8 +824,12 @@ class FileViewerApp(QMainWindow):
         self.import_btn = QPushButton("导入替换配置")
         self.import_btn.clicked.connect(self.import_replacements)
         
+        self.bulk_map_btn = QPushButton("批量对应替换文件夹")
+        self.bulk_map_btn.clicked.connect(self.bulk_map_replacements)
+        
         self.import_export_layout.addWidget(self.export_btn)
         self.import_export_layout.addWidget(self.import_btn)
+        self.import_export_layout.addWidget(self.bulk_map_btn)
         self.top_layout.addWidget(self.import_export_container)
         
         # 导出MOD按钮
@@ -307,6 +837,53 @@ class FileViewerApp(QMainWindow):
         self.export_mod_btn.clicked.connect(self.export_mod_files)
         self.top_layout.addWidget(self.export_mod_btn)
         
+        self.check_btn = QPushButton("检查替换文件")
+        self.check_btn.clicked.connect(self.check_replacements)
+        self.top_layout.addWidget(self.check_btn)
+        
+        # 导出进程数设置
+        self.export_workers_label = QLabel("导出进程数:")
+        self.export_workers_spin = QSpinBox()
+        self.export_workers_spin.setRange(1, max(64, export_engine.default_worker_count()))
+        self.export_workers_spin.setValue(export_engine.default_worker_count())
+        self.top_layout.addWidget(self.export_workers_label)
+        self.top_layout.addWidget(self.export_workers_spin)
+        
+        # 预览图片内存缓存上限
+        self.cache_limit_label = QLabel("预览缓存(MB):")
+        self.cache_limit_spin = QSpinBox()
+        self.cache_limit_spin.setRange(16, 8192)
+        self.cache_limit_spin.setValue(image_cache.DEFAULT_LIMIT_MB)
+        self.cache_limit_spin.valueChanged.connect(self.on_cache_limit_changed)
+        self.top_layout.addWidget(self.cache_limit_label)
+        self.top_layout.addWidget(self.cache_limit_spin)
+        
+        # DDS输出格式和mipmap，默认与原文件一致
+        self.dds_format_combo = QComboBox()
+        self.dds_format_combo.addItem("DDS格式: 与原文件一致", "auto")
+        self.dds_format_combo.addItem("DDS格式: DXT1", "DXT1")
+        self.dds_format_combo.addItem("DDS格式: DXT5", "DXT5")
+        self.dds_format_combo.addItem("DDS格式: ARGB8 (无压缩)", "ARGB8")
+        self.top_layout.addWidget(self.dds_format_combo)
+        
+        self.dds_mipmap_combo = QComboBox()
+        self.dds_mipmap_combo.addItem("mipmap: 与原文件一致", "auto")
+        self.dds_mipmap_combo.addItem("mipmap: 生成", True)
+        self.dds_mipmap_combo.addItem("mipmap: 不生成", False)
+        self.top_layout.addWidget(self.dds_mipmap_combo)
+        
+        # 导出方式: 只生成gfx文件夹，或生成带descriptor.mod的完整mod文件夹/zip压缩包
+        self.export_target_combo = QComboBox()
+        self.export_target_combo.addItem("导出为: gfx文件夹", "gfx")
+        self.export_target_combo.addItem("导出为: 完整mod文件夹", "mod")
+        self.export_target_combo.addItem("导出为: zip压缩包", "zip")
+        self.top_layout.addWidget(self.export_target_combo)
+        
+        # 增量导出: 只重新生成有变化的文件
+        self.incremental_export_check = QCheckBox("增量导出")
+        self.incremental_export_check.setChecked(True)
+        self.top_layout.addWidget(self.incremental_export_check)
+        
         # 顶部信息显示区域
         self.info_container = QWidget()
         self.info_layout = QVBoxLayout()
@@ -332,20 +909,72 @@ class FileViewerApp(QMainWindow):
         self.left_layout = QVBoxLayout()
         self.left_panel.setLayout(self.left_layout)
         
-        self.file_tree = QTreeWidget()
-        self.file_tree.setHeaderLabel("文件结构")
+        # 文件树只为可见的行向模型请求数据，行高固定，不需要逐行计算布局
+        self.tree_model = file_tree_model.GfxTreeModel(self)
+        self.file_tree = QTreeView()
+        self.file_tree.setModel(self.tree_model)
+        self.file_tree.setUniformRowHeights(True)
+        self.file_tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.file_tree.header().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        self.file_tree.header().setStretchLastSection(False)
         self.file_tree.setStyleSheet("""
-            QTreeWidget {
+            QTreeView {
                 font-size: 13px;
             }
-            QTreeWidget::item {
+            QTreeView::item {
                 padding: 4px;
             }
-            QTreeWidget::item:selected {
+            QTreeView::item:selected {
                 background-color: #e0e0e0;
             }
         """)
-        self.file_tree.itemClicked.connect(self.on_file_selected)
+        # 鼠标点击和键盘方向键切换文件都会改变当前项
+        self.file_tree.selectionModel().currentChanged.connect(self.on_current_item_changed)
+        
+        # 搜索栏: 输入文字即时过滤，结果列表替代文件树显示
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索文件或sprite名称 (支持模糊匹配和尺寸条件, 例: GFX_focus w>=512 512x512)")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.schedule_search)
+        self.left_layout.addWidget(self.search_edit)
+        
+        self.search_filter_bar = QWidget()
+        self.search_filter_layout = QHBoxLayout()
+        self.search_filter_layout.setContentsMargins(0, 0, 0, 0)
+        self.search_filter_bar.setLayout(self.search_filter_layout)
+        self.search_ext_combo = QComboBox()
+        self.search_ext_combo.addItem("全部格式", "")
+        for ext in ('.dds', '.png', '.tga'):
+            self.search_ext_combo.addItem(ext, ext)
+        self.search_ext_combo.currentIndexChanged.connect(self.schedule_search)
+        self.search_state_combo = QComboBox()
+        self.search_state_combo.addItem("全部文件", None)
+        self.search_state_combo.addItem("已替换", True)
+        self.search_state_combo.addItem("未替换", False)
+        self.search_state_combo.currentIndexChanged.connect(self.schedule_search)
+        self.search_sprite_combo = QComboBox()
+        self.search_sprite_combo.addItem("全部引用状态", None)
+        self.search_sprite_combo.addItem("被sprite引用", True)
+        self.search_sprite_combo.addItem("未被引用", False)
+        self.search_sprite_combo.currentIndexChanged.connect(self.schedule_search)
+        self.search_filter_layout.addWidget(self.search_ext_combo)
+        self.search_filter_layout.addWidget(self.search_state_combo)
+        self.search_filter_layout.addWidget(self.search_sprite_combo)
+        self.left_layout.addWidget(self.search_filter_bar)
+        
+        self.search_status_label = QLabel()
+        self.search_status_label.hide()
+        self.left_layout.addWidget(self.search_status_label)
+        self.search_results = QListWidget()
+        self.search_results.currentItemChanged.connect(self.on_search_result_selected)
+        self.search_results.hide()
+        self.left_layout.addWidget(self.search_results)
+        
+        # 连续输入时合并为一次搜索
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(0)
+        self.search_timer.timeout.connect(self.run_search)
         
         self.left_layout.addWidget(self.file_tree)
         self.middle_splitter.addWidget(self.left_panel)
@@ -375,9 +1004,10 @@ class FileViewerApp(QMainWindow):
         self.original_label.setAlignment(Qt.AlignCenter)
         self.original_layout.addWidget(self.original_label)
         
-        self.original_preview = QGraphicsView()
+        self.original_preview = PreviewView()
         self.original_scene = QGraphicsScene()
         self.original_preview.setScene(self.original_scene)
+        self.original_preview.zoomed_in.connect(lambda: self.load_full_preview(is_original=True))
         self.original_preview.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.original_preview.setMinimumSize(300, 300)
         self.original_layout.addWidget(self.original_preview)
@@ -407,6 +1037,12 @@ class FileViewerApp(QMainWindow):
         self.replace_btn.setEnabled(False)
         self.replace_layout.addWidget(self.replace_btn)
         
+        self.clear_replace_btn = QPushButton("取消替换")
+        self.clear_replace_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.clear_replace_btn.clicked.connect(self.clear_current_replacement)
+        self.clear_replace_btn.setEnabled(False)
+        self.replace_layout.addWidget(self.clear_replace_btn)
+        
         # 添加拖放区域
         self.drop_area = DropContainer(self)
         self.drop_area.setFixedHeight(100)
@@ -421,9 +1057,10 @@ class FileViewerApp(QMainWindow):
         self.replacement_label.setAlignment(Qt.AlignCenter)
         self.replacement_layout.addWidget(self.replacement_label)
         
-        self.replacement_preview = QGraphicsView()
+        self.replacement_preview = PreviewView()
         self.replacement_scene = QGraphicsScene()
         self.replacement_preview.setScene(self.replacement_scene)
+        self.replacement_preview.zoomed_in.connect(lambda: self.load_full_preview(is_original=False))
         self.replacement_preview.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.replacement_preview.setMinimumSize(400, 400)
         self.replacement_layout.addWidget(self.replacement_preview)
@@ -446,9 +1083,48 @@ class FileViewerApp(QMainWindow):
         self.current_file_path = ""
         self.gfx_folder_path = ""
         self.mod_folder = ""
+        self.mod_name = None  # descriptor.mod中的名称，用于生成补丁的依赖
         self.replacement_files = {}  # 存储替换文件路径 {原文件路径: 替换文件路径}
         self.current_selected_file = None
-        self.all_files = []  # 存储所有文件路径
+        self.scan_thread = None
+        self.workshop_index = None
+        self.workshop_thread = None
+        self.search_index = None
+        self.meta_thread = None  # 后台读取全部文件头，用于按尺寸搜索
+        self.export_thread = None
+        self.export_state = None  # 导出进行中时为 (导出目标, gfx文件夹, 任务, 已有结果, 删除的文件, 待导出数, 进度对话框)
+        self.sprite_index = None  # 当前mod的interface/*.gfx中sprite名称和纹理的索引
+        
+        # 监视gfx文件夹和替换文件，变化在防抖后合并处理
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self.on_watched_dir_changed)
+        self.fs_watcher.fileChanged.connect(self.on_watched_file_changed)
+        self.fs_change_timer = QTimer(self)
+        self.fs_change_timer.setSingleShot(True)
+        self.fs_change_timer.setInterval(FS_CHANGE_DEBOUNCE_MS)
+        self.fs_change_timer.timeout.connect(self.apply_fs_changes)
+        self.pending_dir_changes = set()
+        self.pending_file_changes = set()
+        self.current_preview_stamp = None
+        self.modified_counts = {}  # {文件夹路径: 其中被替换的文件数}
+        self.thumbnail_cache = thumbnail_cache.ThumbnailCache()
+        self.image_cache = image_cache.shared_cache
+        
+        # 预览图片在线程池中解码，generation随每次选择递增，旧的结果被丢弃
+        self.preview_pool = QThreadPool()
+        self.preview_pool.setMaxThreadCount(max(2, (os.cpu_count() or 2) // 2))
+        # 文件树第二列的文件头也在这个线程池中读取
+        self.tree_model.probe_pool = self.preview_pool
+        self.preview_generation = 0
+        self.pending_previews = []
+        
+        # 子串匹配在界面线程中立即显示，模糊匹配在单独的线程中补充；generation随每次搜索递增
+        self.search_pool = QThreadPool()
+        self.search_pool.setMaxThreadCount(1)
+        self.search_generation = 0
+        self.pending_searches = []
+        self.search_state = None
+        self.update_cache_status()
         
         # 设置分割器初始比例
         self.middle_splitter.setSizes([350, 1050])
@@ -459,67 +1135,75 @@ class FileViewerApp(QMainWindow):
             return
         
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "导出替换配置", "", "JSON 文件 (*.json)"
+            self, "导出替换配置", "", "替换配置 (*.jsonl)"
         )
         
         if file_path:
             try:
-                # 构建导出数据，包含替换配置和当前mod路径
-                export_data = {
-                    "descriptor_path": os.path.normpath(self.current_file_path),
-                    "replacements": {
-                        os.path.normpath(k): os.path.normpath(v) 
-                        for k, v in self.replacement_files.items()
-                    }
-                }
-                
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(export_data, f, indent=4, ensure_ascii=False)
-                
+                # 路径相对mod文件夹和替换图片文件夹保存，逐行写入
+                replacement_config.write_config(file_path, self.current_file_path, self.replacement_files)
                 QMessageBox.information(self, "成功", "替换配置已成功导出")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"导出替换配置时出错: {str(e)}")
     
     def import_replacements(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "导入替换配置", "", "JSON 文件 (*.json)"
+            self, "导入替换配置", "", "替换配置 (*.jsonl *.json)"
         )
         
         if file_path:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    import_data = json.load(f)
-                
-                # 检查是否包含descriptor路径
-                if "descriptor_path" not in import_data:
-                    QMessageBox.warning(self, "警告", "配置文件不完整，缺少descriptor.mod路径")
-                    return
+                # 新格式逐行读取，旧版JSON配置也可以读取
+                descriptor_path, entries = replacement_config.open_config(file_path)
                 
                 # 询问用户是否加载关联的mod
                 reply = QMessageBox.question(
                     self, "确认", 
-                    f"是否加载关联的mod文件?\n路径: {import_data['descriptor_path']}",
+                    f"是否加载关联的mod文件?\n路径: {descriptor_path}",
                     QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
                 )
                 
                 if reply == QMessageBox.Yes:
                     # 尝试加载关联的mod文件
-                    if os.path.exists(import_data["descriptor_path"]):
-                        self.current_file_path = import_data["descriptor_path"]
+                    if os.path.exists(descriptor_path):
+                        self.current_file_path = descriptor_path
                         self.process_descriptor_file(self.current_file_path)
                     else:
                         QMessageBox.warning(self, "警告", "无法找到关联的mod文件，请手动选择")
                 
-                # 处理替换配置
-                valid_replacements = {}
-                for orig, repl in import_data.get("replacements", {}).items():
-                    orig_path = os.path.normpath(orig)
-                    repl_path = os.path.normpath(repl)
-                    
-                    if os.path.exists(repl_path):
-                        valid_replacements[orig_path] = repl_path
-                    else:
-                        print(f"警告: 替换文件不存在: {repl_path}")
+                # 当前打开的不是配置关联的mod时，由用户确认是否把原文件换到当前mod下
+                config_folder = os.path.dirname(descriptor_path)
+                other_mod = bool(self.mod_folder) and os.path.normpath(self.mod_folder) != os.path.normpath(config_folder)
+                rebase = False
+                if other_mod:
+                    reply = QMessageBox.question(
+                        self, "确认",
+                        f"替换配置属于另一个mod:\n{config_folder}\n"
+                        f"是否把原文件路径换到当前打开的mod下?\n{self.mod_folder}\n\n"
+                        "选择\"否\"时只导入当前mod中存在的原文件",
+                        QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+                    )
+                    rebase = reply == QMessageBox.Yes
+                
+                # 处理替换配置，替换文件按文件夹并行检查是否存在
+                QApplication.setOverrideCursor(Qt.WaitCursor)
+                try:
+                    replacements = dict(entries)
+                    skipped = 0
+                    if rebase:
+                        replacements = mod_files.rebase_replacements(replacements, config_folder, self.mod_folder)
+                    elif other_mod:
+                        mod_prefix = os.path.normpath(self.mod_folder) + os.sep
+                        kept = {}
+                        for orig, repl in replacements.items():
+                            orig = os.path.normpath(orig)
+                            if orig.startswith(mod_prefix) and os.path.isfile(orig):
+                                kept[orig] = repl
+                        skipped = len(replacements) - len(kept)
+                        replacements = kept
+                    valid_replacements, missing = replacement_config.split_missing(replacements)
+                finally:
+                    QApplication.restoreOverrideCursor()
                 
                 self.replacement_files = valid_replacements
                 
@@ -528,10 +1212,36 @@ class FileViewerApp(QMainWindow):
                     self.display_file_info(self.current_selected_file)
                 self.update_file_tree_colors()
                 
-                QMessageBox.information(self, "成功", f"已导入 {len(valid_replacements)} 个替换配置")
+                message = f"已导入 {len(valid_replacements)} 个替换配置"
+                if skipped:
+                    message += f"\n已跳过 {skipped} 个不在当前mod中的原文件"
+                if missing:
+                    message += "\n\n" + replacement_config.summarize_missing(missing.values())
+                    QMessageBox.warning(self, "部分替换文件缺失", message)
+                else:
+                    QMessageBox.information(self, "成功", message)
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"导入替换配置时出错: {str(e)}")
     
+    def finish_startup(self):
+        """窗口显示后报告启动用时，再恢复上次的会话"""
+        elapsed_ms = (time.perf_counter() - STARTUP_BEGIN) * 1000
+        print(f"窗口启动用时: {elapsed_ms:.0f} ms")
+        self.file_info_text.setText(f"窗口启动用时: {elapsed_ms:.0f} ms")
+        self.restore_session()
+    
+    def restore_session(self):
+        """恢复上次关闭时打开的mod和替换配置，扫描在后台进行并优先使用扫描索引"""
+        restored = session.load()
+        if restored is None:
+            return
+        descriptor_path, replacements = restored
+        self.replacement_files, missing = replacement_config.split_missing(replacements)
+        if missing:
+            print(replacement_config.summarize_missing(missing.values()))
+        self.current_file_path = descriptor_path
+        self.process_descriptor_file(descriptor_path)
+    
     def select_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self, "选择 descriptor.mod 文件", "", "MOD 文件 (*.mod)"
@@ -543,18 +1253,78 @@ class FileViewerApp(QMainWindow):
         elif file_path:
             QMessageBox.warning(self, "错误", "请选择名为 descriptor.mod 的文件")
     
+    def select_workshop_folder(self):
+        folder = QFileDialog.getExistingDirectory(
+            self, "选择创意工坊文件夹 (steamapps/workshop/content/394360) 或包含多个mod的文件夹")
+        if folder:
+            self.scan_workshop(folder)
+    
+    def scan_workshop(self, folder):
+        if self.workshop_thread is not None:
+            return
+        self.scan_workshop_btn.setEnabled(False)
+        self.file_info_text.setText("正在扫描全部mod...")
+        self.workshop_thread = WorkshopScanThread(os.path.normpath(folder), self)
+        self.workshop_thread.progress.connect(self.on_workshop_progress)
+        self.workshop_thread.scan_done.connect(self.on_workshop_scanned)
+        self.workshop_thread.start()
+    
+    def on_workshop_progress(self, done, total):
+        self.file_info_text.setText(f"正在扫描全部mod... {done}/{total}")
+    
+    def on_workshop_scanned(self, index):
+        self.workshop_thread.wait()
+        self.workshop_thread = None
+        self.scan_workshop_btn.setEnabled(True)
+        self.workshop_index = index
+        
+        overridden = index.overridden_paths()
+        self.file_info_text.setText(
+            f"共扫描 {len(index.mods)} 个包含gfx的mod，{len(index.providers)} 个不同的gfx文件，"
+            f"其中 {len(overridden)} 个由多个mod同时提供")
+        
+        self.mod_switch_combo.blockSignals(True)
+        self.mod_switch_combo.clear()
+        self.mod_switch_combo.addItem("切换mod...", None)
+        for mod, info in enumerate(index.mods):
+            self.mod_switch_combo.addItem(f"{info.name} ({os.path.basename(info.folder)})", mod)
+        self.mod_switch_combo.setCurrentIndex(self.combo_index_of_current_mod())
+        self.mod_switch_combo.blockSignals(False)
+        self.mod_switch_combo.setVisible(bool(index.mods))
+    
+    def combo_index_of_current_mod(self):
+        if self.workshop_index is None or not self.current_file_path:
+            return 0
+        mod = self.workshop_index.mod_of(self.current_file_path)
+        return 0 if mod is None else mod + 1
+    
+    def on_mod_switched(self, combo_index):
+        mod = self.mod_switch_combo.itemData(combo_index)
+        if mod is None:
+            return
+        self.current_file_path = self.workshop_index.mods[mod].descriptor_path
+        self.process_descriptor_file(self.current_file_path)
+    
+    def current_mod_providers(self, file_path):
+        """返回提供与这个文件相同gfx路径的其他mod名称"""
+        if self.workshop_index is None or not file_path.startswith(self.gfx_folder_path + os.sep):
+            return []
+        rel_path = file_path[len(self.gfx_folder_path) + 1:]
+        return [info.name for info in self.workshop_index.providers_of(rel_path)
+                if os.path.join(info.folder, "gfx") != self.gfx_folder_path]
+    
     def process_descriptor_file(self, file_path):
+        # 在创意工坊索引中的mod同步下拉框的选择
+        if self.workshop_index is not None:
+            self.mod_switch_combo.blockSignals(True)
+            self.mod_switch_combo.setCurrentIndex(self.combo_index_of_current_mod())
+            self.mod_switch_combo.blockSignals(False)
         try:
-            # 读取文件内容
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
             # 解析名称和版本
-            name_match = re.search(r'name\s*=\s*"([^"]+)"', content)
-            version_match = re.search(r'version\s*=\s*"([^"]+)"', content)
-            
-            name = name_match.group(1) if name_match else "未找到"
-            version = version_match.group(1) if version_match else "未找到"
+            descriptor = mod_files.parse_descriptor(file_path)
+            self.mod_name = descriptor["name"]
+            name = descriptor["name"] or "未找到"
+            version = descriptor["version"] or "未找到"
             
             # 更新顶部信息显示
             self.mod_info_label.setText(f"名称: {name} | 版本: {version}")
@@ -567,57 +1337,253 @@ class FileViewerApp(QMainWindow):
             self.gfx_folder_path = os.path.join(self.mod_folder, "gfx")
             if os.path.exists(self.gfx_folder_path):
                 self.load_folder_structure(self.gfx_folder_path)
+                self.start_sprite_scan()
             else:
                 self.file_info_text.setText("未找到gfx文件夹")
             
         except Exception as e:
             self.file_info_text.setText(f"处理文件时出错: {str(e)}")
     
+    def start_sprite_scan(self):
+        self.sprite_index = None
+        thread = SpriteScanThread(self.mod_folder, self)
+        thread.scan_done.connect(self.on_sprites_scanned)
+        thread.finished.connect(thread.deleteLater)
+        thread.start()
+    
+    def on_sprites_scanned(self, index):
+        # 解析期间已切换到其他mod时丢弃结果
+        if index.mod_folder != self.mod_folder:
+            return
+        self.sprite_index = index
+        for error in index.errors:
+            print(f"读取gfx定义文件失败: {error}")
+        if self.search_index is not None:
+            self.rebuild_search_index()
+        if self.current_selected_file:
+            self.display_file_info(self.current_selected_file)
+    
     def load_folder_structure(self, folder_path):
-        self.file_tree.clear()
-        self.all_files = []
+        # 停止上一次尚未完成的扫描
+        self.stop_scan()
+        self.stop_meta_probe()
+        
+        # 只有一个尚未扫描的根节点，扫描到的内容分批插入
+        self.tree_model.reset(folder_path)
+        self.search_index = None
+        self.schedule_search()
+        
+        # 不再监视上一个mod的文件夹
+        watched_dirs = self.fs_watcher.directories()
+        if watched_dirs:
+            self.fs_watcher.removePaths(watched_dirs)
+        self.pending_dir_changes = set()
+        
+        # 按新的gfx文件夹重新计算修改状态
+        self.update_file_tree_colors()
+        
+        # 已在创意工坊索引中扫描过的mod直接使用扫描结果
+        mod = self.workshop_index.mod_of(self.current_file_path) if self.workshop_index else None
+        if mod is not None and self.workshop_index.entries[mod] is not None:
+            self.file_tree.expand(self.tree_model.index_of(file_tree_model.ROOT))
+            self.on_scan_batch(self.workshop_index.entries[mod])
+            self.on_scan_finished()
+            return
+        
+        # 在后台线程扫描，结果分批填充到树中
+        self.scan_thread = GfxScanThread(folder_path, self)
+        self.scan_thread.batch_found.connect(self.on_scan_batch)
+        self.scan_thread.scan_finished.connect(self.on_scan_finished)
+        self.file_info_text.setText("正在扫描gfx文件夹...")
+        self.scan_thread.start()
+        
+        self.file_tree.expand(self.tree_model.index_of(file_tree_model.ROOT))
+    
+    def stop_scan(self):
+        if self.scan_thread is not None:
+            self.scan_thread.batch_found.disconnect(self.on_scan_batch)
+            self.scan_thread.scan_finished.disconnect(self.on_scan_finished)
+            self.scan_thread.requestInterruption()
+            self.scan_thread.wait()
+            self.scan_thread = None
+    
+    def on_scan_batch(self, batch):
+        # 监视扫描到的文件夹，之后的增删在防抖后增量更新
+        self.fs_watcher.addPaths([folder for folder, subdirs, files in batch])
+        # 文件夹总是先于其子文件夹扫描到，它的节点已经在上级中创建
+        for folder, subdirs, files in batch:
+            node = self.tree_model.node_of(folder, is_dir=True)
+            if node is not None and not self.tree_model.loaded[node]:
+                self.tree_model.set_dir_contents(node, subdirs, files)
+                self.apply_modified_flags(folder)
+    
+    def on_scan_finished(self):
+        self.scan_thread = None
+        self.file_info_text.setText(f"扫描完成，共 {self.tree_model.file_count} 个图片文件")
+        self.rebuild_search_index()
+        
+        # 在后台读取全部文件头，读取完成前按尺寸搜索只包含已读取的文件
+        files = [(node, os.path.join(self.gfx_folder_path, rel_path))
+                 for rel_path, node in self.tree_model.iter_files() if node not in self.tree_model.meta]
+        self.meta_thread = MetaProbeThread(files, self)
+        self.meta_thread.batch_probed.connect(self.on_meta_probed)
+        self.meta_thread.finished.connect(self.on_meta_probe_finished)
+        self.meta_thread.start()
+    
+    def stop_meta_probe(self):
+        if self.meta_thread is not None:
+            self.meta_thread.batch_probed.disconnect(self.on_meta_probed)
+            self.meta_thread.finished.disconnect(self.on_meta_probe_finished)
+            self.meta_thread.requestInterruption()
+            self.meta_thread.wait()
+            self.meta_thread = None
+    
+    def on_meta_probed(self, metas):
+        # 期间被删除的文件不再加入
+        names = self.tree_model.names
+        self.tree_model.meta.update((node, meta) for node, meta in metas.items() if names[node] is not None)
+        if search_index.parse_query(self.search_edit.text())[1]:
+            self.schedule_search()
+    
+    def on_meta_probe_finished(self):
+        self.meta_thread = None
+    
+    def rebuild_search_index(self):
+        files = list(self.tree_model.iter_files())
+        entries = files
+        if self.sprite_index is not None:
+            # sprite名称也作为搜索文字，命中时返回它引用的纹理文件
+            nodes = {gfx_script.normalize_texture("gfx/" + rel_path): node for rel_path, node in files}
+            entries = files + [(name, nodes[texture])
+                               for texture, names in self.sprite_index.by_texture.items() if texture in nodes
+                               for name in names]
+        self.search_index = search_index.SearchIndex(entries)
+        self.schedule_search()
+    
+    def sprite_names_of(self, file_path):
+        """返回引用这个文件的sprite名称，sprite索引尚未建立时返回None"""
+        if self.sprite_index is None or not file_path.startswith(self.mod_folder + os.sep):
+            return None
+        return self.sprite_index.sprites_of(os.path.relpath(file_path, self.mod_folder))
+    
+    def search_active(self):
+        return bool(self.search_edit.text().strip() or self.search_ext_combo.currentIndex()
+                    or self.search_state_combo.currentIndex() or self.search_sprite_combo.currentIndex())
+    
+    def schedule_search(self):
+        self.search_timer.start()
+    
+    def cancel_pending_searches(self):
+        """取消尚未开始的模糊匹配，正在运行的在下一块之前停止"""
+        self.search_generation += 1
+        running = []
+        for task in self.pending_searches:
+            if self.search_pool.tryTake(task):
+                task.signals.deleteLater()
+            else:
+                running.append(task)
+        self.pending_searches = running
+    
+    def run_search(self):
+        """按搜索栏和过滤条件更新结果列表；没有搜索条件时显示文件树"""
+        self.cancel_pending_searches()
+        active = self.search_active()
+        self.file_tree.setVisible(not active)
+        self.search_results.setVisible(active)
+        self.search_status_label.setVisible(active)
+        if not active:
+            return
         
-        # 创建根节点
-        root_item = QTreeWidgetItem(self.file_tree)
-        root_item.setText(0, os.path.basename(folder_path))
-        root_item.setData(0, Qt.UserRole, folder_path)
+        self.search_results.blockSignals(True)
+        self.search_results.clear()
+        self.search_results.blockSignals(False)
+        if self.search_index is None:
+            self.search_status_label.setText("正在扫描gfx文件夹，扫描完成后显示搜索结果...")
+            return
         
-        # 递归加载文件夹结构
-        self.build_tree(folder_path, root_item)
+        text, size_filters = search_index.parse_query(self.search_edit.text())
+        ext = self.search_ext_combo.currentData()
+        replaced = self.search_state_combo.currentData()
+        referenced = self.search_sprite_combo.currentData()
+        if referenced is not None and self.sprite_index is None:
+            self.search_status_label.setText("正在解析interface中的gfx定义文件...")
+            return
         
-        # 展开所有节点
-        self.file_tree.expandAll()
+        model = self.tree_model
+        
+        def accept(node):
+            if ext and not model.names[node].lower().endswith(ext):
+                return False
+            if replaced is not None and bool(model.modified[node]) != replaced:
+                return False
+            if referenced is not None and bool(self.sprite_index.sprites_of("gfx/" + model.rel_path(node))) != referenced:
+                return False
+            return not size_filters or search_index.size_matches(model.meta.get(node), size_filters)
+        
+        # 子串匹配立即显示；结果不足时在后台补充模糊匹配，不阻塞输入
+        results, truncated = self.search_index.search_substring(text, SEARCH_RESULT_LIMIT, accept)
+        self.add_search_items(results)
+        query = search_index.normalize_query(text)
+        fuzzy_pending = not truncated and bool(query)
+        self.search_state = (results, accept, size_filters)
+        self.update_search_status(len(results), truncated, fuzzy_pending)
+        if fuzzy_pending:
+            task = FuzzySearchTask(self, self.search_generation, self.search_index, query)
+            task.signals.searched.connect(self.on_fuzzy_searched)
+            self.pending_searches.append(task)
+            self.search_pool.start(task)
     
-    def build_tree(self, folder_path, parent_item):
-        try:
-            for item in os.listdir(folder_path):
-                item_path = os.path.join(folder_path, item)
-                
-                if os.path.isdir(item_path):
-                    # 如果是文件夹，创建子节点并递归
-                    dir_item = QTreeWidgetItem(parent_item)
-                    dir_item.setText(0, item)
-                    dir_item.setData(0, Qt.UserRole, item_path)
-                    self.build_tree(item_path, dir_item)
-                elif item.lower().endswith(('.png', '.dds', '.tga')):
-                    # 如果是图片文件，添加到列表
-                    file_item = QTreeWidgetItem(parent_item)
-                    file_item.setText(0, item)
-                    file_item.setData(0, Qt.UserRole, item_path)
-                    self.all_files.append(item_path)
-                    
-                    # 如果是替换文件，设置为红色
-                    if item_path in self.replacement_files:
-                        file_item.setForeground(0, QColor(255, 0, 0))
-        except Exception as e:
-            print(f"加载文件夹时出错: {str(e)}")
+    def on_fuzzy_searched(self, task, fuzzy):
+        if task in self.pending_searches:
+            self.pending_searches.remove(task)
+        task.signals.deleteLater()
+        # 只显示最新一次搜索的结果，期间重建过索引时行号已经失效
+        if fuzzy is None or task.generation != self.search_generation or task.index is not self.search_index:
+            return
+        shown, accept, size_filters = self.search_state
+        results, truncated = task.index.add_fuzzy(shown, fuzzy, SEARCH_RESULT_LIMIT, accept)
+        self.add_search_items(results[len(shown):])
+        self.update_search_status(len(results), truncated, False)
     
-    def on_file_selected(self, item, column):
-        file_path = item.data(0, Qt.UserRole)
+    def add_search_items(self, nodes):
+        model = self.tree_model
+        for node in nodes:
+            item = QListWidgetItem(model.rel_path(node))
+            item.setData(Qt.UserRole, node)
+            if model.modified[node]:
+                item.setForeground(QColor(255, 0, 0))
+            self.search_results.addItem(item)
+    
+    def update_search_status(self, count, truncated, fuzzy_pending):
+        status = f"找到 {count} 个文件"
+        if truncated:
+            status = f"只显示前 {count} 个结果，请输入更多文字缩小范围"
+        elif fuzzy_pending:
+            status += "，正在查找模糊匹配..."
+        if self.search_state[2] and self.meta_thread is not None:
+            status += f" (正在读取图片尺寸 {len(self.tree_model.meta)}/{len(self.search_index)})"
+        self.search_status_label.setText(status)
+    
+    def on_search_result_selected(self, current, previous):
+        if current is not None:
+            self.reveal_in_tree(current.data(Qt.UserRole))
+    
+    def reveal_in_tree(self, node):
+        """在文件树中选中这个文件，视图会自动展开它的上级文件夹"""
+        index = self.tree_model.index_of(node)
+        self.file_tree.setCurrentIndex(index)
+        self.file_tree.scrollTo(index)
+    
+    def on_current_item_changed(self, current, previous):
+        if current.isValid():
+            self.on_file_selected(current.data(Qt.UserRole))
+    
+    def on_file_selected(self, file_path):
         
-        if os.path.isfile(file_path):
+        if file_path and os.path.isfile(file_path):
             self.current_selected_file = file_path
             self.replace_btn.setEnabled(True)
+            self.clear_replace_btn.setEnabled(True)
             self.display_file_info(file_path)
     
     def display_file_info(self, file_path):
@@ -627,7 +1593,14 @@ class FileViewerApp(QMainWindow):
         
         ext = os.path.splitext(file_path)[1].lower()
         
+        # 之前的预览还没加载完的不再显示
+        self.cancel_pending_previews()
+        self.current_preview_stamp = self.preview_stamp()
+        self.sync_watched_files()
+        
         # 清除所有场景
+        self.original_preview.clear_image()
+        self.replacement_preview.clear_image()
         self.original_scene.clear()
         self.replacement_scene.clear()
         self.arrow_scene.clear()
@@ -647,13 +1620,51 @@ class FileViewerApp(QMainWindow):
                 # 获取图片尺寸
                 width, height = self.get_image_size(file_path)
                 file_info += f"\n尺寸: {width} x {height} 像素"
+                
+                meta = self.get_image_meta(file_path)
+                if meta is not None:
+                    file_info += f"\n格式: {meta.format} | mipmap: {meta.mip_count} | 透明通道: {'有' if meta.has_alpha else '无'}"
+                
+                sprite_names = self.sprite_names_of(file_path)
+                if sprite_names:
+                    shown = ", ".join(sprite_names[:SPRITE_NAMES_SHOWN])
+                    if len(sprite_names) > SPRITE_NAMES_SHOWN:
+                        shown += f" 等 {len(sprite_names)} 个"
+                    file_info += f"\n引用此文件的sprite: {shown}"
+                elif sprite_names is not None:
+                    file_info += "\n没有sprite引用此文件"
+                
+                other_mods = self.current_mod_providers(file_path)
+                if other_mods:
+                    file_info += f"\n其他提供此文件的mod: {', '.join(other_mods)}"
             except Exception as e:
                 file_info += f"\n读取图片时出错: {str(e)}"
-                QMessageBox.warning(self, "图片读取错误", f"无法读取图片文件: {str(e)}")
         
         self.file_info_text.setText(file_info)
     
     def get_image_size(self, file_path):
+        size = self.image_cache.get(file_path, "size")
+        if size is None:
+            size = self.read_image_size(file_path)
+            self.image_cache.put(file_path, "size", size, 64)
+        return size
+    
+    def get_image_meta(self, file_path):
+        """只读取文件头获取图片信息，无法识别时返回None"""
+        meta = self.image_cache.get(file_path, "meta")
+        if meta is None:
+            try:
+                meta = image_meta.probe(file_path)
+            except (OSError, ValueError, struct.error):
+                return None
+            self.image_cache.put(file_path, "meta", meta, 128)
+        return meta
+    
+    def read_image_size(self, file_path):
+        meta = self.get_image_meta(file_path)
+        if meta is not None:
+            return meta.width, meta.height
+        
         ext = os.path.splitext(file_path)[1].lower()
         
         if ext in ('.dds', '.tga'):
@@ -665,40 +1676,176 @@ class FileViewerApp(QMainWindow):
             size = reader.size()
             return size.width(), size.height()
     
+    def preview_edge(self, view):
+        """根据预览窗口大小选择缩略图边长"""
+        size = max(view.viewport().width(), view.viewport().height())
+        for edge in THUMBNAIL_EDGES:
+            if edge >= size:
+                return edge
+        return THUMBNAIL_EDGES[-1]
+    
     def display_image(self, file_path, scene, is_original=True):
-        ext = os.path.splitext(file_path)[1].lower()
+        view = self.original_preview if is_original else self.replacement_preview
+        edge = self.preview_edge(view)
+        
+        # 内存缓存命中时直接显示，否则先显示占位文字，在后台线程解码
+        image = self.image_cache.get(file_path, ("preview", edge))
+        self.update_cache_status()
+        if image is not None:
+            self.show_preview_image(file_path, image, scene, view)
+            return
         
-        if ext in ('.dds', '.tga'):
-            from PIL import Image
-            pil_image = Image.open(file_path)
-            
-            # 转换为QImage
-            if pil_image.mode == "RGBA":
-                qimage = QImage(pil_image.tobytes(), pil_image.width, pil_image.height, QImage.Format_RGBA8888)
-            elif pil_image.mode == "RGB":
-                qimage = QImage(pil_image.tobytes(), pil_image.width, pil_image.height, QImage.Format_RGB888)
+        view.clear_image()
+        scene.clear()
+        scene.addText("加载中...")
+        view.fitInView(scene.itemsBoundingRect(), Qt.KeepAspectRatio)
+        
+        loader = PreviewLoader(self, self.preview_generation, file_path, edge, is_original)
+        loader.signals.loaded.connect(self.on_preview_loaded)
+        self.pending_previews.append(loader)
+        self.preview_pool.start(loader)
+    
+    def cancel_pending_previews(self):
+        """选择变化时取消尚未开始的预览解码，已经在运行的解码完成后也不会显示"""
+        self.preview_generation += 1
+        # 已经开始运行的任务要保留引用，直到它发出完成信号
+        running = []
+        for loader in self.pending_previews:
+            if self.preview_pool.tryTake(loader):
+                loader.signals.deleteLater()
             else:
-                pil_image = pil_image.convert("RGB")
-                qimage = QImage(pil_image.tobytes(), pil_image.width, pil_image.height, QImage.Format_RGB888)
-            
-            pixmap = QPixmap.fromImage(qimage)
-        else:
-            reader = QImageReader(file_path)
-            image = reader.read()
-            if image.isNull():
-                raise Exception("Qt无法读取此图片")
-            pixmap = QPixmap.fromImage(image)
+                running.append(loader)
+        self.pending_previews = running
+    
+    def load_full_preview(self, is_original):
+        """预览放大到超过缩小图的分辨率时在后台解码原图"""
+        view = self.original_preview if is_original else self.replacement_preview
+        if view.file_path is None:
+            return
+        loader = PreviewLoader(self, self.preview_generation, view.file_path, None, is_original)
+        loader.signals.loaded.connect(self.on_preview_loaded)
+        self.pending_previews.append(loader)
+        self.preview_pool.start(loader)
+    
+    def on_preview_loaded(self, loader, image, error):
+        if loader in self.pending_previews:
+            self.pending_previews.remove(loader)
+        loader.signals.deleteLater()
+        
+        # 只显示最新一次选择的结果
+        if loader.generation != self.preview_generation:
+            return
         
+        scene = self.original_scene if loader.is_original else self.replacement_scene
+        view = self.original_preview if loader.is_original else self.replacement_preview
+        if loader.edge is None:
+            # 原图只替换已显示的缩小图，保持当前的缩放和位置
+            if error:
+                self.file_info_text.append(f"\n读取原图时出错: {error}")
+            elif view.pixmap_item is not None and view.file_path == loader.file_path:
+                view.pixmap_item.setPixmap(QPixmap.fromImage(image))
+                view.pixmap_item.setScale(1.0)
+            return
+        if error:
+            view.clear_image()
+            scene.clear()
+            scene.addText(f"无法读取图片:\n{error}")
+            view.fitInView(scene.itemsBoundingRect(), Qt.KeepAspectRatio)
+            self.file_info_text.append(f"\n读取图片时出错: {error}")
+            return
+        
+        self.update_cache_status()
+        self.show_preview_image(loader.file_path, image, scene, view)
+    
+    def show_preview_image(self, file_path, image, scene, view):
+        pixmap = QPixmap.fromImage(image)
+        item = QGraphicsPixmapItem(pixmap)
+        item.setTransformationMode(Qt.SmoothTransformation)
+        
+        # 缩小图按原图尺寸显示，放大时再换成原图，场景坐标不变
+        try:
+            width, height = self.get_image_size(file_path)
+        except Exception:
+            width = pixmap.width()
+        full_resolution = width <= pixmap.width()
+        if not full_resolution and pixmap.width() > 0:
+            item.setScale(width / pixmap.width())
+        
+        view.clear_image()
         scene.clear()
-        scene.addItem(QGraphicsPixmapItem(pixmap))
+        scene.addItem(item)
+        view.set_image(file_path, item, full_resolution)
         
         # 调整视图大小
-        if is_original:
-            self.original_preview.fitInView(scene.itemsBoundingRect(), Qt.KeepAspectRatio)
-            self.original_preview.show()
-        else:
-            self.replacement_preview.fitInView(scene.itemsBoundingRect(), Qt.KeepAspectRatio)
-            self.replacement_preview.show()
+        view.fitInView(scene.itemsBoundingRect(), Qt.KeepAspectRatio)
+        view.show()
+    
+    def load_preview_image(self, file_path, edge):
+        """解码预览图片，在后台线程中调用，不能访问界面部件
+
+        edge为None时解码原图，原图不放入内存缓存。
+        """
+        if edge is None:
+            return self.load_full_image(file_path)
+        
+        # 先查磁盘缩略图，只有缩略图生成失败时才完整解码
+        image = None
+        try:
+            # DDS和TGA由Pillow缩小解码，其他格式由Qt读取缩小图
+            write = None
+            if os.path.splitext(file_path)[1].lower() not in ('.dds', '.tga'):
+                write = lambda temp_path: self.save_scaled_image(file_path, edge, temp_path)
+            thumb_path = self.thumbnail_cache.get_or_create(file_path, edge, write)
+            image = QImageReader(thumb_path).read()
+        except Exception as e:
+            print(f"生成缩略图失败: {file_path}, 错误: {str(e)}")
+        
+        if image is None or image.isNull():
+            image = self.load_full_image(file_path)
+        self.image_cache.put(file_path, ("preview", edge), image, image.sizeInBytes())
+        return image
+    
+    def save_scaled_image(self, file_path, edge, temp_path):
+        """用Qt读取缩小的PNG等格式并保存为缩略图
+
+        QImageReader设置缩放尺寸后由libpng逐行解码并缩小，不需要整张原图的内存。
+        """
+        reader = QImageReader(file_path)
+        size = reader.size()
+        if size.isValid() and max(size.width(), size.height()) > edge:
+            reader.setScaledSize(size.scaled(edge, edge, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            raise Exception(reader.errorString())
+        if not image.save(temp_path, "PNG", 80):
+            raise Exception("无法写入缩略图")
+    
+    def load_full_image(self, file_path):
+        ext = os.path.splitext(file_path)[1].lower()
+        
+        if ext in ('.dds', '.tga'):
+            from PIL import Image
+            with Image.open(file_path) as pil_image:
+                pil_image.load()
+                # QImage引用Pillow导出的一份像素缓冲区，保留L/LA/P/I;16等模式的透明度
+                return image_bridge.pil_to_qimage(pil_image)
+        
+        reader = QImageReader(file_path)
+        image = reader.read()
+        if image.isNull():
+            raise Exception("Qt无法读取此图片")
+        return image
+    
+    def update_cache_status(self):
+        stats = self.image_cache.stats()
+        self.statusBar().showMessage(
+            f"图片缓存: 命中 {stats['hits']} | 未命中 {stats['misses']} | 淘汰 {stats['evictions']} | "
+            f"已用 {stats['used_bytes']/1024/1024:.1f} / {stats['max_bytes']/1024/1024:.0f} MB"
+        )
+    
+    def on_cache_limit_changed(self, value):
+        self.image_cache.set_limit_mb(value)
+        self.update_cache_status()
     
     def draw_arrow(self):
         self.arrow_scene.clear()
@@ -718,6 +1865,64 @@ class FileViewerApp(QMainWindow):
         self.arrow_scene.addItem(arrow_head1)
         self.arrow_scene.addItem(arrow_head2)
     
+    def bulk_map_replacements(self):
+        """按规则把整个替换文件夹对应到gfx文件，预览确认后一次性应用"""
+        if not self.gfx_folder_path or self.scan_thread is not None or not self.tree_model.names:
+            QMessageBox.warning(self, "警告", "请先加载mod并等待gfx文件夹扫描完成")
+            return
+        
+        gfx_paths = [rel_path for rel_path, node in self.tree_model.iter_files()]
+        prefix_length = len(self.gfx_folder_path) + 1
+        replaced_paths = [orig[prefix_length:].replace(os.sep, "/") for orig in self.replacement_files
+                          if orig.startswith(self.gfx_folder_path + os.sep)]
+        dialog = BulkMappingDialog(gfx_paths, replaced_paths, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        
+        for mapping in dialog.mappings:
+            orig = os.path.join(self.gfx_folder_path, *mapping.gfx_path.split("/"))
+            repl = os.path.join(dialog.replacement_folder, *mapping.replacement_path.split("/"))
+            self.replacement_files[orig] = repl
+        # 全部对应关系加入后只刷新一次颜色和当前文件信息
+        self.update_file_tree_colors()
+        if self.current_selected_file:
+            self.display_file_info(self.current_selected_file)
+        QMessageBox.information(self, "成功", f"已设置 {len(dialog.mappings)} 个替换文件")
+    
+    def check_replacements(self):
+        """导出前用多个进程检查全部替换文件，结果显示在可排序的表格中"""
+        if not self.replacement_files:
+            QMessageBox.warning(self, "警告", "没有设置替换文件")
+            return
+        
+        options = {
+            "dds_format": self.dds_format_combo.currentData(),
+            "mipmaps": self.dds_mipmap_combo.currentData(),
+        }
+        progress_dialog = QProgressDialog("正在检查替换文件...", "取消", 0, len(self.replacement_files), self)
+        progress_dialog.setWindowTitle("检查中")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        def on_progress(done, total):
+            progress_dialog.setValue(done)
+            QApplication.processEvents()
+            return progress_dialog.wasCanceled()
+        
+        started = time.perf_counter()
+        issues = replacement_check.run_checks(self.replacement_files, workers=self.export_workers_spin.value(),
+                                              options=options, progress=on_progress)
+        canceled = progress_dialog.wasCanceled()
+        progress_dialog.close()
+        if canceled:
+            return
+        
+        dialog = CheckReportDialog(issues, len(self.replacement_files), time.perf_counter() - started, self)
+        if dialog.exec_() == QDialog.Accepted and dialog.selected_path:
+            node = self.tree_model.node_of(dialog.selected_path)
+            if node is not None:
+                self.reveal_in_tree(node)
+    
     def select_replacement_file(self):
         if not self.current_selected_file:
             return
@@ -728,53 +1933,213 @@ class FileViewerApp(QMainWindow):
         )
         
         if file_path:
-            self.replacement_files[self.current_selected_file] = file_path
+            self.set_replacement(self.current_selected_file, file_path)
+            self.display_file_info(self.current_selected_file)
+    
+    def on_watched_dir_changed(self, folder):
+        self.pending_dir_changes.add(folder)
+        self.fs_change_timer.start()
+    
+    def on_watched_file_changed(self, file_path):
+        self.pending_file_changes.add(file_path)
+        self.fs_change_timer.start()
+    
+    def apply_fs_changes(self):
+        """防抖结束后统一处理文件系统变化：增量更新文件树，刷新受影响的预览"""
+        dir_changes, self.pending_dir_changes = self.pending_dir_changes, set()
+        file_changes, self.pending_file_changes = self.pending_file_changes, set()
+        
+        # 先处理上级文件夹，被删除的子文件夹会在上级中一并移除
+        files_changed = False
+        for folder in sorted(dir_changes, key=len):
+            files_changed = self.apply_dir_change(folder) or files_changed
+        # 有文件增删时重建搜索索引(扫描未完成时索引在扫描结束后建立)
+        if files_changed and self.search_index is not None:
+            self.rebuild_search_index()
+        # 创意工坊索引中这个mod的扫描结果已过时
+        if files_changed and self.workshop_index is not None:
+            mod = self.workshop_index.mod_of(self.current_file_path)
+            if mod is not None:
+                self.workshop_index.forget(mod)
+        
+        for file_path in file_changes:
+            self.image_cache.invalidate(file_path)
+        # 保存时被替换掉的文件需要重新加入监视
+        self.sync_watched_files()
+        
+        # 当前预览的文件有变化时重新显示
+        if self.current_selected_file and self.preview_stamp() != self.current_preview_stamp:
+            if os.path.isfile(self.current_selected_file):
+                self.display_file_info(self.current_selected_file)
+    
+    def apply_dir_change(self, folder):
+        """重新读取一个文件夹，增量更新文件树，返回是否有文件或文件夹增删"""
+        model = self.tree_model
+        node = model.node_of(folder, is_dir=True)
+        if node is None or not model.loaded[node]:
+            return False
+        old_subdirs, old_files = model.list_dir(node)
+        if not os.path.isdir(folder):
+            subdirs, files = [], []
+        else:
+            subdirs, files = mod_files.list_gfx_dir(folder)
+        
+        removed_dirs = set(old_subdirs) - set(subdirs)
+        removed_files = set(old_files) - set(files)
+        added_dirs = [name for name in subdirs if name not in set(old_subdirs)]
+        added_files = [name for name in files if name not in set(old_files)]
+        if not (removed_dirs or removed_files or added_dirs or added_files):
+            # 文件夹内容没有增删，可能是文件被修改，清除这些文件的缓存
+            for name in files:
+                self.image_cache.invalidate(os.path.join(folder, name))
+            model.refresh_meta(node)
+            return False
+        
+        # 移除被删除的文件和文件夹(含其中全部内容)
+        removed_folders = []
+        removed_paths = []
+        for name, is_dir in [(name, True) for name in removed_dirs] + [(name, False) for name in removed_files]:
+            sub_folders, sub_files = model.remove_child(model.find_child(node, name, is_dir))
+            removed_folders.extend(sub_folders)
+            removed_paths.extend(sub_files)
+        # 已被删除的文件夹Qt会自动停止监视，这里只移除仍在监视列表中的
+        watched_removed = set(removed_folders) & set(self.fs_watcher.directories())
+        if watched_removed:
+            self.fs_watcher.removePaths(list(watched_removed))
+        for path in removed_paths:
+            self.image_cache.invalidate(path)
+        
+        # 按排序位置插入新的子节点，新增的文件夹扫描后加入监视
+        for name in added_dirs:
+            model.insert_child(node, name, True)
+            for entry in mod_files.iter_gfx_dirs(os.path.join(folder, name)):
+                model.set_dir_contents(model.node_of(entry[0], is_dir=True), entry[1], entry[2])
+                self.apply_modified_flags(entry[0])
+                self.fs_watcher.addPath(entry[0])
+        for name in added_files:
+            model.insert_child(node, name, False)
+        self.apply_modified_flags(folder)
+        return True
+    
+    def sync_watched_files(self):
+        """监视所有替换文件和当前选中的原文件"""
+        if len(self.replacement_files) <= WATCHED_REPLACEMENTS_LIMIT:
+            wanted = set(self.replacement_files.values())
+        else:
+            wanted = set()
+        if self.current_selected_file:
+            wanted.add(self.current_selected_file)
+            if self.current_selected_file in self.replacement_files:
+                wanted.add(self.replacement_files[self.current_selected_file])
+        wanted = {path for path in wanted if os.path.isfile(path)}
+        watched = set(self.fs_watcher.files())
+        if watched - wanted:
+            self.fs_watcher.removePaths(list(watched - wanted))
+        if wanted - watched:
+            self.fs_watcher.addPaths(list(wanted - watched))
+    
+    def preview_stamp(self):
+        """当前预览的原文件和替换文件的 (修改时间, 大小)"""
+        stamp = []
+        for path in (self.current_selected_file, self.replacement_files.get(self.current_selected_file)):
+            try:
+                stat = os.stat(path) if path else None
+                stamp.append((stat.st_mtime_ns, stat.st_size) if stat else None)
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+    
+    def set_replacement(self, orig_path, repl_path):
+        """设置一个替换文件，只更新这个文件及其上级文件夹的颜色"""
+        if orig_path not in self.replacement_files:
+            self.mark_modified(orig_path, 1)
+        self.replacement_files[orig_path] = repl_path
+    
+    def remove_replacement(self, orig_path):
+        """取消一个替换文件，只更新这个文件及其上级文件夹的颜色"""
+        if self.replacement_files.pop(orig_path, None) is not None:
+            self.mark_modified(orig_path, -1)
+    
+    def clear_current_replacement(self):
+        if self.current_selected_file in self.replacement_files:
+            self.remove_replacement(self.current_selected_file)
             self.display_file_info(self.current_selected_file)
-            self.update_file_tree_colors()
+    
+    def modified_ancestors(self, file_path):
+        """返回gfx文件夹内某个文件的所有上级文件夹路径(含gfx文件夹本身)"""
+        root = self.gfx_folder_path
+        if not root or not file_path.startswith(root + os.sep):
+            return []
+        ancestors = []
+        folder = os.path.dirname(file_path)
+        while len(folder) >= len(root):
+            ancestors.append(folder)
+            folder = os.path.dirname(folder)
+        return ancestors
+    
+    def mark_modified(self, file_path, delta):
+        self.set_item_color(file_path, delta > 0)
+        # 搜索结果的颜色和"已替换"过滤也随之变化
+        if self.search_active():
+            self.schedule_search()
+        for folder in self.modified_ancestors(file_path):
+            count = self.modified_counts.get(folder, 0) + delta
+            if count > 0:
+                self.modified_counts[folder] = count
+            else:
+                self.modified_counts.pop(folder, None)
+            # 只有计数在0和非0之间变化时才需要改颜色
+            if count == (1 if delta > 0 else 0):
+                self.set_item_color(folder, count > 0, is_dir=True)
+    
+    def set_item_color(self, path, modified, is_dir=False):
+        node = self.tree_model.node_of(path, is_dir)
+        if node is not None:
+            self.tree_model.set_modified(node, modified)
+    
+    def apply_modified_flags(self, folder):
+        """为文件夹中新建的子节点设置修改标志，文件夹中没有被替换的文件时不需要检查"""
+        if folder not in self.modified_counts:
+            return
+        model = self.tree_model
+        node = model.node_of(folder, is_dir=True)
+        for child in model.children[node]:
+            path = os.path.join(folder, model.names[child])
+            if path in self.replacement_files or path in self.modified_counts:
+                model.set_modified(child, True)
     
     def update_file_tree_colors(self):
-        def traverse_items(item):
-            has_modified_child = False
-            
-            for i in range(item.childCount()):
-                child = item.child(i)
-                file_path = child.data(0, Qt.UserRole)
-                
-                if file_path:
-                    if os.path.isfile(file_path):
-                        # 文件项
-                        if file_path in self.replacement_files:
-                            child.setForeground(0, QColor(255, 0, 0))
-                            has_modified_child = True
-                        else:
-                            child.setForeground(0, QColor(0, 0, 0))
-                    elif os.path.isdir(file_path):
-                        # 文件夹项，递归处理
-                        child_has_modified = traverse_items(child)
-                        if child_has_modified:
-                            child.setForeground(0, QColor(255, 0, 0))
-                            has_modified_child = True
-                        else:
-                            child.setForeground(0, QColor(0, 0, 0))
-                
-            return has_modified_child
-        
-        # 从根节点开始遍历
-        root = self.file_tree.invisibleRootItem()
-        for i in range(root.childCount()):
-            item = root.child(i)
-            traverse_items(item)
+        """根据replacement_files重新计算全部修改状态，用于导入配置等批量修改"""
+        self.modified_counts = {}
+        for orig_path in self.replacement_files:
+            for folder in self.modified_ancestors(orig_path):
+                self.modified_counts[folder] = self.modified_counts.get(folder, 0) + 1
+        
+        # 只查找已经扫描到的节点，不访问文件系统
+        model = self.tree_model
+        nodes = [model.node_of(path) for path in self.replacement_files]
+        nodes += [model.node_of(path, is_dir=True) for path in self.modified_counts]
+        model.set_all_modified(node for node in nodes if node is not None)
+        
+        if self.search_active():
+            self.schedule_search()
+        self.sync_watched_files()
 
 if __name__ == "__main__":
+    # 打包为exe后多进程导出需要此调用；未打包时它什么也不做，不必在启动时导入multiprocessing
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     app = QApplication([])
     
-    # 检查Pillow库是否安装
-    try:
-        from PIL import Image
-    except ImportError:
+    # 只检查Pillow库是否安装，第一次读取图片时才导入
+    import importlib.util
+    if importlib.util.find_spec("PIL") is None:
         QMessageBox.critical(None, "缺少依赖", "需要安装Pillow库来处理DDS和TGA文件\n请运行: pip install pillow")
         exit(1)
     
     window = FileViewerApp()
     window.show()
+    # 窗口显示后再恢复会话，扫描在后台线程中进行
+    QTimer.singleShot(0, window.finish_startup)
     app.exec_()
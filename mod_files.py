@@ -0,0 +1,113 @@
+import os
+import re
+
+# 本模块不依赖PyQt5，界面和命令行模式共用
+
+IMAGE_EXTS = ('.png', '.dds', '.tga')
+
+NAME_RE = re.compile(r'name\s*=\s*"([^"]+)"')
+VERSION_RE = re.compile(r'version\s*=\s*"([^"]+)"')
+
+
+def user_cache_dir(*parts):
+    """返回(并创建)本工具的用户缓存目录"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'HOI4-GFX-Swaper', *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def parse_descriptor(file_path):
+    """解析descriptor.mod，返回 {"name": 名称, "version": 版本}，未找到的字段为None"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    name_match = NAME_RE.search(content)
+    version_match = VERSION_RE.search(content)
+    return {
+        "name": name_match.group(1) if name_match else None,
+        "version": version_match.group(1) if version_match else None,
+    }
+
+
+def build_descriptor(name, dependency, version="1.0"):
+    """生成依赖于原mod的替换补丁descriptor.mod内容"""
+    def quote(text):
+        return text.replace('\\', '\\\\').replace('"', '\\"')
+
+    lines = [
+        f'version="{quote(version)}"',
+        'tags={',
+        '\t"Graphics"',
+        '}',
+        f'name="{quote(name)}"',
+    ]
+    if dependency:
+        lines += ['dependencies={', f'\t"{quote(dependency)}"', '}']
+    return "\n".join(lines) + "\n"
+
+
+def default_patch_name(mod_name):
+    """替换补丁的默认名称"""
+    return f"{mod_name} 图像替换" if mod_name else "图像替换补丁"
+
+
+def list_gfx_dir(folder):
+    """列出一个文件夹的直接内容，返回 (子文件夹名列表, 图片文件名列表)
+
+    DirEntry自带文件类型信息，不需要为每个条目再调用一次stat。
+    """
+    subdirs = []
+    files = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    subdirs.append(entry.name)
+                elif entry.name.lower().endswith(IMAGE_EXTS):
+                    files.append(entry.name)
+    except OSError as e:
+        print(f"加载文件夹时出错: {str(e)}")
+    subdirs.sort()
+    files.sort()
+    return subdirs, files
+
+
+def iter_gfx_dirs(gfx_folder_path):
+    """遍历gfx文件夹，逐个文件夹返回 (文件夹路径, 子文件夹名列表, 图片文件名列表)"""
+    stack = [gfx_folder_path]
+    while stack:
+        folder = stack.pop()
+        subdirs, files = list_gfx_dir(folder)
+        yield folder, subdirs, files
+        stack.extend(os.path.join(folder, name) for name in reversed(subdirs))
+
+
+def scan_gfx_files(gfx_folder_path):
+    """递归列出gfx文件夹下所有图片文件的完整路径"""
+    all_files = []
+    for folder, subdirs, files in iter_gfx_dirs(gfx_folder_path):
+        all_files.extend(os.path.join(folder, name) for name in files)
+    return all_files
+
+
+def rebase_replacements(replacements, old_mod_folder, new_mod_folder):
+    """mod文件夹位置变化时(例如在另一台机器上)，把原文件路径换到新的mod文件夹下"""
+    old_mod_folder = os.path.normpath(old_mod_folder)
+    new_mod_folder = os.path.normpath(new_mod_folder)
+    if old_mod_folder == new_mod_folder:
+        return dict(replacements)
+
+    rebased = {}
+    for orig, repl in replacements.items():
+        if orig.startswith(old_mod_folder + os.sep):
+            orig = os.path.join(new_mod_folder, os.path.relpath(orig, old_mod_folder))
+        rebased[orig] = repl
+    return rebased
@@ -0,0 +1,187 @@
+import os
+import struct
+
+import image_meta
+
+# 预览用的缩小解码: 预览窗口只有几百像素，不需要解码完整的大图。
+# DDS选择不小于预览边长的最小一级mipmap，只读取这一级的数据；
+# 没有合适mipmap的DDS和未压缩TGA按条带读取，每条解码后立即缩小，
+# 内存占用只与预览尺寸和条带大小有关，与原图尺寸无关。
+# 无法按条带读取的格式返回None，由调用方完整解码。
+
+# 块压缩格式每个4x4块的字节数(格式名与image_meta一致)
+BLOCK_BYTES = {
+    "DXT1": 8, "BC1": 8, "BC1_SRGB": 8, "BC4": 8, "BC4_SNORM": 8,
+    "DXT2": 16, "DXT3": 16, "DXT4": 16, "DXT5": 16,
+    "BC2": 16, "BC2_SRGB": 16, "BC3": 16, "BC3_SRGB": 16, "BC5": 16, "BC5_SNORM": 16,
+    "BC6H": 16, "BC6H_UF16": 16, "BC6H_SF16": 16, "BC7": 16, "BC7_SRGB": 16,
+}
+
+# DX10扩展头中未压缩格式每像素的位数
+DXGI_BITS = {2: 128, 10: 64, 11: 64, 24: 32, 27: 32, 28: 32, 29: 32, 61: 8, 87: 32, 88: 32, 90: 32, 91: 32}
+
+DDS_HEADER_SIZE = 128
+DX10_HEADER_SIZE = 20
+DDSD_LINEARSIZE = 0x80000
+DDSD_PITCH = 0x8
+DDSCAPS2_CUBEMAP = 0x200
+DDSCAPS2_VOLUME = 0x200000
+
+# 未压缩TGA: 每像素位数 -> (Pillow模式, rawmode)
+TGA_MODES = {24: ("RGB", "BGR"), 32: ("RGBA", "BGRA"), 8: ("L", "L")}
+
+# 每个条带解码后的目标行数，条带越高Pillow调用越少
+STRIP_OUTPUT_ROWS = 4
+
+
+def reduce_factor(width, height, edge):
+    """缩小到最长边不小于edge的整数倍数"""
+    return max(1, max(width, height) // edge)
+
+
+def open_reduced(file_path, edge):
+    """返回最长边不小于edge(原图更小时为原图)的Pillow图像，不支持缩小解码时返回None"""
+    with open(file_path, 'rb') as f:
+        head = f.read(DDS_HEADER_SIZE + DX10_HEADER_SIZE)
+        if head[:4] == b'DDS ':
+            return _open_dds(f, head, edge)
+        if os.path.splitext(file_path)[1].lower() == '.tga':
+            return _open_tga(f, head, edge)
+    return None
+
+
+def _dds_layout(head):
+    """返回 (ImageMeta, 数据起始位置, 每个4x4块的字节数或None, 每像素位数或None)，不支持时返回None"""
+    meta = image_meta._probe_dds(head)
+    caps2 = struct.unpack_from('<I', head, 112)[0]
+    if caps2 & (DDSCAPS2_CUBEMAP | DDSCAPS2_VOLUME):
+        return None
+    pf_flags, fourcc, bit_count = struct.unpack_from('<I4sI', head, 80)
+    offset = DDS_HEADER_SIZE
+    if pf_flags & image_meta.DDPF_FOURCC and fourcc == b'DX10':
+        offset += DX10_HEADER_SIZE
+        array_size = struct.unpack_from('<I', head, 140)[0]
+        if array_size > 1:
+            return None
+        dxgi_format = struct.unpack_from('<I', head, 128)[0]
+        if meta.format in BLOCK_BYTES:
+            return meta, offset, BLOCK_BYTES[meta.format], None
+        if dxgi_format in DXGI_BITS:
+            return meta, offset, None, DXGI_BITS[dxgi_format]
+        return None
+    if pf_flags & image_meta.DDPF_FOURCC:
+        if meta.format in BLOCK_BYTES:
+            return meta, offset, BLOCK_BYTES[meta.format], None
+        return None
+    if bit_count % 8:
+        return None
+    return meta, offset, None, bit_count
+
+
+def _level_rows_bytes(width, block_bytes, bit_count):
+    """返回 (每行数据字节数, 每个数据行包含的像素行数)"""
+    if block_bytes:
+        return max(1, (width + 3) // 4) * block_bytes, 4
+    return width * bit_count // 8, 1
+
+
+def _open_dds(f, head, edge):
+    layout = _dds_layout(head)
+    if layout is None:
+        return None
+    meta, offset, block_bytes, bit_count = layout
+
+    # 选择最长边不小于edge的最小一级mipmap，跳过它之前各级的数据
+    level = 0
+    width, height = meta.width, meta.height
+    while level + 1 < meta.mip_count and max(width // 2, height // 2) >= edge:
+        row_bytes, row_pixels = _level_rows_bytes(width, block_bytes, bit_count)
+        offset += row_bytes * ((height + row_pixels - 1) // row_pixels)
+        width, height = max(1, width // 2), max(1, height // 2)
+        level += 1
+
+    factor = reduce_factor(width, height, edge)
+    row_bytes, row_pixels = _level_rows_bytes(width, block_bytes, bit_count)
+    # 条带高度同时是缩小倍数和块高度的整数倍
+    strip_rows = factor * row_pixels * STRIP_OUTPUT_ROWS
+    f.seek(offset)
+    if factor == 1:
+        strip_rows = height
+
+    result = None
+    for top in range(0, height, strip_rows):
+        rows = min(strip_rows, height - top)
+        data_rows = (rows + row_pixels - 1) // row_pixels
+        data = f.read(row_bytes * data_rows)
+        if len(data) < row_bytes * data_rows:
+            raise ValueError("DDS数据不完整")
+        strip = _decode_dds_strip(head, width, rows, row_bytes, data_rows, data)
+        if factor > 1:
+            strip = strip.reduce(factor)
+        if result is None:
+            if factor == 1:
+                return strip
+            from PIL import Image
+            result = Image.new(strip.mode, ((width + factor - 1) // factor, (height + factor - 1) // factor))
+        result.paste(strip, (0, top // factor))
+    return result
+
+
+def _decode_dds_strip(head, width, rows, row_bytes, data_rows, data):
+    """把一段行数据包装为只有一级的DDS交给Pillow解码"""
+    from PIL import Image
+    import io
+
+    header = bytearray(head[:DDS_HEADER_SIZE])
+    flags = struct.unpack_from('<I', header, 8)[0]
+    flags &= ~0x20000  # 去掉DDSD_MIPMAPCOUNT
+    if flags & DDSD_PITCH:
+        pitch = row_bytes
+    else:
+        flags |= DDSD_LINEARSIZE
+        pitch = row_bytes * data_rows
+    struct.pack_into('<5I', header, 8, flags, rows, width, pitch, 0)
+    struct.pack_into('<I', header, 28, 1)
+    extra = head[DDS_HEADER_SIZE:DDS_HEADER_SIZE + DX10_HEADER_SIZE] if head[84:88] == b'DX10' else b''
+    with Image.open(io.BytesIO(bytes(header) + extra + data)) as img:
+        img.load()
+        return img
+
+
+def _open_tga(f, head, edge):
+    meta = image_meta._probe_tga(head)
+    id_length, cmap_type, image_type = struct.unpack_from('<3B', head, 0)
+    cmap_length, cmap_entry_size = struct.unpack_from('<HB', head, 5)
+    depth, descriptor = head[16], head[17]
+    # 只处理未压缩的真彩色和灰度图；RLE压缩需要逐个像素解码，调用方完整解码
+    if image_type not in (2, 3) or depth not in TGA_MODES:
+        return None
+
+    factor = reduce_factor(meta.width, meta.height, edge)
+    if factor == 1:
+        return None
+    mode, rawmode = TGA_MODES[depth]
+    if depth == 32 and not descriptor & 0x0F:
+        # 32位但没有声明透明通道时第四个字节不是透明度
+        mode, rawmode = "RGB", "BGRX"
+
+    from PIL import Image
+    width, height = meta.width, meta.height
+    row_bytes = width * depth // 8
+    f.seek(18 + id_length + (cmap_length * ((cmap_entry_size + 7) // 8) if cmap_type else 0))
+    strip_rows = factor * STRIP_OUTPUT_ROWS
+    result = Image.new(mode, ((width + factor - 1) // factor, (height + factor - 1) // factor))
+    for top in range(0, height, strip_rows):
+        rows = min(strip_rows, height - top)
+        data = f.read(row_bytes * rows)
+        if len(data) < row_bytes * rows:
+            raise ValueError("TGA数据不完整")
+        strip = Image.frombuffer(mode, (width, rows), data, "raw", rawmode, 0, 1).reduce(factor)
+        result.paste(strip, (0, top // factor))
+
+    # 默认原点在左下角，文件中的行从下往上存放
+    if not descriptor & 0x20:
+        result = result.transpose(Image.FLIP_TOP_BOTTOM)
+    if descriptor & 0x10:
+        result = result.transpose(Image.FLIP_LEFT_RIGHT)
+    return result
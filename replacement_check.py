@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import struct
+from collections import namedtuple
+from concurrent.futures import as_completed
+
+import export_engine
+import image_meta
+
+# 导出前检查全部替换文件: 尺寸、DXT块对齐、透明通道这些只需要文件头；
+# 替换文件有透明通道时才解码一张缩小图，用NumPy统计透明像素比例。
+# 本模块不依赖PyQt5，检查在子进程中按批执行。
+
+SEVERITY_NAMES = {"error": "错误", "warning": "警告"}
+
+# 单个问题: code为固定的英文标识，便于在JSON报告中筛选
+Issue = namedtuple("Issue", ["orig_path", "repl_path", "severity", "code", "message"])
+
+# 统计透明度时解码的最长边，比例不需要完整分辨率
+PIXEL_CHECK_EDGE = 256
+
+# 每个子进程任务检查的条目数，条目很小，逐个提交时进程通信比检查本身还慢
+BATCH_SIZE = 64
+
+# 透明像素超过此比例视为整张图片透明
+TRANSPARENT_LIMIT = 0.999
+
+# 原文件不透明、导出为DXT1时，半透明像素超过此比例会明显失真
+SEMI_TRANSPARENT_LIMIT = 0.01
+
+BLOCK_FORMATS = ('DXT1', 'DXT5')
+
+
+def read_header(path):
+    """只读取文件头，返回 (宽, 高, 是否有透明通道)，Pillow也无法打开时抛出异常"""
+    try:
+        meta = image_meta.probe(path)
+        return meta.width, meta.height, meta.has_alpha
+    except (ValueError, struct.error):
+        pass
+    from PIL import Image
+    with Image.open(path) as img:
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        return img.width, img.height, has_alpha
+
+
+def alpha_ratios(path):
+    """解码缩小图，返回 (全透明像素比例, 半透明像素比例)；没有NumPy时返回None"""
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    from PIL import Image
+    import preview_decode
+
+    img = preview_decode.open_reduced(path, PIXEL_CHECK_EDGE) or Image.open(path)
+    with img:
+        img.thumbnail((PIXEL_CHECK_EDGE, PIXEL_CHECK_EDGE), Image.NEAREST)
+        alpha = np.asarray(img.convert('RGBA').getchannel('A'))
+    if alpha.size == 0:
+        return 0.0, 0.0
+    transparent = np.count_nonzero(alpha == 0)
+    opaque = np.count_nonzero(alpha == 255)
+    return transparent / alpha.size, (alpha.size - transparent - opaque) / alpha.size
+
+
+def cached(seen, func, path):
+    """同一张替换图片对应多个原文件(例如通用占位头像)时只读取一次，异常也一起记住"""
+    key = (func, path)
+    if key not in seen:
+        try:
+            seen[key] = (func(path), None)
+        except Exception as e:
+            seen[key] = (None, e)
+    result, error = seen[key]
+    if error is not None:
+        raise error
+    return result
+
+
+def check_one(orig_path, repl_path, options=None, seen=None):
+    """检查一对 原文件->替换文件，返回问题列表；seen为同一批检查共用的读取结果"""
+    seen = {} if seen is None else seen
+
+    def issue(severity, code, message):
+        return Issue(orig_path, repl_path, severity, code, message)
+
+    if not os.path.isfile(repl_path):
+        return [issue("error", "missing", "替换文件不存在")]
+    try:
+        width, height, has_alpha = cached(seen, read_header, repl_path)
+    except Exception as e:
+        return [issue("error", "unreadable", f"无法读取替换文件: {str(e)}")]
+
+    issues = []
+    try:
+        orig_width, orig_height, orig_alpha = read_header(orig_path)
+    except Exception as e:
+        issues.append(issue("warning", "orig_unreadable", f"无法读取原文件，跳过尺寸比较: {str(e)}"))
+        orig_width, orig_height, orig_alpha = width, height, has_alpha
+
+    if (width, height) != (orig_width, orig_height):
+        issues.append(issue("warning", "size_mismatch",
+                            f"尺寸不同: 原文件 {orig_width}x{orig_height}，替换文件 {width}x{height}"))
+
+    dds_format = None
+    if os.path.splitext(orig_path)[1].lower() == '.dds':
+        dds_format, _ = export_engine.resolve_dds_options(orig_path, options)
+        if dds_format in BLOCK_FORMATS and (width % 4 or height % 4):
+            # 编码器会复制边缘像素补齐到4的倍数，游戏中可能看到多出的边
+            issues.append(issue("warning", "block_alignment",
+                                f"{dds_format}要求宽高为4的倍数，替换文件为 {width}x{height}，导出时边缘将被补齐"))
+
+    if orig_alpha and not has_alpha:
+        issues.append(issue("warning", "alpha_missing", "原文件有透明通道，替换文件没有"))
+    elif has_alpha:
+        try:
+            ratios = cached(seen, alpha_ratios, repl_path)
+        except Exception as e:
+            return issues + [issue("error", "unreadable", f"无法解码替换文件: {str(e)}")]
+        if ratios is not None:
+            transparent, semi = ratios
+            if transparent >= TRANSPARENT_LIMIT:
+                issues.append(issue("warning", "fully_transparent", "替换文件几乎完全透明"))
+            elif orig_alpha and transparent == 0 and semi == 0:
+                issues.append(issue("warning", "alpha_unused", "原文件有透明通道，替换文件的透明通道全部不透明"))
+            if dds_format == 'DXT1' and semi >= SEMI_TRANSPARENT_LIMIT:
+                issues.append(issue("warning", "dxt1_alpha",
+                                    f"导出为DXT1只保留全透明/不透明，{semi:.0%}的像素为半透明"))
+    return issues
+
+
+def check_batch(pairs, options=None):
+    """在子进程中检查一批，返回 (检查的条目数, 问题列表)"""
+    issues = []
+    seen = {}
+    for orig_path, repl_path in pairs:
+        try:
+            issues += check_one(orig_path, repl_path, options, seen)
+        except Exception as e:
+            issues.append(Issue(orig_path, repl_path, "error", "check_failed", f"检查失败: {str(e)}"))
+    return len(pairs), [tuple(item) for item in issues]
+
+
+def run_checks(replacements, workers=None, options=None, progress=None):
+    """并行检查 {原文件路径: 替换文件路径}，返回按严重程度和路径排序的问题列表
+
+    progress(done, total) 在每批完成后回调，返回True时取消尚未开始的批次。
+    """
+    # 按替换文件排序，相同的替换文件落在同一批中只读取一次
+    pairs = sorted(replacements.items(), key=lambda pair: pair[1])
+    batches = [pairs[i:i + BATCH_SIZE] for i in range(0, len(pairs), BATCH_SIZE)]
+    workers = workers or export_engine.default_worker_count()
+    total = len(pairs)
+    done = 0
+    issues = []
+
+    if workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            count, found = check_batch(batch, options)
+            done += count
+            issues += [Issue(*item) for item in found]
+            if progress and progress(done, total):
+                break
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            futures = [pool.submit(check_batch, batch, options) for batch in batches]
+            for future in as_completed(futures):
+                count, found = future.result()
+                done += count
+                issues += [Issue(*item) for item in found]
+                if progress and progress(done, total):
+                    for f in futures:
+                        f.cancel()
+                    break
+
+    issues.sort(key=lambda item: (item.severity != "error", item.orig_path, item.code))
+    return issues
+
+
+def write_report(report_path, issues, checked, seconds=None):
+    """把检查结果写成JSON报告"""
+    report = {
+        "checked": checked,
+        "errors": sum(1 for item in issues if item.severity == "error"),
+        "warnings": sum(1 for item in issues if item.severity == "warning"),
+        "seconds": round(seconds, 3) if seconds is not None else None,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "issues": [item._asdict() for item in issues],
+    }
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,193 @@
+import os
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# 替换配置文件: 第一行是头部 {"format": 2, ...}，之后每行一条 ["原文件相对mod路径", "替换文件相对路径"]，
+# 逐行读取，不需要一次解析整个文件；路径相对mod文件夹和替换图片所在的公共文件夹保存，
+# 换盘符或整体移动文件夹后仍然有效。旧版导出的单个JSON对象(绝对路径)仍可读取。
+
+FORMAT_VERSION = 2
+
+# 检查文件是否存在时按文件夹并行列出目录，网络路径上主要等待IO
+DEFAULT_WORKERS = 16
+
+# 缺失汇总中最多列出的文件夹数
+SUMMARY_FOLDERS = 10
+
+
+def common_folder(paths):
+    """返回全部路径的公共上级文件夹，不存在(例如在不同盘符)时返回None"""
+    folders = {os.path.dirname(path) for path in paths}
+    if not folders:
+        return None
+    try:
+        return os.path.commonpath(list(folders))
+    except ValueError:
+        return None
+
+
+def relative_to(path, base):
+    """base可以表示path时返回相对路径，否则返回原路径"""
+    if base is None:
+        return path
+    if path.startswith(base + os.sep):
+        # 常见情况直接截掉前缀，relpath对几万条路径较慢
+        return path[len(base) + 1:]
+    try:
+        return os.path.relpath(path, base)
+    except ValueError:
+        return path
+
+
+def write_config(config_path, descriptor_path, replacements):
+    """把 {原文件路径: 替换文件路径} 写成新格式的配置文件"""
+    descriptor_path = os.path.normpath(os.path.abspath(descriptor_path))
+    mod_root = os.path.dirname(descriptor_path)
+    config_dir = os.path.dirname(os.path.abspath(config_path))
+    replacement_root = common_folder(os.path.abspath(repl) for repl in replacements.values())
+
+    header = {
+        "format": FORMAT_VERSION,
+        "descriptor_path": descriptor_path,
+        # 替换文件夹相对配置文件保存，配置文件和图片一起移动时不需要重新选择
+        "replacement_root": relative_to(replacement_root, config_dir) if replacement_root else None,
+        "replacement_root_absolute": replacement_root,
+        "count": len(replacements),
+    }
+    temp_path = config_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for orig, repl in replacements.items():
+            orig = relative_to(os.path.abspath(orig), mod_root).replace(os.sep, "/")
+            repl = relative_to(os.path.abspath(repl), replacement_root).replace(os.sep, "/")
+            f.write(json.dumps([orig, repl], ensure_ascii=False) + "\n")
+    os.replace(temp_path, config_path)
+
+
+def open_config(config_path):
+    """读取配置文件，返回 (descriptor路径, 逐条产生 (原文件路径, 替换文件路径) 的迭代器)
+
+    新格式的条目在迭代时才逐行读取；旧格式整体解析。
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        first_line = f.readline()
+    try:
+        header = json.loads(first_line)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != FORMAT_VERSION:
+        return open_legacy_config(config_path)
+
+    if not header.get("descriptor_path"):
+        raise ValueError("配置文件不完整，缺少descriptor.mod路径")
+    descriptor_path = os.path.normpath(header["descriptor_path"])
+    mod_root = os.path.dirname(descriptor_path)
+    replacement_root = resolve_replacement_root(config_path, header)
+    return descriptor_path, iter_entries(config_path, mod_root, replacement_root)
+
+
+def resolve_replacement_root(config_path, header):
+    """相对配置文件的位置仍然存在时使用它，否则使用导出时的绝对路径"""
+    relative = header.get("replacement_root")
+    absolute = header.get("replacement_root_absolute")
+    if relative is not None:
+        candidate = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(config_path)), relative))
+        if os.path.isdir(candidate) or not absolute:
+            return candidate
+    return os.path.normpath(absolute) if absolute else None
+
+
+def iter_entries(config_path, mod_root, replacement_root):
+    with open(config_path, 'r', encoding='utf-8') as f:
+        f.readline()
+        for line_number, line in enumerate(f, 2):
+            if not line.strip():
+                continue
+            try:
+                orig, repl = json.loads(line)
+            except (ValueError, TypeError):
+                raise ValueError(f"配置文件第{line_number}行格式错误")
+            orig = os.path.normpath(orig)
+            repl = os.path.normpath(repl)
+            # 相对路径可能以../开头，拼接后规范化，与界面中其他路径的形式一致
+            if not os.path.isabs(orig):
+                orig = os.path.normpath(os.path.join(mod_root, orig))
+            if not os.path.isabs(repl) and replacement_root:
+                repl = os.path.normpath(os.path.join(replacement_root, repl))
+            yield orig, repl
+
+
+def open_legacy_config(config_path):
+    """旧版export_replacements导出的单个JSON对象，全部为绝对路径"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or "descriptor_path" not in data:
+        raise ValueError("配置文件不完整，缺少descriptor.mod路径")
+    entries = ((os.path.normpath(orig), os.path.normpath(repl))
+               for orig, repl in data.get("replacements", {}).items())
+    return os.path.normpath(data["descriptor_path"]), entries
+
+
+def load_config(config_path):
+    """读取配置文件，返回 (descriptor路径, {原文件路径: 替换文件路径})"""
+    descriptor_path, entries = open_config(config_path)
+    return descriptor_path, dict(entries)
+
+
+def list_folder(folder):
+    """返回文件夹中全部文件名(按normcase)，文件夹不存在时返回空集合"""
+    try:
+        with os.scandir(folder) as entries:
+            return {os.path.normcase(entry.name) for entry in entries if entry.is_file()}
+    except OSError:
+        return set()
+
+
+def existing_files(paths, workers=DEFAULT_WORKERS):
+    """批量检查文件是否存在，返回存在的路径集合
+
+    按所在文件夹分组，每个文件夹只列出一次目录，各文件夹并行处理，
+    不再为每个文件单独调用一次stat。
+    """
+    by_folder = defaultdict(list)
+    for path in paths:
+        by_folder[os.path.dirname(path)].append(path)
+    if not by_folder:
+        return set()
+
+    existing = set()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(by_folder)))) as pool:
+        for folder_paths, names in zip(by_folder.values(), pool.map(list_folder, by_folder)):
+            for path in folder_paths:
+                if os.path.normcase(os.path.basename(path)) in names:
+                    existing.add(path)
+    return existing
+
+
+def split_missing(replacements, workers=DEFAULT_WORKERS):
+    """返回 (替换文件存在的配置, 替换文件缺失的 {原文件路径: 替换文件路径})"""
+    existing = existing_files(set(replacements.values()), workers)
+    valid = {}
+    missing = {}
+    for orig, repl in replacements.items():
+        if repl in existing:
+            valid[orig] = repl
+        else:
+            missing[orig] = repl
+    return valid, missing
+
+
+def summarize_missing(missing_paths, limit=SUMMARY_FOLDERS):
+    """把缺失的文件按文件夹汇总为几行文字"""
+    counts = defaultdict(int)
+    for path in missing_paths:
+        counts[os.path.dirname(path)] += 1
+    if not counts:
+        return ""
+    lines = [f"{sum(counts.values())} 个替换文件不存在，分布在 {len(counts)} 个文件夹中:"]
+    for folder, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]:
+        lines.append(f"  {folder}: {count} 个")
+    if len(counts) > limit:
+        lines.append(f"  ……以及其他 {len(counts) - limit} 个文件夹")
+    return "\n".join(lines)
@@ -0,0 +1,110 @@
+import os
+import time
+import sqlite3
+
+import mod_files
+
+# 持久化的gfx扫描索引: 记录每个文件夹的修改时间和其中的子文件夹、图片文件，
+# 再次打开同一个mod时只重新列出修改时间变化的文件夹
+
+INDEX_VERSION = 1
+
+# 修改时间距扫描时刻太近的文件夹不写入缓存的修改时间，
+# 避免同一时间粒度内的后续修改被漏掉(FAT等文件系统精度只有2秒)
+RACY_SECONDS = 2
+
+
+class ScanIndex:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(mod_files.user_cache_dir(), "scan_index.sqlite3")
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS dirs")
+            self.conn.execute("PRAGMA user_version=%d" % INDEX_VERSION)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                root TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime INTEGER NOT NULL,
+                subdirs TEXT NOT NULL,
+                files TEXT NOT NULL,
+                PRIMARY KEY (root, path)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def load(self, root):
+        """读取某个gfx文件夹的全部缓存 {相对路径: (修改时间, 子文件夹名列表, 图片文件名列表)}"""
+        cached = {}
+        rows = self.conn.execute("SELECT path, mtime, subdirs, files FROM dirs WHERE root = ?", (root,))
+        for path, mtime, subdirs, files in rows:
+            cached[path] = (mtime, _split(subdirs), _split(files))
+        return cached
+
+    def walk(self, gfx_folder_path):
+        """与mod_files.iter_gfx_dirs相同的遍历结果，修改时间未变化的文件夹直接使用缓存
+
+        完整遍历结束后更新索引，并删除已不存在的文件夹的记录。
+        """
+        root = os.path.normcase(os.path.abspath(gfx_folder_path))
+        cached = self.load(root)
+        updates = []
+        seen = set()
+        racy_limit = (time.time() - RACY_SECONDS) * 1e9
+
+        stack = [gfx_folder_path]
+        while stack:
+            folder = stack.pop()
+            rel = os.path.relpath(folder, gfx_folder_path)
+            seen.add(rel)
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except OSError:
+                mtime = -1
+
+            entry = cached.get(rel)
+            if entry is not None and mtime >= 0 and entry[0] == mtime:
+                subdirs, files = entry[1], entry[2]
+            else:
+                subdirs, files = mod_files.list_gfx_dir(folder)
+                stored_mtime = mtime if 0 <= mtime < racy_limit else -1
+                updates.append((root, rel, stored_mtime, _join(subdirs), _join(files)))
+
+            yield folder, subdirs, files
+            stack.extend(os.path.join(folder, name) for name in reversed(subdirs))
+
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)", updates)
+            stale = [(root, rel) for rel in cached if rel not in seen]
+            self.conn.executemany("DELETE FROM dirs WHERE root = ? AND path = ?", stale)
+
+
+def iter_gfx_dirs_cached(gfx_folder_path):
+    """使用扫描索引遍历gfx文件夹，索引不可用时退回到直接扫描"""
+    try:
+        index = ScanIndex()
+    except (sqlite3.Error, OSError) as e:
+        print(f"无法打开扫描索引，将完整扫描: {str(e)}")
+        yield from mod_files.iter_gfx_dirs(gfx_folder_path)
+        return
+
+    try:
+        yield from index.walk(gfx_folder_path)
+    except sqlite3.Error as e:
+        print(f"更新扫描索引失败: {str(e)}")
+    finally:
+        index.close()
+
+
+def _join(names):
+    return "\n".join(names)
+
+
+def _split(text):
+    return text.split("\n") if text else []
@@ -0,0 +1,214 @@
+import os
+import re
+import bisect
+
+# gfx文件搜索索引: 所有相对路径(小写)用换行拼接成一个字符串，
+# 子串和模糊匹配都交给str.find/re在C层扫描，Python只处理命中的行。
+# 子串匹配只需几毫秒，可以在界面线程中执行；模糊匹配要扫描整个字符串，
+# 按块进行，跳过不含查询中全部字符的块，每块之间可以取消，适合放在后台线程。
+
+# 尺寸条件，例如 w>=512、h<64、512x256
+SIZE_FILTER_RE = re.compile(r'^(w|h)(>=|<=|>|<|=)(\d+)$')
+EXACT_SIZE_RE = re.compile(r'^(\d+)x(\d+)$')
+
+# 模糊匹配最多收集的候选数，超过后不再继续扫描
+FUZZY_CANDIDATES = 5000
+
+# 模糊匹配按块扫描，每块的行数；每块记录其中出现过的字符，缺少查询中任一字符的块直接跳过
+FUZZY_BLOCK_LINES = 256
+
+OPERATORS = {
+    '>=': lambda a, b: a >= b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '<': lambda a, b: a < b,
+    '=': lambda a, b: a == b,
+}
+
+
+def parse_query(text):
+    """把搜索文字拆分为 (匹配文字, 尺寸条件列表)，尺寸条件为 (w或h, 比较函数, 数值)"""
+    words = []
+    size_filters = []
+    for token in text.split():
+        size_match = SIZE_FILTER_RE.match(token.lower())
+        exact_match = EXACT_SIZE_RE.match(token.lower())
+        if size_match:
+            size_filters.append((size_match.group(1), OPERATORS[size_match.group(2)], int(size_match.group(3))))
+        elif exact_match:
+            size_filters.append(('w', OPERATORS['='], int(exact_match.group(1))))
+            size_filters.append(('h', OPERATORS['='], int(exact_match.group(2))))
+        else:
+            words.append(token)
+    return " ".join(words), size_filters
+
+
+def normalize_query(text):
+    return text.strip().lower().replace('\\', '/')
+
+
+def size_matches(meta, size_filters):
+    """检查图片尺寸是否满足全部尺寸条件，没有尺寸信息时不满足"""
+    if meta is None:
+        return False
+    for axis, compare, value in size_filters:
+        if not compare(meta.width if axis == 'w' else meta.height, value):
+            return False
+    return True
+
+
+class SearchIndex:
+    def __init__(self, entries):
+        """entries为 (文字, 对应的值) 序列，搜索结果返回这些值
+
+        同一个值可以对应多行文字(例如路径和引用它的sprite名称)，结果中只出现一次。
+        """
+        self.keys = []
+        lowered = []
+        for text, key in entries:
+            lowered.append(text.replace(os.sep, '/').lower())
+            self.keys.append(key)
+        self.haystack = "\n".join(lowered)
+        # 每一行在haystack中的起始位置，用于把匹配位置换算成序号
+        self.line_starts = []
+        position = 0
+        for text in lowered:
+            self.line_starts.append(position)
+            position += len(text) + 1
+        # 每块中出现过的字符
+        self.block_chars = []
+        for first in range(0, len(lowered), FUZZY_BLOCK_LINES):
+            self.block_chars.append(frozenset("".join(lowered[first:first + FUZZY_BLOCK_LINES])))
+        # 上一次的模糊匹配结果 (查询文字, [行号], 这些行拼成的字符串, 各行在其中的起始位置, 继续扫描的位置)，
+        # 位置为None表示已扫描完整个索引，否则之后的行尚未扫描
+        self.fuzzy_cache = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def line_of(self, position):
+        return bisect.bisect_right(self.line_starts, position) - 1
+
+    def line_end(self, line):
+        if line + 1 < len(self.line_starts):
+            return self.line_starts[line + 1]
+        return len(self.haystack)
+
+    def search(self, text, limit=500, accept=None):
+        """搜索路径，返回 (结果值列表, 是否因达到上限而截断)
+
+        先返回包含完整子串的路径，不足limit时再用模糊(按顺序包含各字符)匹配补充。
+        accept(值) 返回False的路径被过滤掉。
+        """
+        results, truncated = self.search_substring(text, limit, accept)
+        query = normalize_query(text)
+        if truncated or not query:
+            return results, truncated
+        return self.add_fuzzy(results, self.fuzzy_lines(query), limit, accept)
+
+    def search_substring(self, text, limit=500, accept=None):
+        """只做子串匹配，返回 (结果值列表, 是否因达到上限而截断)；搜索文字为空时返回全部"""
+        query = normalize_query(text)
+        results = []
+        found = set()
+        if not query:
+            for key in self.keys:
+                if key not in found and (accept is None or accept(key)):
+                    found.add(key)
+                    results.append(key)
+                    if len(results) > limit:
+                        return results[:limit], True
+            return results, False
+
+        position = self.haystack.find(query)
+        while position >= 0:
+            line = self.line_of(position)
+            key = self.keys[line]
+            if key not in found and (accept is None or accept(key)):
+                if len(results) >= limit:
+                    return results, True
+                results.append(key)
+                found.add(key)
+            position = self.haystack.find(query, self.line_end(line))
+        return results, False
+
+    def add_fuzzy(self, results, fuzzy, limit=500, accept=None):
+        """把fuzzy_lines的结果按匹配跨度从短到长补充到子串匹配的结果之后，返回 (结果值列表, 是否截断)"""
+        matched, truncated = fuzzy
+        results = list(results)
+        found = set(results)
+        candidates = []
+        for line, span in matched:
+            key = self.keys[line]
+            if key not in found and (accept is None or accept(key)):
+                candidates.append((span, line, key))
+        candidates.sort()
+
+        for span, line, key in candidates:
+            if key in found:
+                continue
+            if len(results) >= limit:
+                return results, True
+            results.append(key)
+            found.add(key)
+        return results, truncated
+
+    def fuzzy_lines(self, query, cancelled=None):
+        """模糊匹配: 各字符按顺序出现在同一行中
+
+        返回 ([(行号, 匹配跨度)], 是否因候选超过FUZZY_CANDIDATES而提前停止)；
+        cancelled() 在每块之间调用，返回True时停止扫描并返回None。
+
+        输入通常是逐字追加的，新查询以上次的查询开头时，结果一定在上次的结果之中:
+        上次已扫描过的部分只需在上次结果拼成的小字符串里筛选，
+        上次因候选过多提前停止时再从停止的位置继续扫描。
+        """
+        # 每个字符前用排除该字符的字符类，匹配唯一确定，避免回溯
+        needed = [ch for ch in query if not ch.isspace()]
+        chars = [re.escape(ch) for ch in needed]
+        pattern = re.compile(chars[0] + "".join(f"[^\n{ch}]*{ch}" for ch in chars[1:]))
+        needed = frozenset(needed)
+
+        matched = []
+        position = 0
+        last_line = -1
+        cache = self.fuzzy_cache
+        if cache is not None and query.startswith(cache[0]):
+            previous_query, previous_lines, text, starts, position = cache
+            for match in pattern.finditer(text):
+                index = bisect.bisect_right(starts, match.start()) - 1
+                if previous_lines[index] != last_line:
+                    last_line = previous_lines[index]
+                    matched.append((last_line, match.end() - match.start()))
+
+        block = max(0, self.line_of(position)) // FUZZY_BLOCK_LINES if position is not None else len(self.block_chars)
+        while position is not None and len(matched) < FUZZY_CANDIDATES:
+            if block >= len(self.block_chars):
+                position = None
+                break
+            if cancelled is not None and cancelled():
+                return None
+            first = block * FUZZY_BLOCK_LINES
+            end = self.line_end(min(first + FUZZY_BLOCK_LINES, len(self.keys)) - 1)
+            if needed <= self.block_chars[block]:
+                for match in pattern.finditer(self.haystack, max(position, self.line_starts[first]), end):
+                    line = self.line_of(match.start())
+                    if line == last_line:
+                        continue
+                    last_line = line
+                    matched.append((line, match.end() - match.start()))
+                    if len(matched) >= FUZZY_CANDIDATES:
+                        break
+            position = self.line_end(last_line) if len(matched) >= FUZZY_CANDIDATES else end
+            block += 1
+
+        # 把这次的结果拼成小字符串，下一次输入时只在其中查找
+        lines = [line for line, span in matched]
+        pieces = [self.haystack[self.line_starts[line]:self.line_end(line)].rstrip('\n') for line in lines]
+        starts = []
+        offset = 0
+        for piece in pieces:
+            starts.append(offset)
+            offset += len(piece) + 1
+        self.fuzzy_cache = (query, lines, "\n".join(pieces), starts, position)
+        return matched, position is not None
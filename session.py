@@ -0,0 +1,38 @@
+import os
+
+import mod_files
+import replacement_config
+
+# 上次的会话: 关闭窗口时保存当前mod和全部替换对应关系，下次启动时自动恢复。
+# 格式与导出的替换配置相同
+
+SESSION_NAME = "last_session.jsonl"
+
+
+def session_path():
+    return os.path.join(mod_files.user_cache_dir(), SESSION_NAME)
+
+
+def save(descriptor_path, replacements):
+    """保存会话；没有打开mod时删除上次的会话"""
+    path = session_path()
+    if not descriptor_path:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    replacement_config.write_config(path, descriptor_path, replacements)
+
+
+def load():
+    """返回 (descriptor路径, {原文件路径: 替换文件路径})，没有可恢复的会话时返回None"""
+    path = session_path()
+    if not os.path.isfile(path):
+        return None
+    try:
+        descriptor_path, replacements = replacement_config.load_config(path)
+    except (OSError, ValueError) as e:
+        print(f"读取上次的会话失败: {str(e)}")
+        return None
+    if not os.path.isfile(descriptor_path):
+        return None
+    return descriptor_path, replacements
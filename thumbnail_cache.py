@@ -0,0 +1,115 @@
+import os
+import hashlib
+import threading
+
+import mod_files
+
+# 预览缩略图的磁盘缓存: 按 路径+修改时间+大小+边长 缓存缩小后的PNG，
+# 同一个文件只需完整解码一次；总大小超过上限时删除最久未使用的缩略图
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 超出上限后清理到上限的这个比例，避免每次写入都触发清理
+EVICT_TARGET_RATIO = 0.9
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or mod_files.user_cache_dir("thumbnails")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None  # 第一次写入时统计
+
+    def thumbnail_path(self, file_path, edge):
+        """返回缩略图在缓存中的路径，源文件变化后路径随之变化"""
+        stat = os.stat(file_path)
+        key = f"{os.path.normcase(os.path.abspath(file_path))}|{stat.st_mtime_ns}|{stat.st_size}|{edge}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".png")
+
+    def get(self, file_path, edge):
+        """返回已缓存的缩略图路径，没有缓存时返回None"""
+        thumb_path = self.thumbnail_path(file_path, edge)
+        try:
+            # 更新修改时间作为最近使用时间，清理时按它排序
+            os.utime(thumb_path)
+            return thumb_path
+        except OSError:
+            return None
+
+    def get_or_create(self, file_path, edge, write=None):
+        """返回缩略图路径，没有缓存时生成: write为None时用Pillow解码源文件，否则调用write(临时路径)写出"""
+        thumb_path = self.get(file_path, edge)
+        if thumb_path is not None:
+            return thumb_path
+        if write is None:
+            return self.create(file_path, edge)
+        return self.store(file_path, edge, write)
+
+    def create(self, file_path, edge):
+        """解码源文件，缩小到最长边不超过edge后写入缓存"""
+        from PIL import Image
+        import preview_decode
+
+        def write(temp_path):
+            # DDS只读取合适的mipmap级别，大TGA按条带边读边缩小，其他格式完整解码
+            img = preview_decode.open_reduced(file_path, edge) or Image.open(file_path)
+            with img:
+                img.thumbnail((edge, edge), Image.LANCZOS)
+                # 调色板和灰度透明图转为RGBA，保留透明度
+                if img.mode not in ('RGB', 'RGBA'):
+                    img = img.convert('RGBA')
+                img.save(temp_path, format='PNG', compress_level=1)
+        return self.store(file_path, edge, write)
+
+    def store(self, file_path, edge, write):
+        """调用write(临时路径)写出缩略图，再放入缓存，返回缩略图路径"""
+        thumb_path = self.thumbnail_path(file_path, edge)
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        temp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+        try:
+            write(temp_path)
+            os.replace(temp_path, thumb_path)
+        except BaseException:
+            # 源文件损坏等原因写出失败时，不在缓存文件夹中留下写了一半的临时文件
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self.account(os.path.getsize(thumb_path))
+        return thumb_path
+
+    def account(self, added_bytes):
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self.entries())
+            else:
+                self.total_bytes += added_bytes
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        """列出缓存中的全部缩略图 (路径, 大小, 最近使用时间)"""
+        for folder, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """按最近使用时间从旧到新删除缩略图，直到总大小低于上限"""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
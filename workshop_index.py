@@ -0,0 +1,101 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import mod_files
+import scan_index
+
+# 创意工坊(或任何包含多个mod的文件夹)的合并gfx索引: 并行扫描每个mod的descriptor.mod和gfx文件夹，
+# 记录每个gfx相对路径由哪些mod提供，切换mod时直接使用扫描结果
+
+ModInfo = namedtuple("ModInfo", ["folder", "descriptor_path", "name", "version"])
+
+# 扫描主要等待磁盘，线程数可以多于CPU核心数
+DEFAULT_WORKERS = 8
+
+
+def find_mod_folders(root):
+    """root本身是mod时返回[root]，否则返回其下一级中含有descriptor.mod的文件夹"""
+    if os.path.isfile(os.path.join(root, "descriptor.mod")):
+        return [root]
+    folders = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir() and os.path.isfile(os.path.join(entry.path, "descriptor.mod")):
+                    folders.append(entry.path)
+    except OSError as e:
+        print(f"读取文件夹时出错: {str(e)}")
+    folders.sort()
+    return folders
+
+
+def scan_mod(mod_folder):
+    """扫描一个mod，返回 (ModInfo, [(文件夹路径, 子文件夹名列表, 图片文件名列表), ...])
+
+    没有gfx文件夹的mod返回None。
+    """
+    gfx_folder_path = os.path.join(mod_folder, "gfx")
+    if not os.path.isdir(gfx_folder_path):
+        return None
+    descriptor_path = os.path.join(mod_folder, "descriptor.mod")
+    try:
+        descriptor = mod_files.parse_descriptor(descriptor_path)
+    except (OSError, UnicodeDecodeError):
+        descriptor = {"name": None, "version": None}
+    info = ModInfo(mod_folder, descriptor_path,
+                   descriptor["name"] or os.path.basename(mod_folder), descriptor["version"])
+    return info, list(scan_index.iter_gfx_dirs_cached(gfx_folder_path))
+
+
+class WorkshopIndex:
+    def __init__(self, root, scanned):
+        self.root = root
+        self.mods = []
+        self.entries = []  # 与mods一一对应的扫描结果，为None时需要重新扫描
+        self.providers = {}  # {gfx相对路径(以/分隔): [mod序号, ...]}
+        for info, entries in sorted(scanned, key=lambda item: (item[0].name.lower(), item[0].folder)):
+            mod = len(self.mods)
+            self.mods.append(info)
+            self.entries.append(entries)
+            prefix_length = len(os.path.join(info.folder, "gfx")) + 1
+            for folder, subdirs, files in entries:
+                rel_folder = folder[prefix_length:].replace(os.sep, "/")
+                for name in files:
+                    rel_path = f"{rel_folder}/{name}" if rel_folder else name
+                    self.providers.setdefault(rel_path, []).append(mod)
+
+    def mod_of(self, descriptor_path):
+        """返回descriptor.mod对应的mod序号，不在索引中时返回None"""
+        target = os.path.normcase(os.path.abspath(descriptor_path))
+        for mod, info in enumerate(self.mods):
+            if os.path.normcase(os.path.abspath(info.descriptor_path)) == target:
+                return mod
+        return None
+
+    def providers_of(self, rel_path):
+        """返回提供这个gfx相对路径的全部mod"""
+        return [self.mods[mod] for mod in self.providers.get(rel_path.replace(os.sep, "/"), [])]
+
+    def overridden_paths(self):
+        """返回被多个mod同时提供的gfx相对路径 {相对路径: [ModInfo, ...]}"""
+        return {path: [self.mods[mod] for mod in mods] for path, mods in self.providers.items() if len(mods) > 1}
+
+    def forget(self, mod):
+        """mod的文件有变化后丢弃它的扫描结果，下次打开时重新扫描"""
+        self.entries[mod] = None
+
+
+def build(root, workers=DEFAULT_WORKERS, progress=None):
+    """并行扫描root下的全部mod，返回WorkshopIndex；progress(已完成数, 总数)"""
+    folders = find_mod_folders(root)
+    scanned = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(scan_mod, folder) for folder in folders]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            if result is not None:
+                scanned.append(result)
+            if progress is not None:
+                progress(done, len(folders))
+    return WorkshopIndex(root, scanned)